@@ -1,7 +1,6 @@
 
 import sys
 from PyQt6.QtWidgets import QApplication
-from scripts.ui import FluentProcessingUI
 
 from scripts.gui_v2 import MainWindow
 
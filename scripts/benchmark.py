@@ -0,0 +1,318 @@
+"""
+Benchmarks of the tool on the fake Fluent (scripts/fake_fluent.py), so no
+Fluent licence is needed.
+
+run with: python -m scripts.benchmark [--only journal supervision ...] [--repeat 5]
+          [--out results.json] [--compare old_results.json]
+
+Results are written as JSON (default ~/.post_processing/benchmarks/) with the
+git commit, so runs of different versions can be compared with --compare.
+"""
+from __future__ import annotations
+import argparse
+import contextlib
+import json
+import os
+import platform
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+from pathlib import Path
+from typing import Callable, Optional
+
+from scripts import fake_fluent
+from scripts.fluent_processing import FluentPostProcesser
+from scripts.progress import StepTimings
+from scripts.tuning import RunHistory
+
+REPO_DIR = Path(__file__).resolve().parent.parent
+FAKE_FLUENT = Path(fake_fluent.__file__).resolve()
+RESULTS_DIR = Path.home() / ".post_processing" / "benchmarks"
+
+
+@contextlib.contextmanager
+def fake_fluent_env(**values):
+    # settings of the fake Fluent for the processes started inside the block
+    old = {key: os.environ.get(key) for key in values}
+    os.environ.update({key: str(value) for key, value in values.items()})
+    try:
+        yield
+    finally:
+        for key, value in old.items():
+            if value is None:
+                os.environ.pop(key, None)
+            else:
+                os.environ[key] = value
+
+
+@contextlib.contextmanager
+def quiet():
+    # the processor logs every step, that's not part of what is measured
+    with open(os.devnull, "w") as devnull, contextlib.redirect_stdout(devnull):
+        yield
+
+
+def make_case(folder: Path) -> Path:
+    case = folder / "case" / "bench.cas.h5"
+    case.parent.mkdir(parents=True, exist_ok=True)
+    case.write_bytes(os.urandom(1 << 20))
+    return case
+
+
+def make_processor(folder: Path, **kwargs) -> FluentPostProcesser:
+    processor = FluentPostProcesser(FAKE_FLUENT, make_case(folder), results_db=None, case_catalog=None, **kwargs)
+    # don't mix benchmark timings into the ETA history of real runs
+    processor.step_timings = StepTimings(folder / "step_timings.json")
+    processor.run_history = RunHistory(folder / "run_history.json")
+    return processor
+
+
+def timed(func: Callable[[], Optional[dict]], repeat: int) -> dict:
+    times = []
+    extra: dict = {}
+    for _ in range(repeat):
+        start = time.perf_counter()
+        extra = func() or {}
+        times.append(time.perf_counter() - start)
+    return {
+        "times_s": times,
+        "median_s": statistics.median(times),
+        "min_s": min(times),
+        **extra,
+    }
+
+
+# --- benchmarks, each gets a temporary folder and the repeat count ---
+
+def bench_journal(tmp: Path, repeat: int) -> dict:
+    processor = make_processor(tmp)
+
+    def run():
+        processor.create_jou_content()
+        return {"renders": processor.jou_renders}
+
+    return timed(run, repeat * 10)
+
+
+def bench_supervision(tmp: Path, repeat: int) -> dict:
+    # transcript throughput of ProcessSupervisor + ProgressTracker, pictures are 1x1
+    processor = make_processor(tmp, incremental=False, write_sheet=False)
+    processor.create_jou_content()
+    chatter = 40
+
+    def run():
+        with quiet(), fake_fluent_env(FAKE_FLUENT_CHATTER=chatter, FAKE_FLUENT_PNG="1x1"):
+            rc = processor.run_jou_file(n_threads=1)
+        assert rc == 0
+        lines = processor.supervisors[-1].n_lines
+        return {"transcript_lines": lines}
+
+    result = timed(run, repeat)
+    # the same process with its output thrown away, the difference is the supervision overhead
+    cmd = processor.fluent_command(processor.jou_path, 1)
+
+    def raw():
+        with fake_fluent_env(FAKE_FLUENT_CHATTER=chatter, FAKE_FLUENT_PNG="1x1"):
+            subprocess.run(cmd, cwd=processor.work_dir, stdout=subprocess.DEVNULL, check=True)
+
+    baseline = timed(raw, repeat)
+    result["baseline_median_s"] = baseline["median_s"]
+    result["lines_per_s"] = result["transcript_lines"] / result["median_s"]
+    return result
+
+
+def bench_pipeline(tmp: Path, repeat: int) -> dict:
+    # full run: journal, Fluent with 800x600 contour pictures, forces, manifest
+    processor = make_processor(tmp, incremental=False, write_sheet=True)
+
+    def run():
+        with quiet(), fake_fluent_env(FAKE_FLUENT_CHATTER=5, FAKE_FLUENT_PNG="800x600"):
+            processor.run()
+        return {"stages": processor.tracer.summary()["totals"]}
+
+    return timed(run, repeat)
+
+
+def bench_force_parsing(tmp: Path, repeat: int) -> dict:
+    from scripts.force_reports import parse_force_report
+
+    paths = []
+    for name, zones, preamble in (("df", fake_fluent.FORCE_ZONES, 19), ("drag", fake_fluent.FORCE_ZONES, 19),
+                                  ("moment", fake_fluent.MOMENT_ZONES, 16)):
+        path = tmp / f"{name}.csv"
+        fake_fluent.write_force_report(path, zones, preamble, name)
+        paths.append(path)
+    # a report with many zones, like a detailed car model
+    big = tmp / "big.csv"
+    fake_fluent.write_force_report(big, [f"zone-{i}" for i in range(2000)], 19, "big")
+
+    def run():
+        for _ in range(100):
+            for path in paths:
+                parse_force_report(path)
+        parse_force_report(big)
+
+    result = timed(run, repeat)
+    result["reports_per_run"] = 301
+    return result
+
+
+def bench_workbook(tmp: Path, repeat: int) -> dict:
+    from scripts.force_sheet import export_batch, write_forcesheet
+
+    forces = [42.0, 84.0, 63.0, 283.5, 42.0, 84.0, 63.0, 283.5, 220.5]
+    cases = [(f"case_{i:03d}", forces) for i in range(50)]
+    result = timed(lambda: {"path": str(write_forcesheet(forces, tmp / "single.xlsx"))}, repeat)
+    result["batch_sheets_50_median_s"] = timed(lambda: {"path": str(export_batch(cases, tmp / "sheets.xlsx", "sheets"))}, repeat)["median_s"]
+    result["batch_table_50_median_s"] = timed(lambda: {"path": str(export_batch(cases, tmp / "table.xlsx", "table"))}, repeat)["median_s"]
+    return result
+
+
+def qt_app():
+    if not os.environ.get("DISPLAY") and sys.platform.startswith("linux"):
+        os.environ.setdefault("QT_QPA_PLATFORM", "offscreen")
+    from PyQt6.QtGui import QGuiApplication
+    return QGuiApplication.instance() or QGuiApplication([])
+
+
+def make_series(folder: Path, n: int = 45, size: tuple[int, int] = (1280, 720)) -> Path:
+    folder.mkdir(parents=True, exist_ok=True)
+    for i in range(n):
+        (folder / f"front_vel_{i:02d}.png").write_bytes(fake_fluent.contour_png(size[0], size[1], i))
+    return folder
+
+
+def bench_images_loading(tmp: Path, repeat: int) -> dict:
+    qt_app()
+    from scripts.gui_v2 import Images
+    from scripts.image_cache import ImageCache
+    from scripts.image_stack import cached_stack, pack_series
+
+    folder = make_series(tmp / "front_vel")
+    result = timed(lambda: {"n_images": Images(folder, ImageCache()).n_images}, repeat * 10)
+    pack_series(folder, folder.with_suffix(".stack"))
+
+    def stack():
+        cached_stack.cache_clear()
+        Images(folder, ImageCache())
+
+    result["stack_median_s"] = timed(stack, repeat * 10)["median_s"]
+    # the mapped file must be closed before the temporary folder is removed (Windows)
+    cached_stack.cache_clear()
+    return result
+
+
+def bench_scrub(tmp: Path, repeat: int) -> dict:
+    '''
+        Scrubs forward through a 1280x720 series like the viewer slider and
+        measures the time from request to a displayable (scaled) frame.
+    '''
+    app = qt_app()
+    from scripts.gui_v2 import Images
+    from scripts.image_cache import FrameLoader, ImageCache
+
+    folder = make_series(tmp / "front_vel")
+    side = 640
+    latencies = []
+    hits = 0
+
+    def run():
+        nonlocal hits
+        cache = ImageCache()
+        loader = FrameLoader(cache)
+        images = Images(folder, cache)
+        for index in range(images.n_images):
+            key = images.path(index)
+            start = time.perf_counter()
+            image = loader.request(key, side, priority=1)
+            if image is not None:
+                hits += 1
+            while image is None:
+                app.processEvents()
+                time.sleep(0.0005)
+                image = cache.lookup(key, side)
+            latencies.append(time.perf_counter() - start)
+            loader.prefetch(images.files, index, 1, side)
+            # the user drags the slider at about 30 frames per second
+            time.sleep(1 / 30)
+        loader.wait()
+
+    result = timed(run, repeat)
+    latencies.sort()
+    result["latency_p50_ms"] = latencies[len(latencies) // 2] * 1000
+    result["latency_p95_ms"] = latencies[int(len(latencies) * 0.95)] * 1000
+    result["cache_hit_ratio"] = hits / len(latencies)
+    return result
+
+
+BENCHMARKS = {
+    "journal": bench_journal,
+    "supervision": bench_supervision,
+    "pipeline": bench_pipeline,
+    "force_parsing": bench_force_parsing,
+    "workbook": bench_workbook,
+    "images_loading": bench_images_loading,
+    "scrub": bench_scrub,
+}
+
+
+def git_commit() -> str:
+    try:
+        return subprocess.run(["git", "rev-parse", "--short", "HEAD"], cwd=REPO_DIR,
+                              capture_output=True, text=True, check=True).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return "unknown"
+
+
+def compare(results: dict, old_path: Path):
+    old = json.loads(Path(old_path).read_text(encoding="utf-8"))
+    print(f"\ncompared to {old.get('commit')} ({old_path}):")
+    for name, result in results["benchmarks"].items():
+        before = old["benchmarks"].get(name, {}).get("median_s")
+        if not before or "median_s" not in result:
+            continue
+        ratio = result["median_s"] / before
+        flag = "  <-- slower" if ratio > 1.1 else ""
+        print(f"  {name:15s} {before * 1000:10.1f} ms -> {result['median_s'] * 1000:10.1f} ms  x{ratio:.2f}{flag}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmarks on the fake Fluent.")
+    parser.add_argument("--only", nargs="+", choices=list(BENCHMARKS), default=list(BENCHMARKS))
+    parser.add_argument("--repeat", type=int, default=3)
+    parser.add_argument("--out", type=Path, default=None)
+    parser.add_argument("--compare", type=Path, default=None)
+    args = parser.parse_args()
+
+    commit = git_commit()
+    results = {
+        "commit": commit,
+        "timestamp": time.time(),
+        "python": platform.python_version(),
+        "platform": platform.platform(),
+        "cpu_count": os.cpu_count(),
+        "benchmarks": {},
+    }
+    for name in args.only:
+        with tempfile.TemporaryDirectory() as tmp:
+            try:
+                result = BENCHMARKS[name](Path(tmp), args.repeat)
+            except ImportError as e:
+                # e.g. PyQt6 or openpyxl not installed on a headless node
+                print(f"{name:15s} skipped ({e})")
+                continue
+        results["benchmarks"][name] = result
+        print(f"{name:15s} {result['median_s'] * 1000:10.1f} ms (median of {len(result['times_s'])})")
+
+    out = args.out or RESULTS_DIR / f"{time.strftime('%Y%m%d-%H%M%S')}_{commit}.json"
+    out.parent.mkdir(parents=True, exist_ok=True)
+    out.write_text(json.dumps(results, indent=1), encoding="utf-8")
+    print(f"Results saved in: {out}")
+    if args.compare is not None:
+        compare(results, args.compare)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,258 @@
+"""
+Catalog of the Fluent cases on the project shares, so cases are found and
+described without walking the shares or opening the mesh files every time.
+
+index or update a share with: python -m scripts.case_catalog <folder> ... [--list]
+
+Folders are walked once, afterwards only folders whose mtime changed are
+listed again. Per case the sizes of the case and data file and the metadata
+from the HDF5 headers are stored: cell count, zone names and iteration count.
+h5py is optional, without it only the file sizes are cataloged.
+"""
+from __future__ import annotations
+import argparse
+import json
+import os
+import re
+import sqlite3
+import threading
+import time
+from pathlib import Path
+from typing import NamedTuple, Optional
+
+DEFAULT_CATALOG_PATH = Path.home() / ".post_processing" / "case_catalog.sqlite"
+CASE_SUFFIX = ".cas.h5"
+# results and pictures of the tool, never contain cases but thousands of files
+SKIP_DIRS = {"processed", "__pycache__", ".git"}
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS folders (
+    path     TEXT PRIMARY KEY,
+    mtime_ns INTEGER NOT NULL,
+    subdirs  TEXT NOT NULL,
+    cases    TEXT NOT NULL
+);
+CREATE TABLE IF NOT EXISTS cases (
+    path          TEXT PRIMARY KEY,
+    folder        TEXT NOT NULL,
+    size          INTEGER NOT NULL,
+    mtime_ns      INTEGER NOT NULL,
+    data_size     INTEGER,
+    data_mtime_ns INTEGER,
+    cell_count    INTEGER,
+    zones         TEXT,
+    iterations    INTEGER,
+    indexed_at    REAL NOT NULL
+);
+CREATE INDEX IF NOT EXISTS idx_cases_folder ON cases(folder);
+"""
+
+
+class CaseInfo(NamedTuple):
+    path: Path
+    size: int
+    mtime_ns: int
+    data_size: Optional[int]        # None without a .dat.h5
+    data_mtime_ns: Optional[int]
+    cell_count: Optional[int]       # None if the header couldn't be read
+    zones: tuple[str, ...]
+    iterations: Optional[int]
+
+    @property
+    def data_path(self) -> Path:
+        return data_file(self.path)
+
+
+def data_file(case_path: Path) -> Path:
+    return case_path.with_name(case_path.name.replace(CASE_SUFFIX, ".dat.h5"))
+
+
+def zone_names(group) -> list[str]:
+    # zoneTopology/name holds the names of all zones of the group, separated by ";"
+    try:
+        names = group["zoneTopology"]["name"][()]
+    except KeyError:
+        return []
+    if hasattr(names, "tobytes"):
+        names = names.tobytes()
+    if isinstance(names, bytes):
+        names = names.decode("utf-8", "replace")
+    return [name for name in str(names).strip("\x00").split(";") if name]
+
+
+def read_case_metadata(case_path: Path) -> dict:
+    '''
+        Cell count and zone names from the mesh of a Fluent CFF case file,
+        iteration count from its data file. Only the headers and the small
+        zone tables are read, never the mesh itself. Empty without h5py.
+    '''
+    try:
+        import h5py
+    except ImportError:
+        return {}
+    metadata = {}
+    try:
+        with h5py.File(case_path, "r") as f:
+            mesh = f["meshes"]["1"]
+            cell_count = mesh.attrs.get("cellCount")
+            if cell_count is None and "cells" in mesh:
+                topology = mesh["cells"]["zoneTopology"]
+                cell_count = int((topology["maxId"][()] - topology["minId"][()] + 1).sum())
+            metadata["cell_count"] = int(cell_count) if cell_count is not None else None
+            metadata["zones"] = zone_names(mesh["faces"]) if "faces" in mesh else []
+    except (OSError, KeyError, ValueError) as e:
+        print(f"Couldn't read the header of {case_path}: {e}")
+    data_path = data_file(case_path)
+    if data_path.exists():
+        try:
+            with h5py.File(data_path, "r") as f:
+                variables = f["settings"]["Data Variables"][()]
+                if hasattr(variables, "tobytes"):
+                    variables = variables.tobytes()
+                found = re.search(rb"\(iteration\s+(?:\.\s+)?(\d+)\)", bytes(variables))
+                metadata["iterations"] = int(found.group(1)) if found else None
+        except (OSError, KeyError, ValueError) as e:
+            print(f"Couldn't read the header of {data_path}: {e}")
+    return metadata
+
+
+class CaseCatalog():
+    def __init__(self, db_path: Path = DEFAULT_CATALOG_PATH):
+        self.db_path = Path(db_path)
+        self.db_path.parent.mkdir(parents=True, exist_ok=True)
+        # the job queue looks up cases from its scheduler threads
+        self.lock = threading.Lock()
+        self.conn = sqlite3.connect(self.db_path, check_same_thread=False, timeout=30)
+        self.conn.execute("PRAGMA journal_mode=WAL")
+        self.conn.executescript(SCHEMA)
+
+    def close(self):
+        self.conn.close()
+
+    @staticmethod
+    def row_to_info(row: tuple) -> CaseInfo:
+        path, size, mtime_ns, data_size, data_mtime_ns, cell_count, zones, iterations = row
+        return CaseInfo(Path(path), size, mtime_ns, data_size, data_mtime_ns, cell_count,
+                        tuple(json.loads(zones or "[]")), iterations)
+
+    def lookup(self, case_path: Path) -> Optional[CaseInfo]:
+        with self.lock:
+            row = self.conn.execute(
+                "SELECT path, size, mtime_ns, data_size, data_mtime_ns, cell_count, zones, iterations "
+                "FROM cases WHERE path = ?",
+                (str(case_path),)).fetchone()
+        return self.row_to_info(row) if row else None
+
+    def get(self, case_path: Path) -> Optional[CaseInfo]:
+        '''
+            Catalog entry of one case, the headers are only read again if the
+            case or data file changed since they were cataloged.
+        '''
+        case_path = Path(case_path).resolve()
+        try:
+            st = case_path.stat()
+        except OSError:
+            return None
+        data_path = data_file(case_path)
+        data_st = data_path.stat() if data_path.exists() else None
+        info = self.lookup(case_path)
+        if (info is not None and info.size == st.st_size and info.mtime_ns == st.st_mtime_ns
+                and info.data_mtime_ns == (data_st.st_mtime_ns if data_st else None)):
+            return info
+        metadata = read_case_metadata(case_path)
+        with self.lock, self.conn:
+            self.conn.execute(
+                "INSERT OR REPLACE INTO cases (path, folder, size, mtime_ns, data_size, data_mtime_ns, "
+                "cell_count, zones, iterations, indexed_at) VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?)",
+                (str(case_path), str(case_path.parent), st.st_size, st.st_mtime_ns,
+                 data_st.st_size if data_st else None, data_st.st_mtime_ns if data_st else None,
+                 metadata.get("cell_count"), json.dumps(metadata.get("zones", [])),
+                 metadata.get("iterations"), time.time()),
+            )
+        return self.lookup(case_path)
+
+    def list_folder(self, folder: Path) -> tuple[list[Path], list[Path]]:
+        # sub folders and case files, from the catalog if the folder didn't change
+        mtime_ns = folder.stat().st_mtime_ns
+        with self.lock:
+            row = self.conn.execute("SELECT mtime_ns, subdirs, cases FROM folders WHERE path = ?",
+                                    (str(folder),)).fetchone()
+        if row is not None and row[0] == mtime_ns:
+            return [folder / name for name in json.loads(row[1])], [folder / name for name in json.loads(row[2])]
+        subdirs, cases = [], []
+        with os.scandir(folder) as entries:
+            for entry in entries:
+                if entry.is_dir(follow_symlinks=False):
+                    if entry.name not in SKIP_DIRS:
+                        subdirs.append(entry.name)
+                elif entry.name.endswith(CASE_SUFFIX):
+                    cases.append(entry.name)
+        with self.lock, self.conn:
+            self.conn.execute("INSERT OR REPLACE INTO folders (path, mtime_ns, subdirs, cases) VALUES (?, ?, ?, ?)",
+                              (str(folder), mtime_ns, json.dumps(sorted(subdirs)), json.dumps(sorted(cases))))
+            # cases that disappeared from the folder
+            self.conn.execute(f"DELETE FROM cases WHERE folder = ? AND path NOT IN ({','.join('?' * len(cases))})",
+                              (str(folder), *(str(folder / name) for name in cases)))
+        return [folder / name for name in sorted(subdirs)], [folder / name for name in sorted(cases)]
+
+    def refresh(self, root: Path) -> list[CaseInfo]:
+        '''
+            All cases below root, sorted by path. Unchanged folders are not
+            listed again, unchanged cases are not opened again.
+        '''
+        root = Path(root).resolve()
+        found = []
+        pending = [root]
+        while pending:
+            folder = pending.pop()
+            try:
+                subdirs, cases = self.list_folder(folder)
+            except OSError as e:
+                print(f"Skipping {folder}: {e}")
+                continue
+            pending += subdirs
+            for case_path in cases:
+                info = self.get(case_path)
+                if info is not None:
+                    found.append(info)
+        return sorted(found, key=lambda info: info.path)
+
+    def find_case(self, folder: Path) -> Path:
+        '''
+            The case of a case folder: a case directly in the folder before one
+            in a sub folder, by name if there are several.
+        '''
+        cases = self.refresh(folder)
+        if not cases:
+            raise FileNotFoundError(f"No {CASE_SUFFIX} file in {folder}")
+        return min(cases, key=lambda info: (len(info.path.parts), info.path.name)).path
+
+
+def missing_zones(info: Optional[CaseInfo], zones: list[str]) -> list[str]:
+    # zones of a report command that the mesh doesn't have, nothing to check without catalog metadata
+    if info is None or not info.zones:
+        return []
+    return [zone for zone in zones if zone not in info.zones]
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Index the Fluent cases below the given folders.")
+    parser.add_argument("roots", type=Path, nargs="+")
+    parser.add_argument("--catalog", type=Path, default=DEFAULT_CATALOG_PATH)
+    parser.add_argument("--list", action="store_true", help="print every case with its metadata")
+    args = parser.parse_args()
+    catalog = CaseCatalog(args.catalog)
+    for root in args.roots:
+        start = time.perf_counter()
+        cases = catalog.refresh(root)
+        print(f"{len(cases)} cases below {root} ({time.perf_counter() - start:.1f}s)")
+        if args.list:
+            for info in cases:
+                cells = f"{info.cell_count:,} cells" if info.cell_count is not None else "? cells"
+                iterations = f"{info.iterations} it" if info.iterations is not None else "? it"
+                print(f"  {info.path}  {info.size / 2**20:.0f} MB  {cells}  {iterations}  {len(info.zones)} zones")
+    catalog.close()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,203 @@
+"""
+Headless command line interface, no Qt or Tk needed.
+
+    python -m scripts.cli <case.cas.h5 | folder> ... [--fluent fluent.exe] [--json]
+
+Folders are searched for *.cas.h5 files. With --json every result (and with
+--events every progress step) is printed as one JSON object per line on
+stdout, the log goes to stderr. Exit code 0 if all cases succeeded, 1 if one
+failed, 130 if interrupted.
+"""
+from __future__ import annotations
+import argparse
+import contextlib
+import json
+import os
+import sys
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from pathlib import Path
+from typing import Optional
+
+# the heavy modules are imported by the stages that need them, not here
+from scripts.case_catalog import DEFAULT_CATALOG_PATH, CaseCatalog
+from scripts.executors import LocalExecutor, make_executor
+from scripts.fluent_processing import FluentPostProcesser
+from scripts.results_store import DEFAULT_DB_PATH
+from scripts.supervisor import ProcessCancelled
+from scripts.tuning import Tuner, estimate_cells
+
+DEFAULT_FLUENT_EXE = Path(os.environ.get("FLUENT_EXE", r"C:\Program Files\ANSYS Inc\v252\fluent\ntbin\win64\fluent.exe"))
+
+
+def find_cases(paths: list[Path], catalog: Optional[CaseCatalog] = None) -> list[Path]:
+    cases = []
+    for path in paths:
+        if path.is_dir():
+            # the catalog only lists the folders that changed since the last search
+            if catalog is not None:
+                cases += [info.path for info in catalog.refresh(path)]
+            else:
+                cases += sorted(path.rglob("*.cas.h5"))
+        else:
+            cases.append(path)
+    # the same case given twice would write into the same processed/ folder
+    return list(dict.fromkeys(case.resolve() for case in cases))
+
+
+class Output():
+    '''
+        Writes JSON lines to the real stdout, safe to use from several threads.
+    '''
+    def __init__(self, stream, as_json: bool):
+        self.stream = stream
+        self.as_json = as_json
+        self.lock = threading.Lock()
+
+    def emit(self, record: dict):
+        if not self.as_json:
+            return
+        with self.lock:
+            self.stream.write(json.dumps(record) + "\n")
+            self.stream.flush()
+
+
+def auto_jobs(cases: list[Path], args, catalog: Optional[CaseCatalog]) -> int:
+    # plan for the largest mesh, the threads of each case are tuned by its processor unless --threads is given
+    cells = 0
+    for case in cases:
+        info = catalog.get(case) if catalog is not None else None
+        size_mb = case.stat().st_size / 2**20 if case.exists() else 0.0
+        cells = max(cells, estimate_cells(info.cell_count if info else None, size_mb))
+    cores = max((os.cpu_count() or 8) // max(args.shards, 1), 1)
+    licences = max(args.licences // max(args.shards, 1), 1)
+    if args.threads is not None:
+        jobs = max(min(len(cases), cores // args.threads, licences), 1)
+    else:
+        args.threads, jobs = Tuner(cores=cores, licences=licences).plan(cells, len(cases))
+    print(f"Running {jobs} cases at a time with {args.threads} threads each", file=sys.stderr)
+    return jobs
+
+
+def process_case(case: Path, args, output: Output, processors: dict[Path, FluentPostProcesser]) -> dict:
+    start = time.perf_counter()
+    result = {"event": "result", "case": str(case), "status": "done", "forces": None, "error": None}
+
+    def emit_progress(event):
+        output.emit({"event": "progress", "case": str(case), **event._asdict()})
+    try:
+        processor = FluentPostProcesser(
+            args.fluent, case,
+            n_shards=args.shards,
+            threads_per_shard=args.threads,
+            incremental=not args.full,
+            resume=not args.no_resume,
+            pack_stacks=args.pack_stacks,
+            optimize_images=not args.keep_images,
+            results_db=None if args.no_db else args.db,
+            write_sheet=not args.no_sheet,
+            case_catalog=None if args.no_catalog else args.catalog,
+            export_planes=args.export_planes,
+            executor=args.executor,
+            sweep=args.sweep,
+            on_event=emit_progress if args.events else None,
+        )
+        processors[case] = processor
+        processor.run()
+        result["forces"] = getattr(processor, "forces", None)
+        result["out_dir"] = str(processor.out_dir)
+    except ProcessCancelled as e:
+        result["status"] = "cancelled"
+        result["error"] = str(e)
+    except Exception as e:
+        result["status"] = "failed"
+        result["error"] = str(e)
+    finally:
+        processors.pop(case, None)
+    result["elapsed_s"] = round(time.perf_counter() - start, 3)
+    output.emit(result)
+    return result
+
+
+def main(argv: Optional[list[str]] = None) -> int:
+    parser = argparse.ArgumentParser(prog="python -m scripts.cli",
+                                     description="Post-process Fluent cases without a GUI.")
+    parser.add_argument("cases", type=Path, nargs="+", help="case files or folders with *.cas.h5 files")
+    parser.add_argument("--fluent", type=Path, default=DEFAULT_FLUENT_EXE, help="Fluent executable (env FLUENT_EXE)")
+    parser.add_argument("--shards", type=int, default=1, help="Fluent processes per case")
+    parser.add_argument("--threads", type=int, default=None, help="threads per Fluent process (default: from mesh size and run history)")
+    parser.add_argument("--jobs", type=int, default=None, help="cases processed at the same time (default: from run history)")
+    parser.add_argument("--licences", type=int, default=4, help="Fluent solver licences for --jobs auto")
+    parser.add_argument("--full", action="store_true", help="render everything, not only stale artifacts")
+    parser.add_argument("--no-resume", action="store_true", help="don't adopt the pictures of an interrupted run")
+    parser.add_argument("--pack-stacks", action="store_true", help="pack the image series into .stack files")
+    parser.add_argument("--keep-images", action="store_true", help="don't crop, recompress and downscale the pictures")
+    parser.add_argument("--export-planes", action="store_true", help="export the field data of every plane, metrics in processed/metrics")
+    parser.add_argument("--sweep", type=Path, default=None,
+                        help="sweep definition (.toml/.yaml), default: sweep.toml of the case or data/sweeps/default.toml")
+    parser.add_argument("--no-sheet", action="store_true", help="don't write the aero force sheet")
+    parser.add_argument("--db", type=Path, default=DEFAULT_DB_PATH, help="results database")
+    parser.add_argument("--no-db", action="store_true", help="don't store the forces in the results database")
+    parser.add_argument("--catalog", type=Path, default=DEFAULT_CATALOG_PATH, help="case catalog")
+    parser.add_argument("--no-catalog", action="store_true", help="search the folders without the case catalog")
+    parser.add_argument("--executor", choices=["local", "slurm", "fake"], default="local",
+                        help="run Fluent here, as Slurm jobs or with the local stand-in scheduler")
+    parser.add_argument("--partition", help="Slurm partition")
+    parser.add_argument("--fluent-cmd", help='Fluent command on the cluster nodes, e.g. "fluent 3d -t{threads} -g -i {journal}"')
+    parser.add_argument("--path-map", action="append", default=[], metavar="LOCAL=REMOTE",
+                        help="path prefix of this machine and the one the nodes see, can be repeated")
+    parser.add_argument("--json", action="store_true", help="JSON lines on stdout, log on stderr")
+    parser.add_argument("--events", action="store_true", help="with --json: one line per completed step")
+    args = parser.parse_args(argv)
+    # Fluent runs in the case folder, a relative path must not point somewhere else there
+    if args.fluent.exists():
+        args.fluent = args.fluent.resolve()
+
+    if args.executor == "local":
+        args.executor = make_executor("local")
+    else:
+        batch_args = {"fluent_cmd": args.fluent_cmd, "path_map": dict(m.split("=", 1) for m in args.path_map)}
+        if args.executor == "slurm":
+            batch_args["partition"] = args.partition
+        args.executor = make_executor(args.executor, **batch_args)
+
+    catalog = None if args.no_catalog else CaseCatalog(args.catalog)
+    cases = find_cases(args.cases, catalog)
+    if not cases:
+        print("No cases found", file=sys.stderr)
+        return 1
+
+    if args.jobs is None:
+        # the batch system queues the jobs itself
+        args.jobs = auto_jobs(cases, args, catalog) if isinstance(args.executor, LocalExecutor) else len(cases)
+
+    output = Output(sys.stdout, args.json)
+    processors: dict[Path, FluentPostProcesser] = {}
+    results: list[dict] = []
+    # the processor prints its log, in json mode stdout belongs to the records
+    log_target = sys.stderr if args.json else sys.stdout
+    with contextlib.redirect_stdout(log_target), ThreadPoolExecutor(max_workers=max(args.jobs, 1)) as pool:
+        futures = [pool.submit(process_case, case, args, output, processors) for case in cases]
+        try:
+            for future in futures:
+                results.append(future.result())
+        except KeyboardInterrupt:
+            for future in futures:
+                future.cancel()
+            for processor in list(processors.values()):
+                processor.cancel()
+            print("Interrupted, cancelling running cases", file=sys.stderr)
+            return 130
+
+    failed = [result for result in results if result["status"] != "done"]
+    output.emit({"event": "summary", "cases": len(results), "failed": len(failed)})
+    if not args.json:
+        for result in results:
+            print(f"{result['status']:>9}  {result['elapsed_s']:8.1f}s  {result['case']}"
+                  + (f"  ({result['error']})" if result["error"] else ""))
+    return 1 if failed else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
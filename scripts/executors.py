@@ -0,0 +1,456 @@
+"""
+Where the Fluent processes run: on this machine or as jobs of a cluster
+batch system.
+
+    LocalExecutor    - Fluent as a child process (ProcessSupervisor), at most
+                       max_processes at the same time
+    BatchExecutor    - writes a job script next to the journal, submits it and
+                       follows the job state and its output file
+    SlurmScheduler   - sbatch / sacct / scancel
+    FakeScheduler    - runs the job script's command on this machine with a
+                       queue delay and the job states of a batch system, to
+                       try the batch path without a cluster
+
+The batch jobs write into the case folder like a local run, so the case
+folder has to be on a file system the nodes share. path_map translates the
+paths of this machine to the ones the nodes see (e.g. a mapped network drive).
+Every executor returns a run object with run() -> exit code, stop(), tail()
+and n_lines, the processor doesn't care where Fluent runs.
+"""
+from __future__ import annotations
+import math
+import re
+import shlex
+import subprocess
+import threading
+import time
+from collections import deque
+from pathlib import Path
+from typing import Callable, NamedTuple, Optional
+
+from scripts.manifest import is_complete
+from scripts.supervisor import ProcessCancelled, ProcessSupervisor, popen_group_kwargs, stop_process_tree
+
+# job states, the ones of Slurm
+PENDING = "PENDING"
+RUNNING = "RUNNING"
+COMPLETED = "COMPLETED"
+FAILED = "FAILED"
+CANCELLED = "CANCELLED"
+TIMEOUT = "TIMEOUT"
+# waiting for nodes, the wall clock doesn't run yet
+WAITING_STATES = {PENDING, "CONFIGURING", "REQUEUED", "REQUEUE_HOLD", "REQUEUE_FED"}
+# on the nodes, still writing output
+RUNNING_STATES = {RUNNING, "COMPLETING", "SUSPENDED", "STAGE_OUT", "SIGNALING", "RESIZING"}
+# every other state (FAILED, OUT_OF_MEMORY, NODE_FAIL, PREEMPTED, DEADLINE ...) ends the job,
+# only COMPLETED counts as success
+
+
+class JobSpec(NamedTuple):
+    name: str
+    cmd: list[str]
+    cwd: Path
+    log_path: Path
+    n_threads: int
+    timeout_s: Optional[float]
+
+
+class LocalRun():
+    '''
+        ProcessSupervisor that waits for a free process slot first.
+    '''
+    def __init__(self, supervisor: ProcessSupervisor, slots: Optional[threading.Semaphore],
+                 on_state: Optional[Callable[[str], None]] = None):
+        self.supervisor = supervisor
+        self.slots = slots
+        self.on_state = on_state
+
+    @property
+    def n_lines(self) -> int:
+        return self.supervisor.n_lines
+
+    def run(self) -> int:
+        if self.slots is None:
+            return self.supervisor.run()
+        if not self.slots.acquire(blocking=False):
+            if self.on_state is not None:
+                self.on_state(PENDING)
+            while not self.slots.acquire(timeout=self.supervisor.poll_s):
+                if self.supervisor.cancel_event.is_set():
+                    raise ProcessCancelled("Process was cancelled.")
+            if self.on_state is not None:
+                self.on_state(RUNNING)
+        try:
+            return self.supervisor.run()
+        finally:
+            self.slots.release()
+
+    def stop(self, grace_s: float = 10.0):
+        self.supervisor.stop(grace_s)
+
+    def tail(self, n: int = 50) -> str:
+        return self.supervisor.tail(n)
+
+
+class LocalExecutor():
+    def __init__(self, max_processes: Optional[int] = None):
+        # shared by every processor using this executor, e.g. all jobs of the queue
+        self.slots = threading.BoundedSemaphore(max_processes) if max_processes else None
+
+    def start(self, cmd: list[str], cwd: Path, log_path: Path,
+              n_threads: int = 1,
+              timeout_s: Optional[float] = None,
+              idle_timeout_s: Optional[float] = None,
+              on_line: Optional[Callable[[str], None]] = None,
+              cancel_event: Optional[threading.Event] = None,
+              on_state: Optional[Callable[[str], None]] = None,
+              outputs: tuple[Path, ...] = (),
+              jou_path: Optional[Path] = None) -> LocalRun:
+        supervisor = ProcessSupervisor(cmd, cwd, log_path=log_path, timeout_s=timeout_s,
+                                       idle_timeout_s=idle_timeout_s, on_line=on_line,
+                                       cancel_event=cancel_event)
+        return LocalRun(supervisor, self.slots, on_state)
+
+
+class SlurmScheduler():
+    def __init__(self, partition: Optional[str] = None, account: Optional[str] = None,
+                 sbatch_args: tuple[str, ...] = ()):
+        self.partition = partition
+        self.account = account
+        self.sbatch_args = sbatch_args
+
+    def directives(self, spec: JobSpec) -> list[str]:
+        lines = [
+            f"#SBATCH --job-name={spec.name}",
+            "#SBATCH --ntasks=1",
+            f"#SBATCH --cpus-per-task={spec.n_threads}",
+            f"#SBATCH --output={spec.log_path}",
+        ]
+        if spec.timeout_s is not None:
+            # a few minutes more than the watchdog, so the watchdog reports it
+            lines.append(f"#SBATCH --time={math.ceil(spec.timeout_s / 60) + 5}")
+        if self.partition:
+            lines.append(f"#SBATCH --partition={self.partition}")
+        if self.account:
+            lines.append(f"#SBATCH --account={self.account}")
+        return lines + [f"#SBATCH {arg}" for arg in self.sbatch_args]
+
+    def submit(self, script_path: Path, spec: JobSpec) -> str:
+        result = subprocess.run(["sbatch", "--parsable", str(script_path)],
+                                capture_output=True, text=True, check=True)
+        # <job id>[;<cluster>]
+        return result.stdout.strip().split(";")[0]
+
+    def state(self, job_id: str) -> tuple[str, Optional[int]]:
+        # sacct knows finished jobs, right after submitting only squeue knows the job
+        result = subprocess.run(["sacct", "-j", job_id, "-X", "-n", "-P", "-o", "State,ExitCode"],
+                                capture_output=True, text=True)
+        line = result.stdout.strip().splitlines()[0] if result.stdout.strip() else ""
+        if line:
+            state, _, exit_code = line.partition("|")
+            # "CANCELLED by 1234" -> CANCELLED
+            state = state.split()[0] if state else PENDING
+            rc = int(exit_code.split(":")[0]) if re.match(r"\d+:\d+", exit_code) else None
+            return state, rc
+        result = subprocess.run(["squeue", "-h", "-j", job_id, "-o", "%T"], capture_output=True, text=True)
+        return (result.stdout.strip() or PENDING), None
+
+    def cancel(self, job_id: str):
+        subprocess.run(["scancel", job_id], capture_output=True)
+
+
+class FakeScheduler():
+    '''
+        Local stand-in for a batch system: jobs wait queue_s in PENDING and
+        for one of the slots, then run on this machine with their output in
+        the log file, the way a cluster node would write it.
+    '''
+    def __init__(self, slots: int = 1, queue_s: float = 2.0):
+        self.slots = threading.BoundedSemaphore(slots)
+        self.queue_s = queue_s
+        self.lock = threading.Lock()
+        self.jobs: dict[str, dict] = {}
+        self.next_id = 1000
+
+    def directives(self, spec: JobSpec) -> list[str]:
+        return [f"# fake job {spec.name}, {spec.n_threads} threads"]
+
+    def submit(self, script_path: Path, spec: JobSpec) -> str:
+        with self.lock:
+            self.next_id += 1
+            job_id = str(self.next_id)
+            self.jobs[job_id] = {"state": PENDING, "rc": None, "proc": None, "cancelled": threading.Event()}
+        threading.Thread(target=self.execute, args=(job_id, spec), daemon=True).start()
+        return job_id
+
+    def execute(self, job_id: str, spec: JobSpec):
+        job = self.jobs[job_id]
+        if job["cancelled"].wait(self.queue_s):
+            job["state"] = CANCELLED
+            return
+        while not self.slots.acquire(timeout=0.2):
+            if job["cancelled"].is_set():
+                job["state"] = CANCELLED
+                return
+        try:
+            with self.lock:
+                if job["cancelled"].is_set():
+                    job["state"] = CANCELLED
+                    return
+                log = open(spec.log_path, "w", encoding="utf-8")
+                job["proc"] = subprocess.Popen(spec.cmd, cwd=str(spec.cwd), stdin=subprocess.DEVNULL,
+                                               stdout=log, stderr=subprocess.STDOUT, **popen_group_kwargs())
+                job["state"] = RUNNING
+            try:
+                rc = job["proc"].wait(spec.timeout_s)
+            except subprocess.TimeoutExpired:
+                stop_process_tree(job["proc"])
+                job["rc"], job["state"] = None, TIMEOUT
+                return
+            finally:
+                log.close()
+            job["rc"] = rc
+            if job["cancelled"].is_set():
+                job["state"] = CANCELLED
+            else:
+                job["state"] = COMPLETED if rc == 0 else FAILED
+        finally:
+            self.slots.release()
+
+    def state(self, job_id: str) -> tuple[str, Optional[int]]:
+        job = self.jobs[job_id]
+        return job["state"], job["rc"]
+
+    def cancel(self, job_id: str):
+        job = self.jobs[job_id]
+        with self.lock:
+            job["cancelled"].set()
+            if job["proc"] is not None:
+                stop_process_tree(job["proc"])
+
+
+class BatchJob():
+    '''
+        A submitted job, watched like a local process: the output file is
+        followed for on_line and the idle watchdog, the wall clock starts
+        when the job starts running. After the job finished run() waits
+        until its outputs are visible here, the shared file system may
+        show them later than the job state changes.
+    '''
+    def __init__(self, scheduler, job_id: str, spec: JobSpec,
+                 idle_timeout_s: Optional[float] = None,
+                 on_line: Optional[Callable[[str], None]] = None,
+                 cancel_event: Optional[threading.Event] = None,
+                 on_state: Optional[Callable[[str], None]] = None,
+                 outputs: tuple[Path, ...] = (),
+                 poll_s: float = 0.5,
+                 state_poll_s: float = 5.0,
+                 settle_s: float = 60.0,
+                 buffer_lines: int = 2000):
+        self.scheduler = scheduler
+        self.job_id = job_id
+        self.spec = spec
+        self.idle_timeout_s = idle_timeout_s
+        self.on_line = on_line
+        self.cancel_event = cancel_event if cancel_event is not None else threading.Event()
+        self.on_state = on_state
+        self.outputs = outputs
+        self.poll_s = poll_s
+        self.state_poll_s = state_poll_s
+        self.settle_s = settle_s
+        self.transcript: deque[str] = deque(maxlen=buffer_lines)
+        self.n_lines = 0
+        self.callback_errors = 0
+        self.state = PENDING
+        self.offset = 0
+        self.partial = ""
+
+    def read_output(self) -> bool:
+        # new complete lines of the output file, True if there were any
+        try:
+            with open(self.spec.log_path, "rb") as f:
+                f.seek(self.offset)
+                chunk = f.read()
+        except OSError:
+            return False
+        if not chunk:
+            return False
+        self.offset += len(chunk)
+        lines = (self.partial + chunk.decode("utf-8", "replace")).split("\n")
+        self.partial = lines.pop()
+        for line in lines:
+            line += "\n"
+            self.n_lines += 1
+            self.transcript.append(line)
+            if self.on_line is not None:
+                try:
+                    self.on_line(line)
+                except Exception as e:
+                    # like ProcessSupervisor: a broken callback must not stop following the job
+                    self.callback_errors += 1
+                    if self.callback_errors == 1:
+                        print(f"Error in the transcript callback, reading on: {type(e).__name__}: {e}")
+        return bool(lines)
+
+    def set_state(self, state: str):
+        if state != self.state:
+            self.state = state
+            print(f"Job {self.job_id} ({self.spec.name}): {state}")
+            if self.on_state is not None:
+                self.on_state(state)
+
+    def run(self) -> int:
+        '''
+            Blocks until the job finished and returns its exit code. Raises
+            TimeoutError if a watchdog fired and ProcessCancelled if the run
+            was cancelled.
+        '''
+        started = None
+        last_output = None
+        last_state_poll = 0.0
+        rc = None
+        if self.on_state is not None:
+            self.on_state(PENDING)
+        while True:
+            if self.cancel_event.wait(self.poll_s):
+                self.stop()
+                raise ProcessCancelled("Job was cancelled.")
+            now = time.monotonic()
+            if now - last_state_poll >= self.state_poll_s:
+                last_state_poll = now
+                state, rc = self.scheduler.state(self.job_id)
+                self.set_state(state)
+            if self.state in WAITING_STATES:
+                continue
+            if started is None:
+                started = last_output = now
+            if self.read_output():
+                last_output = now
+            if self.state not in RUNNING_STATES:
+                break
+            if self.spec.timeout_s is not None and now - started > self.spec.timeout_s:
+                self.stop()
+                raise TimeoutError(f"Job was longer than {self.spec.timeout_s}s.")
+            if self.idle_timeout_s is not None and now - last_output > self.idle_timeout_s:
+                self.stop()
+                raise TimeoutError(f"Job printed nothing for {self.idle_timeout_s}s.")
+        self.read_output()
+        if self.state == TIMEOUT:
+            raise TimeoutError(f"Job {self.job_id} hit the time limit of the batch system.")
+        if self.state == CANCELLED:
+            raise ProcessCancelled(f"Job {self.job_id} was cancelled outside of the tool.")
+        if self.state == COMPLETED:
+            self.wait_for_outputs()
+            return rc if rc is not None else 0
+        print(f"Job {self.job_id} ended with state {self.state}")
+        # e.g. OUT_OF_MEMORY may report exit code 0
+        return rc if rc else 1
+
+    def wait_for_outputs(self):
+        missing = [path for path in self.outputs if not is_complete(path)]
+        deadline = time.monotonic() + self.settle_s
+        while missing and time.monotonic() < deadline:
+            if self.cancel_event.wait(self.poll_s):
+                raise ProcessCancelled("Job was cancelled.")
+            missing = [path for path in missing if not is_complete(path)]
+            self.read_output()
+        if missing:
+            print(f"Job {self.job_id}: {len(missing)} outputs not visible after {self.settle_s:.0f}s, e.g. {missing[0]}")
+
+    def stop(self, grace_s: float = 10.0):
+        if self.state in WAITING_STATES or self.state in RUNNING_STATES:
+            self.scheduler.cancel(self.job_id)
+
+    def tail(self, n: int = 50) -> str:
+        return "".join(list(self.transcript)[-n:])
+
+
+class BatchExecutor():
+    '''
+        scheduler: SlurmScheduler or FakeScheduler
+        fluent_cmd: command on the nodes, {threads} and {journal} are filled
+            in, e.g. "fluent 3d -t{threads} -g -i {journal}". None runs the
+            local command.
+        path_map: local path prefix -> path prefix on the nodes
+        preamble: lines before the command, e.g. "module load ansys/2025R2"
+    '''
+    def __init__(self, scheduler, fluent_cmd: Optional[str] = None,
+                 path_map: Optional[dict[str, str]] = None,
+                 preamble: tuple[str, ...] = (),
+                 poll_s: float = 0.5,
+                 state_poll_s: float = 5.0,
+                 settle_s: float = 60.0):
+        self.scheduler = scheduler
+        self.fluent_cmd = fluent_cmd
+        self.path_map = path_map or {}
+        self.preamble = preamble
+        self.poll_s = poll_s
+        self.state_poll_s = state_poll_s
+        self.settle_s = settle_s
+
+    def remote(self, text: str) -> str:
+        for local, remote in self.path_map.items():
+            for prefix in {local, local.replace("\\", "/")}:
+                text = text.replace(prefix, remote)
+        return text
+
+    def remote_journal(self, jou_path: Path) -> Path:
+        # journal copy with the paths the nodes see
+        if not self.path_map:
+            return jou_path
+        remote_path = jou_path.with_name(f"{jou_path.stem}_batch.jou")
+        remote_path.write_text(self.remote(jou_path.read_text(encoding="utf-8")), encoding="utf-8")
+        return remote_path
+
+    def write_script(self, spec: JobSpec, jou_path: Optional[Path]) -> Path:
+        if self.fluent_cmd is not None:
+            if jou_path is None:
+                raise ValueError("fluent_cmd needs the journal of the job")
+            command = self.fluent_cmd.format(threads=spec.n_threads, journal=shlex.quote(self.remote(str(jou_path))))
+        else:
+            # bash quoting, spaces and $ in the paths stay literal on the nodes
+            command = shlex.join([self.remote(part) for part in spec.cmd])
+        lines = ["#!/bin/bash", *self.scheduler.directives(spec._replace(log_path=Path(self.remote(str(spec.log_path))))),
+                 "", *self.preamble, f"cd {shlex.quote(self.remote(str(spec.cwd)))}", command, ""]
+        script_path = spec.log_path.with_suffix(".job.sh")
+        script_path.write_text("\n".join(lines), encoding="utf-8", newline="\n")
+        return script_path
+
+    def start(self, cmd: list[str], cwd: Path, log_path: Path,
+              n_threads: int = 1,
+              timeout_s: Optional[float] = None,
+              idle_timeout_s: Optional[float] = None,
+              on_line: Optional[Callable[[str], None]] = None,
+              cancel_event: Optional[threading.Event] = None,
+              on_state: Optional[Callable[[str], None]] = None,
+              outputs: tuple[Path, ...] = (),
+              jou_path: Optional[Path] = None) -> BatchJob:
+        # the job writes its output file from the start, an old one would be read as new output
+        log_path.unlink(missing_ok=True)
+        spec = JobSpec(log_path.stem, cmd, cwd, log_path, n_threads, timeout_s)
+        if jou_path is not None and self.path_map:
+            batch_jou = self.remote_journal(jou_path)
+            spec = spec._replace(cmd=[str(batch_jou) if part == str(jou_path) else part for part in cmd])
+            jou_path = batch_jou
+        script_path = self.write_script(spec, jou_path)
+        job_id = self.scheduler.submit(script_path, spec)
+        print(f"Submitted {script_path.name} as job {job_id}")
+        return BatchJob(self.scheduler, job_id, spec, idle_timeout_s=idle_timeout_s, on_line=on_line,
+                        cancel_event=cancel_event, on_state=on_state, outputs=outputs, poll_s=self.poll_s,
+                        state_poll_s=self.state_poll_s, settle_s=self.settle_s)
+
+
+def make_executor(kind: str = "local", max_processes: Optional[int] = None, **batch_args):
+    '''
+        local, slurm or fake, batch_args go to BatchExecutor except
+        partition/account (Slurm) and slots/queue_s (fake scheduler).
+    '''
+    if kind == "local":
+        return LocalExecutor(max_processes)
+    if kind == "slurm":
+        scheduler = SlurmScheduler(batch_args.pop("partition", None), batch_args.pop("account", None))
+    elif kind == "fake":
+        scheduler = FakeScheduler(batch_args.pop("slots", max_processes or 1), batch_args.pop("queue_s", 2.0))
+    else:
+        raise ValueError(f"Unknown executor {kind!r}, use local, slurm or fake")
+    return BatchExecutor(scheduler, **batch_args)
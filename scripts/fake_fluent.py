@@ -0,0 +1,234 @@
+"""
+Stand-in for the Fluent executable, used to test the journal / subprocess side
+of FluentPostProcesser without a Fluent licence.
+
+run with: python -m scripts.fake_fluent 3d -t8 -gu -i <journal.jou>
+(or point FluentPostProcesser.fluent_exe_path at this file)
+Without -i the commands are read from stdin, like a Fluent session.
+
+It reads the journal line by line, echoes every command like Fluent's transcript
+does, writes a dummy PNG for every /display/save-picture, a dummy report file
+for every /report/forces command and synthetic field data for every
+/file/export/ascii.
+
+Environment variables:
+    FAKE_FLUENT_DELAY    seconds to sleep after every command (default 0)
+    FAKE_FLUENT_FAIL_AT  exit with code 1 before writing picture number n
+    FAKE_FLUENT_CHATTER  extra transcript lines per command, like Fluent's status output (default 0)
+    FAKE_FLUENT_RATE     max. transcript lines per second, 0 = as fast as possible (default 0)
+    FAKE_FLUENT_PNG      size of the pictures as WxH, e.g. 1920x1080 (default 1x1 dummy)
+    FAKE_FLUENT_READ_S   seconds it takes to read the case (default 0)
+    FAKE_FLUENT_PICTURE_S  seconds it takes to render a picture (default 0)
+    FAKE_FLUENT_EXPORT_ROWS  points per /file/export/ascii of a plane (default 2000)
+"""
+import math
+import os
+import random
+import re
+import shlex
+import struct
+import sys
+import time
+import zlib
+from pathlib import Path
+
+
+def dummy_png(width: int = 1, height: int = 1) -> bytes:
+    def chunk(tag: bytes, data: bytes) -> bytes:
+        return struct.pack(">I", len(data)) + tag + data + struct.pack(">I", zlib.crc32(tag + data))
+
+    raw = b"".join(b"\x00" + b"\xff\xff\xff" * width for _ in range(height))
+    return (b"\x89PNG\r\n\x1a\n"
+            + chunk(b"IHDR", struct.pack(">IIBBBBB", width, height, 8, 2, 0, 0, 0))
+            + chunk(b"IDAT", zlib.compress(raw))
+            + chunk(b"IEND", b""))
+
+
+# colour map similar to Fluent's default rainbow
+PALETTE = [bytes(color) for color in [
+    (0, 0, 255), (0, 64, 255), (0, 128, 255), (0, 192, 255), (0, 255, 255), (0, 255, 192),
+    (0, 255, 128), (0, 255, 64), (64, 255, 0), (128, 255, 0), (192, 255, 0), (255, 255, 0),
+    (255, 192, 0), (255, 128, 0), (255, 64, 0), (255, 0, 0),
+]]
+
+
+def contour_png(width: int, height: int, seed: int = 0) -> bytes:
+    '''
+        PNG that compresses like a contour plot: white background and a field
+        of colour bands that changes with the seed (plane index), so every
+        picture of a series is different. Built row by row from byte runs,
+        fast enough for full HD.
+    '''
+    def chunk(tag: bytes, data: bytes) -> bytes:
+        return struct.pack(">I", len(data)) + tag + data + struct.pack(">I", zlib.crc32(tag + data))
+
+    band = max(width // 48, 1)
+    margin = height // 8
+    rows = []
+    for y in range(height):
+        if y < margin or y >= height - margin:
+            rows.append(b"\x00" + b"\xff\xff\xff" * width)
+            continue
+        shift = (y * 7 // max(height // 16, 1) + seed * 3) % len(PALETTE)
+        row = bytearray(b"\x00")
+        for x0 in range(0, width, band):
+            level = (x0 // band + shift + (x0 * y // (band * height + 1))) % (2 * len(PALETTE))
+            color = PALETTE[level if level < len(PALETTE) else 2 * len(PALETTE) - 1 - level]
+            row += color * min(band, width - x0)
+        rows.append(bytes(row))
+    return (b"\x89PNG\r\n\x1a\n"
+            + chunk(b"IHDR", struct.pack(">IIBBBBB", width, height, 8, 2, 0, 0, 0))
+            + chunk(b"IDAT", zlib.compress(b"".join(rows), 6))
+            + chunk(b"IEND", b""))
+
+
+# what Fluent prints while working, repeated for FAKE_FLUENT_CHATTER
+CHATTER = [
+    "Reading \"{}\"...",
+    "  {} cells, 1 cell zone ...",
+    "  Building...",
+    "     mesh",
+    "     materials,",
+    "     interface,",
+    "     domains,",
+    "     zones,",
+    "  Done.",
+]
+
+
+FORCE_ZONES = ["chassis", "floor", "front-wheel", "front-wing", "rear-wheel", "rear-wing", "symmetry", "sidepod"]
+MOMENT_ZONES = ["chassis", "front-wheel", "front-wing", "rear-wheel", "rear-wing", "sidepod"]
+
+
+def write_force_report(path: Path, zones: list[str], preamble: int, title: str):
+    lines = [title] + [f"; fake report line {i}" for i in range(1, preamble)]
+    lines.append("Zone Pressure Viscous Total")
+    lines.append("---- -------- ------- -----")
+    net_pressure = net_viscous = 0.0
+    for i, zone in enumerate(zones):
+        pressure = 10.0 * (i + 1)
+        viscous = 0.5 * (i + 1)
+        net_pressure += pressure
+        net_viscous += viscous
+        lines.append(f"{zone} {pressure:.6f} {viscous:.6f} {pressure + viscous:.6f}")
+    lines.append(f"net {net_pressure:.6f} {net_viscous:.6f} {net_pressure + net_viscous:.6f}")
+    path.write_text("\n".join(lines) + "\n", encoding="utf-8")
+
+
+def write_ascii_export(path: Path, variables: list[str], n_rows: int, seed: int):
+    '''
+        Plane export like Fluent's /file/export/ascii: a free stream with a
+        wake deficit and a tip vortex, written line by line.
+    '''
+    rng = random.Random(seed)
+    path.parent.mkdir(parents=True, exist_ok=True)
+    columns = ["nodenumber", "x-coordinate", "y-coordinate", "z-coordinate"] + variables
+    with open(path, "w", encoding="utf-8") as f:
+        f.write(", ".join(f"{name:>16s}" for name in columns) + "\n")
+        for n in range(1, n_rows + 1):
+            x, y, z = rng.uniform(-1.25, 1.85), rng.uniform(0.0, 0.8), rng.uniform(0.0, 0.76)
+            wake = math.exp(-((y - 0.2) ** 2 + (z - 0.3) ** 2) / 0.02)
+            r2 = (y - 0.5) ** 2 + (z - 0.5) ** 2 + 1e-4
+            swirl = 2.0 * math.exp(-r2 / 0.005) / math.sqrt(r2)
+            values = {
+                "x-velocity": 25.0 * (1.0 - 0.6 * wake), "y-velocity": -swirl * (z - 0.5),
+                "z-velocity": swirl * (y - 0.5), "density": 1.225,
+            }
+            speed2 = sum(values[f"{axis}-velocity"] ** 2 for axis in "xyz")
+            values["total-pressure"] = 0.5 * 1.225 * speed2 - 150.0 * wake
+            values["helicity"] = 40.0 * swirl * values["x-velocity"] * math.exp(-r2 / 0.005)
+            row = [x, y, z] + [values.get(name, 0.0) for name in variables]
+            f.write(f"{n:>16d}, " + ", ".join(f"{value:16.9E}" for value in row) + "\n")
+
+
+def main(argv: list[str]) -> int:
+    delay = float(os.environ.get("FAKE_FLUENT_DELAY", "0"))
+    fail_at = int(os.environ.get("FAKE_FLUENT_FAIL_AT", "0"))
+    chatter = int(os.environ.get("FAKE_FLUENT_CHATTER", "0"))
+    rate = float(os.environ.get("FAKE_FLUENT_RATE", "0"))
+    width, height = (int(v) for v in os.environ.get("FAKE_FLUENT_PNG", "1x1").lower().split("x"))
+    read_s = float(os.environ.get("FAKE_FLUENT_READ_S", "0"))
+    picture_s = float(os.environ.get("FAKE_FLUENT_PICTURE_S", "0"))
+    export_rows = int(os.environ.get("FAKE_FLUENT_EXPORT_ROWS", "2000"))
+    out = sys.stdout
+    next_line = time.perf_counter()
+
+    def emit(text: str):
+        nonlocal next_line
+        if rate:
+            # throttle like a slow transcript, without drifting
+            next_line += 1.0 / rate
+            wait = next_line - time.perf_counter()
+            if wait > 0:
+                time.sleep(wait)
+            else:
+                next_line = time.perf_counter()
+        out.write(text + "\n")
+
+    if "-i" in argv:
+        jou_path = Path(argv[argv.index("-i") + 1])
+        print("Fake Fluent - batch mode")
+        print(f"Reading journal {jou_path}")
+        source = open(jou_path, encoding="utf-8")
+    else:
+        # without a journal Fluent reads its commands from stdin (session mode)
+        print("Fake Fluent - session mode")
+        source = sys.stdin
+    sys.stdout.flush()
+
+    n_pictures = 0
+    with source:
+        for line in source:
+            cmd = line.strip()
+            if not cmd or cmd.startswith(";"):
+                continue
+            emit(f"> {cmd}")
+            for i in range(chatter):
+                emit(CHATTER[i % len(CHATTER)].format(n_pictures))
+            out.flush()
+
+            # scheme expressions, only (display "...") and (display 12) are understood,
+            # everything displayed goes on one line like with (newline) at the end
+            if cmd.startswith("("):
+                texts = re.findall(r'\(display (?:"([^"]*)"|(-?\d+))\)', cmd)
+                if texts:
+                    print("".join(text or num for text, num in texts))
+                sys.stdout.flush()
+                continue
+
+            tokens = shlex.split(cmd)
+            if tokens[0].endswith("save-picture"):
+                n_pictures += 1
+                if fail_at and n_pictures >= fail_at:
+                    print(f"Error: fake crash at picture {n_pictures}")
+                    return 1
+                picture = Path(tokens[1])
+                picture.parent.mkdir(parents=True, exist_ok=True)
+                if picture_s:
+                    time.sleep(picture_s)
+                if width * height > 1:
+                    picture.write_bytes(contour_png(width, height, n_pictures))
+                else:
+                    picture.write_bytes(dummy_png())
+            elif tokens[0] == "/file/export/ascii":
+                # path surface () yes quantities... () no
+                variables = tokens[tokens.index("yes") + 1:-2]
+                write_ascii_export(Path(tokens[1]), variables, export_rows, zlib.crc32(tokens[1].encode()))
+            elif "read-case" in tokens[0]:
+                if read_s:
+                    time.sleep(read_s)
+            elif tokens[0] == "/report/forces/wall-forces":
+                write_force_report(Path(tokens[-1]), FORCE_ZONES, 19, "Forces - Direction Vector")
+            elif tokens[0] == "/report/forces/wall-moments":
+                write_force_report(Path(tokens[-1]), MOMENT_ZONES, 16, "Moments - Moment Center")
+            elif tokens[0].lstrip("/") == "exit":
+                break
+
+            if delay:
+                time.sleep(delay)
+    print("Fake Fluent done")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main(sys.argv[1:]))
@@ -1,212 +1,658 @@
 
 from __future__ import annotations
 import os
-import numpy as np
-import subprocess
 import sys
-import time
+import threading
+from concurrent.futures import ThreadPoolExecutor, as_completed
 from pathlib import Path
-from openpyxl import load_workbook
-import pandas as pd
 import shutil
 from typing import TYPE_CHECKING, Callable, Optional
 
+from scripts.manifest import Manifest
+from scripts.case_catalog import DEFAULT_CATALOG_PATH, CaseCatalog, CaseInfo, missing_zones
+from scripts.image_stack import pack_series
+from scripts.image_pyramid import optimize_folders
+from scripts.plane_data import FIELD_VARIABLES, convert_exports, export_command, write_metrics
+from scripts.force_reports import ForceReport, parse_force_report
+from scripts.results_store import DEFAULT_DB_PATH, ResultsStore, case_hash_from_manifest
+from scripts.force_sheet import write_forcesheet
+from scripts.executors import LocalExecutor
+from scripts.supervisor import ProcessCancelled
+from scripts.progress import ProgressEvent, ProgressTracker, StepTimings, format_eta, mesh_bucket
+from scripts.instrumentation import Tracer, peak_rss_mb, traced
+from scripts.tuning import RunHistory, Tuner, estimate_cells
+from scripts.sweep_definition import (PLANE_VIEWS, compile_plan, find_definition, load_definition,
+                                      optimize_journal)
+
 if TYPE_CHECKING:
     from scripts.ui import FluentProcessingUI
     from scripts.gui_v2 import AddSimulationWindow
 
+def split_indices(n: int, n_parts: int) -> list[list[int]]:
+    # like numpy.array_split(range(n), n_parts): the first parts get one more
+    size, extra = divmod(n, n_parts)
+    parts, start = [], 0
+    for k in range(n_parts):
+        end = start + size + (1 if k < extra else 0)
+        parts.append(list(range(start, end)))
+        start = end
+    return parts
+
+
 class FluentPostProcesser():
     def __init__(self, fluent_exe_path: Path, 
                  case_file_path: Path, 
-                 callback: Optional[Callable[[int], None]] = None):
+                 callback: Optional[Callable[[int], None]] = None,
+                 n_shards: int = 1,
+                 threads_per_shard: Optional[int] = None,
+                 incremental: bool = True,
+                 resume: bool = True,
+                 pack_stacks: bool = False,
+                 optimize_images: bool = True,
+                 results_db: Optional[Path] = DEFAULT_DB_PATH,
+                 write_sheet: bool = True,
+                 export_planes: bool = False,
+                 case_catalog: Optional[Path] = DEFAULT_CATALOG_PATH,
+                 executor=None,
+                 sweep: Optional[Path] = None,
+                 cancel_event: Optional[threading.Event] = None,
+                 on_event: Optional[Callable[[ProgressEvent], None]] = None):
         self.fluent_exe_path = fluent_exe_path
         self.progress_callback = callback
-        self.create_folder_struct(case_file_path.parent)
+        # cell count, zone names ... of the case without opening the mesh, None to switch off
+        self.catalog = CaseCatalog(case_catalog) if case_catalog is not None else None
+        self.create_folder_struct(Path(case_file_path))
+        # planes, contours and cameras (see sweep_definition.py), None: sweep.toml of the case or the default
+        self.sweep_path = find_definition(self.work_dir, sweep)
+        self.sweep_definition = load_definition(self.sweep_path)
+        for folder in self.image_folders():
+            folder.mkdir(parents=True, exist_ok=True)
         self.progress_flag = False
+        # typed progress (stage, plane, quantity, ETA) in addition to the percentage callback
+        self.event_callback = on_event
+        self.eta_s: Optional[float] = None
+        # step durations of earlier runs, for the ETA of the next one
+        self.step_timings = StepTimings()
+        # per stage wall/CPU time and peak RSS, written to processed/timings.json and timings.trace.json
+        self.tracer = Tracer()
+        # sweep run times per mesh size and thread count, for choosing -t (see tuning.py)
+        self.run_history = RunHistory()
+        # n_shards > 1 splits the plane sweep over several Fluent processes
+        self.n_shards = n_shards
+        # None: from the run history of this machine and the mesh size
+        self.threads_per_shard = threads_per_shard or self.tuned_threads()
+        # where Fluent runs: child processes here or cluster jobs (see executors.py)
+        self.executor = executor if executor is not None else LocalExecutor()
+        # runs of the executor (ProcessSupervisor or batch job), stopped together on failures
+        self.supervisors = []
+        # set by cancel(), stops every running Fluent process, may be shared with the job queue
+        self.cancel_event = cancel_event if cancel_event is not None else threading.Event()
+        # only render what the manifest reports as missing or stale
+        self.incremental = incremental
+        # pick up the completely written pictures of a crashed run
+        self.resume = resume
+        # pack every image series into one memory-mappable file (see image_stack.py)
+        self.pack_stacks = pack_stacks
+        # crop, recompress and downscale the pictures after rendering (see image_pyramid.py)
+        self.optimize_images = optimize_images
+        # forces of every run are collected in this database, None to switch off
+        self.results_db = results_db
+        # copy of the aero force sheet per case
+        self.write_sheet = write_sheet
+        # field data on every plane for the metrics in processed/metrics (see plane_data.py)
+        self.export_planes = export_planes
 
     def run(self):
-        self.create_jou_content()
-        self.run_jou_file()
-        self.get_excel_data()
-
-    def create_folder_struct(self, case_folder_path):
-        self.work_dir = Path(case_folder_path)
-        self.case_file_path = list(case_folder_path.rglob("*.cas.h5"))[0]
+        # a new trace per run, the window may start the same processor again
+        self.tracer = Tracer(self.tracer.enabled)
+        self.supervisors = []
+        try:
+            with self.tracer.stage("run"):
+                self.run_stages()
+        finally:
+            try:
+                self.tracer.export(self.out_dir)
+            except OSError as e:
+                print(f"Couldn't write timings: {e}")
+
+    def run_stages(self):
+        with self.tracer.stage("manifest"):
+            manifest = Manifest(self.out_dir / "manifest.json")
+            expected = self.expected_artifacts()
+            case_hash = manifest.case_hash(self.case_files())
+            if self.resume:
+                adopted = manifest.adopt_pending(self.out_dir, case_hash, expected)
+                if adopted:
+                    print(f"Resuming interrupted run: {adopted} artifacts already written")
+            if self.incremental:
+                stale = manifest.stale_artifacts(self.out_dir, case_hash, expected)
+            else:
+                stale = set(expected)
+        force_keys = {self.artifact_key(self.forces_dir / name) for name in ("df.csv", "drag.csv", "moment.csv")}
+
+        if not stale:
+            print(f"All {len(expected)} artifacts up to date, skipping Fluent")
+        else:
+            print(f"{len(stale)} of {len(expected)} artifacts missing or stale")
+            # old outputs must not be mistaken for results of this run
+            for key in stale:
+                (self.out_dir / key).unlink(missing_ok=True)
+            manifest.begin(case_hash, expected, stale)
+            if stale & force_keys:
+                self.check_force_zones()
+            try:
+                if self.n_shards > 1:
+                    self.run_sharded(only=stale)
+                else:
+                    self.create_jou_content(only=stale)
+                    rc = self.run_jou_file(n_threads=self.threads_per_shard)
+                    if rc != 0:
+                        raise RuntimeError(f"Fluent failed with code {rc}")
+                if stale & force_keys:
+                    self.get_excel_data()
+                if self.export_planes:
+                    self.convert_plane_exports(stale)
+            finally:
+                with self.tracer.stage("manifest update"):
+                    manifest.update(self.out_dir, expected, stale)
+
+        if not stale & force_keys:
+            if self.write_sheet and not (self.forces_dir / "aero force sheet.xlsx").exists():
+                self.get_excel_data()
+            else:
+                self.read_forces()
+        if self.export_planes:
+            self.write_plane_metrics()
+        if self.optimize_images:
+            changed = self.optimize_image_folders()
+            if changed:
+                # the cropped pictures are the artifacts now, they must not look stale next run
+                with self.tracer.stage("manifest update"):
+                    manifest.update(self.out_dir, expected, {self.artifact_key(path) for path in changed})
+        if self.pack_stacks:
+            self.pack_image_stacks()
+        if self.progress_callback is not None:
+            self.progress_callback(100)
+
+    def case_info(self) -> Optional[CaseInfo]:
+        if self.catalog is None:
+            return None
+        return self.catalog.get(self.case_file_path)
+
+    def mesh_cells(self) -> int:
+        info = self.case_info()
+        size_mb = sum(path.stat().st_size for path in self.case_files()) / 2**20
+        return estimate_cells(info.cell_count if info else None, size_mb)
+
+    def tuned_threads(self) -> int:
+        # one case on its own, the shards share the machine
+        tuner = Tuner(self.run_history, cores=max((os.cpu_count() or 8) // self.n_shards, 1))
+        threads, _ = tuner.plan(self.mesh_cells())
+        print(f"Using {threads} threads per Fluent process (from mesh size and run history)")
+        return threads
+
+    def record_run(self, tracker: ProgressTracker, n_threads: int):
+        # time of a full sweep with n_threads, also if only a part of the sweep was rendered
+        if tracker.total < 5:
+            return
+        read_s = sum(tracker.durations.get("case/read", [0.0]))
+        step_s = (tracker.elapsed_s() - read_s) / max(tracker.total - 1, 1)
+        run_s = read_s + step_s * len(self.expected_artifacts())
+        self.run_history.record(self.mesh_cells(), n_threads, run_s, steps=tracker.total)
+
+    def check_force_zones(self):
+        # a zone name Fluent doesn't know only shows up as an error in the transcript
+        info = self.case_info()
+        for command in self.sweep_plan()["forces"]:
+            if "wall-moments" not in command:
+                continue
+            tokens = command.split()
+            zones = tokens[2:tokens.index("()")]
+            missing = missing_zones(info, zones)
+            if missing:
+                print(f"Warning: zones {', '.join(missing)} of the moment report are not in {self.case_file_path.name}")
+
+    def case_files(self) -> list[Path]:
+        files = [self.case_file_path]
+        data_file = self.case_file_path.with_name(self.case_file_path.name.replace(".cas.h5", ".dat.h5"))
+        if data_file.exists():
+            files.append(data_file)
+        return files
+
+    def create_folder_struct(self, case_file_path: Path):
+        # a case folder is still accepted, its case is picked by the catalog (same case every time)
+        if case_file_path.is_dir():
+            case_file_path = (self.catalog or CaseCatalog()).find_case(case_file_path)
+        self.case_file_path = case_file_path
+        self.work_dir = case_file_path.parent
         self.out_dir = self.work_dir / "processed"
         self.out_dir.mkdir(parents=True, exist_ok=True)
-        self.jou_path = Path(os.path.abspath(r"data\v0.1_sequence.jou"))
+        # journal lives next to the results so several cases can be processed at once
+        self.jou_path = self.out_dir / "v0.1_sequence.jou"
         self.images_dir = self.out_dir / "images"
         self.images_dir.mkdir(parents=True, exist_ok=True)
-        self.front_vel_dir = self.images_dir / "front_vel"
-        self.front_vel_dir.mkdir(parents=True, exist_ok=True)
-        self.front_pr_dir = self.images_dir / "front_pressure"
-        self.front_pr_dir.mkdir(parents=True, exist_ok=True)
-        self.side_vel_dir = self.images_dir / "side_vel"
-        self.side_vel_dir.mkdir(parents=True, exist_ok=True)
-        self.side_pr_dir = self.images_dir / "side_pressure"
-        self.side_pr_dir.mkdir(parents=True, exist_ok=True)
-        self.side_heli_dir = self.images_dir / "side_heli"
-        self.side_heli_dir.mkdir(parents=True, exist_ok=True)
-        self.front_heli_dir = self.images_dir / "front_heli"
-        self.front_heli_dir.mkdir(parents=True, exist_ok=True)
         self.forces_dir = self.out_dir / "forces"
         self.forces_dir.mkdir(parents=True, exist_ok=True)
+        # only used with export_planes
+        self.planes_dir = self.out_dir / "planes"
+        self.metrics_dir = self.out_dir / "metrics"
 
-    def create_jou_content(self):
-        # --- Parameters of sequence ---
-        start_z = 0.0
-        end_z = 0.760  # 740 mm
-        num_images_y = 30
-        num_images_x = 45
-        z_positions = np.linspace(start_z, end_z, num_images_y)
-
-        start_x = 1.850
-        end_x = -1.250 
-        x_positions = np.linspace(start_x, end_x, num_images_x)
-        # --- creating jou content ---ok
-        
+    def sweep_plan(self) -> dict:
+        # compiled from the sweep definition, the folders of the renders are in processed/images
+        return compile_plan(self.sweep_definition, self.images_dir)
 
+    def artifact_key(self, path: Path) -> str:
+        return path.relative_to(self.out_dir).as_posix()
 
-        jou_content = f"""; 2344
-            /file/read-case-data "{self.case_file_path.as_posix()}"
-            /file/set-batch-options no yes yes no
-            /display/set-window 1
-            /views/camera/projection orthographic
-            /display/set/contours filled yes
-            /display/set/contours clip-to-range no
-            /views/apply-mirror-planes symmetry ()
-            
-            /report/forces/wall-forces yes 0 0 1 yes df.csv
-            /report/forces/wall-forces yes 1 0 0 yes drag.csv
-            /report/forces/wall-moments no front-wing front-wheel rear-wing rear-wheel sidepod chassis () 0.7655 0.7375 0.200699 0 1 0 yes moment.csv
-
-            /display/surface/iso-surface velocity velo_iso () () 5 ()
-            /display/set/contours surfaces velo_iso ()
-            /display/contour/pressure -600 100
-            /views/auto-scale   
-            /views/camera/target 0.5 0.1 0
-            /views/camera/position 0.5 0.1 -1
-            /views/camera/up-vector 0 1 0
-            /views/camera/zoom-camera 1.5
-            /display/save-picture "Processed/images/bottom_iso.png"
-
-            /display/display/surface-mesh symmetry()
-            /views/camera/target 0.4 0 1
-            /views/camera/position 0.4 1 1
-            /views/camera/up-vector 0 0 1   
-            """ 
-
-        for i, z in enumerate(z_positions):
-            s_name = f"plane_z_{i:02d}"
-            img_vel = f"Processed/Images/side_vel/side_vel_{i:02d}.png"
-            img_pressure = f"Processed/Images/side_pressure/side_pressure_{i:02d}.png"
-            img_heli = f"Processed/Images/side_heli/side_heli_{i:02d}.png"
-            
-            jou_content += f"""
-                ; --- Image {i+1}/{num_images_y} at Z = {z:.4f} ---
-                /surface/plane-surface {s_name} z {z:.4f}
-                /display/set/contours surfaces {s_name} ()
-                /display/contour/velocity-magnitude 0 35   
-                /display/save-picture "{img_vel}"
-                /display/contour/total-pressure -300 350
-                /display/save-picture "{img_pressure}"
-                /display/contour/helicity -10000 10000
-                /display/save-picture "{img_heli}"
-                /surface/delete {s_name}
-                """
-
-        jou_content += f"""
-            views/apply-mirror-planes symmetry ()
-            /display/display/surface-mesh Inlet()
-            /views/auto-scale
-            /views/camera/target 0 0 0.8
-            /views/camera/position 1 0 0.8
-            /views/camera/up-vector 0 0 1
-            /views/camera/zoom-camera 4
-            """       
-
-        for i, y in enumerate(x_positions):
-            s_name = f"plane_x_{i:02d}"
-            img_vel = f"Processed/Images/front_vel/front_vel_{i:02d}.png"
-            img_pressure = f"Processed/Images/front_pressure/front_pressure_{i:02d}.png"
-            img_heli = f"Processed/Images/front_heli/front_heli_{i:02d}.png"
-        
-            
-            jou_content += f"""
-                ; --- Image {i+1}/{num_images_x} at x = {y:.4f} ---
-                /surface/plane-surface {s_name} y {y:.4f}
-                /display/set/contours surfaces {s_name} ()
-                /display/contour/velocity-magnitude 0 35
-                /display/save-picture "{img_vel}"
-                /display/contour/total-pressure -300 300
-                /display/save-picture "{img_pressure}"
-                /display/contour/helicity -10000 10000
-                /display/save-picture "{img_heli}"
-                /surface/delete {s_name}
-                """
-            
-        jou_content += "\n/exit yes"
-        
-        self.jou_path.write_text(jou_content, encoding="utf-8")
-
-    def run_jou_file(self, timeout_s = 2000):
-        print("Running Fluent (Mode Batch)...")
-
-        with open(self.jou_path) as f:
-            first_line = f.readline().strip()
-            # remove a possible leading ';' or '#' used as comment
-            first_line = first_line.lstrip(';#').strip()
-            n_lines = int(first_line)
-
-        cmd = [str(self.fluent_exe_path), "3d", "-t8", "-gu", "-i", self.jou_path]
-        start = time.time()
-        proc = subprocess.Popen(
-            cmd,
-            cwd=str(self.work_dir),
-            stdout=subprocess.PIPE,
-            stderr=subprocess.STDOUT,
-            text=True,
-            bufsize=1,
-            universal_newlines=True,
-            )
-        assert proc.stdout is not None
-        try:
-            update_counter = 0
-            for line_counter, line in enumerate(proc.stdout):
-                update_counter += 1
-                if line_counter == 0:
-                    self.jou_progress(n_lines, line_counter)
+    def expected_artifacts(self) -> dict[str, str]:
+        '''
+            Every output of the sweep with the journal commands ("recipe")
+            that produce it. A changed recipe makes the artifact stale.
+        '''
+        plan = self.sweep_plan()
+        artifacts = {}
+        for name in ("df.csv", "drag.csv", "moment.csv"):
+            artifacts[self.artifact_key(self.forces_dir / name)] = "\n".join(plan["forces"])
+        if "bottom" in plan:
+            artifacts[self.artifact_key(plan["bottom"]["path"])] = "\n".join(plan["bottom"]["setup"])
+        for view in PLANE_VIEWS:
+            if view not in plan:
+                continue
+            sweep = plan[view]
+            for i, pos in enumerate(sweep["positions"]):
+                for contour, folder, prefix in sweep["renders"]:
+                    recipe = sweep["setup"] + [f"plane-surface {sweep['axis']} {pos:.4f}", f"contour {contour}"]
+                    artifacts[self.artifact_key(folder / f"{prefix}_{i:02d}.png")] = "\n".join(recipe)
+                if self.export_planes:
+                    recipe = [f"plane-surface {sweep['axis']} {pos:.4f}", f"export {' '.join(FIELD_VARIABLES)}"]
+                    artifacts[self.artifact_key(self.plane_export_path(view, i))] = "\n".join(recipe)
+        return artifacts
+
+    def plane_export_path(self, view: str, index: int) -> Path:
+        # the converted .npy is the artifact, Fluent writes the .txt next to it
+        return self.planes_dir / f"{self.sweep_plan()[view]['export']}_{index:02d}.npy"
+
+    def setup_lines(self) -> list[str]:
+        return [
+            "/file/set-batch-options no yes yes no",
+            "/display/set-window 1",
+            "/views/camera/projection orthographic",
+            "/display/set/contours filled yes",
+            "/display/set/contours clip-to-range no",
+            "/views/apply-mirror-planes symmetry ()",
+            "",
+        ]
+
+    def sweep_lines(self,
+                    plan: Optional[dict] = None,
+                    z_indices: Optional[list[int]] = None,
+                    x_indices: Optional[list[int]] = None,
+                    with_forces: bool = True,
+                    only: Optional[set[str]] = None,
+                    planes_dir: Optional[Path] = None) -> list[str]:
+        '''
+            Journal commands of the sweep, without reading the case and exiting.
+            planes_dir: where the plane exports go, default self.planes_dir.
+            Sets self.jou_renders to the number of report/picture commands.
+        '''
+        if plan is None:
+            plan = self.sweep_plan()
+        if planes_dir is None:
+            planes_dir = self.planes_dir
+        # a shard only renders a subset of the planes, default is the full sweep
+        if z_indices is None and "side" in plan:
+            z_indices = list(range(len(plan["side"]["positions"])))
+        if x_indices is None and "front" in plan:
+            x_indices = list(range(len(plan["front"]["positions"])))
+
+        def wanted(path: Path) -> bool:
+            return only is None or self.artifact_key(path) in only
+
+        lines = []
+        # number of report/picture commands, 0 means there is nothing to run
+        self.jou_renders = 0
+
+        if with_forces:
+            if any(wanted(self.forces_dir / name) for name in ("df.csv", "drag.csv", "moment.csv")):
+                lines += plan["forces"] + [""]
+                self.jou_renders += len(plan["forces"])
+            if "bottom" in plan and wanted(plan["bottom"]["path"]):
+                self.jou_renders += 1
+                lines += plan["bottom"]["setup"]
+                lines += [f'/display/save-picture "{plan["bottom"]["path"].as_posix()}"', ""]
+
+        for view, indices in (("side", z_indices), ("front", x_indices)):
+            if view not in plan:
+                continue
+            sweep = plan[view]
+            plane_lines = []
+            for i in indices:
+                pos = sweep["positions"][i]
+                renders = [(contour, folder / f"{prefix}_{i:02d}.png")
+                           for contour, folder, prefix in sweep["renders"]
+                           if wanted(folder / f"{prefix}_{i:02d}.png")]
+                export = planes_dir / f"{sweep['export']}_{i:02d}.npy"
+                export = export if self.export_planes and wanted(export) else None
+                if not renders and export is None:
                     continue
-                print(line, end="")
-                sys.stdout.flush()
-                self.jou_progress(n_lines, line_counter)
-                if time.time() - start > timeout_s:
-                    proc.kill()
-                    raise TimeoutError(f"Process was longer than {timeout_s}s.")
-        finally:
-            try:
-                proc.stdout.close()
-            except Exception:
-                pass
-        rc = proc.wait()
+                s_name = f"{sweep['surface']}_{i:02d}"
+                plane_lines += [
+                    f"; --- Image {i+1}/{len(sweep['positions'])} at {sweep['axis']} = {pos:.4f} ---",
+                    f"/surface/plane-surface {s_name} {sweep['axis']} {pos:.4f}",
+                    f"/display/set/contours surfaces {s_name} ()",
+                ]
+                self.jou_renders += len(renders)
+                for contour, img in renders:
+                    plane_lines += [
+                        f"/display/contour/{contour}",
+                        f'/display/save-picture "{img.as_posix()}"',
+                    ]
+                if export is not None:
+                    self.jou_renders += 1
+                    plane_lines.append(export_command(export.with_suffix(".txt"), s_name))
+                plane_lines += [f"/surface/delete {s_name}", ""]
+            # camera setup only if the view has something to render
+            if plane_lines:
+                lines += sweep["setup"] + [""] + plane_lines
+        return lines
+
+    @traced()
+    def create_jou_content(self,
+                           z_indices: Optional[list[int]] = None,
+                           x_indices: Optional[list[int]] = None,
+                           jou_path: Optional[Path] = None,
+                           with_forces: bool = True,
+                           only: Optional[set[str]] = None) -> Path:
+        '''
+            z_indices / x_indices select the planes of a shard, with_forces adds
+            the force reports and the bottom view. If only is given, just the
+            artifacts with these keys (see expected_artifacts) are rendered.
+        '''
+        if jou_path is None:
+            jou_path = self.jou_path
+
+        # --- creating jou content ---ok
+        lines = [f'/file/read-case-data "{self.case_file_path.as_posix()}"'] + self.setup_lines()
+        lines += self.sweep_lines(None, z_indices, x_indices, with_forces, only)
+        lines.append("/exit yes")
+        optimized = optimize_journal(lines)
+        print(f"{jou_path.name}: {self.jou_renders} renders and reports ({self.sweep_path.name}), "
+              f"{len(lines) - len(optimized)} redundant settings dropped")
+        lines = optimized
+        if self.export_planes:
+            # Fluent doesn't create the folder of an export
+            self.planes_dir.mkdir(parents=True, exist_ok=True)
+
+        # progress is tracked per step (see progress.py), the journal needs no line count header
+        jou_content = "\n".join(lines) + "\n"
+
+        jou_path.write_text(jou_content, encoding="utf-8")
+        return jou_path
+
+    def fluent_command(self, jou_path: Optional[Path], n_threads: int) -> list[str]:
+        # without a journal Fluent reads its commands from stdin
+        cmd = [str(self.fluent_exe_path), "3d", f"-t{n_threads}", "-gu"]
+        if jou_path is not None:
+            cmd += ["-i", str(jou_path)]
+        # the stand-in executable (scripts/fake_fluent.py) is run with the current interpreter
+        if str(self.fluent_exe_path).endswith(".py"):
+            cmd.insert(0, sys.executable)
+        return cmd
+
+    @traced()
+    def run_jou_file(self, timeout_s = 2000,
+                     jou_path: Optional[Path] = None,
+                     n_threads: Optional[int] = None,
+                     progress: Optional[Callable[[ProgressEvent], None]] = None,
+                     prefix: str = "",
+                     idle_timeout_s: Optional[float] = 900) -> int:
+        '''
+            timeout_s: wall-clock limit of the whole run
+            idle_timeout_s: limit for Fluent printing nothing (hung licence checkout, dead solver)
+        '''
+        # a shard that starts after another one failed or the run was cancelled
+        if self.cancel_event.is_set():
+            raise ProcessCancelled("Processing was cancelled.")
+        print(f"{prefix}Running Fluent (Mode Batch)...")
+        if jou_path is None:
+            jou_path = self.jou_path
+        if progress is None:
+            progress = self.report_progress
+        n_threads = n_threads or self.threads_per_shard
+
+        bucket = mesh_bucket(self.case_files(), n_threads)
+        tracker = ProgressTracker(jou_path, self.step_timings.estimates(bucket), progress)
+
+        def on_line(line):
+            # runs on the reader thread of the supervisor, the transcript itself goes to the log file
+            tracker.feed_line(line)
+
+        def on_state(state):
+            # waiting for a process slot or in the batch queue
+            if state == "RUNNING":
+                # queue time is neither Fluent's speed nor part of the ETA
+                tracker.reset_clock()
+            progress(ProgressEvent("queue", -1, state.lower(), tracker.done, tracker.total,
+                                   tracker.fraction, tracker.elapsed_s(), tracker.eta_s()))
+
+        log_path = jou_path.with_suffix(".log")
+        supervisor = self.executor.start(self.fluent_command(jou_path, n_threads), self.work_dir,
+                                         log_path=log_path,
+                                         n_threads=n_threads,
+                                         timeout_s=timeout_s,
+                                         idle_timeout_s=idle_timeout_s,
+                                         on_line=on_line,
+                                         cancel_event=self.cancel_event,
+                                         on_state=on_state,
+                                         outputs=tuple(step.artifact for step in tracker.steps if step.artifact),
+                                         jou_path=jou_path)
+        self.supervisors.append(supervisor)
+        try:
+            rc = supervisor.run()
+        except Exception:
+            print(f"\n{prefix}Last lines of the Fluent transcript ({log_path}):\n{supervisor.tail(20)}")
+            raise
+        # steps inferred from the transcript: case loading, iso-surface, plane renders ...
+        lane = f"Fluent {prefix.strip()}".strip()
+        for step, start, end in tracker.spans:
+            plane = {"plane": step.index} if step.index >= 0 else {}
+            self.tracer.add(f"{step.stage} {step.quantity}", lane, start, end, **plane)
+        self.tracer.add("fluent process", lane, tracker.start_time, tracker.start_time + tracker.elapsed_s(),
+                        rc=rc, transcript_lines=supervisor.n_lines, children_peak_rss_mb=peak_rss_mb(children=True))
         if rc == 0:
-            print(f"\n Images saved in: {self.out_dir}")
-            print(f"\nLenght of jou file: {update_counter} lines")
+            tracker.finish()
+            self.step_timings.record(bucket, tracker.durations)
+            self.record_run(tracker, n_threads)
+            print(f"\n{prefix} Images saved in: {self.out_dir}")
+            print(f"{prefix}{tracker.total} steps in {format_eta(tracker.elapsed_s())}, transcript: {supervisor.n_lines} lines")
         else:
-            print(f"\n Error occoured in process: (Code {rc})")
-
-    def jou_progress(self, n_lines, line_counter):
+            print(f"\n{prefix} Error occoured in process: (Code {rc})")
+            print(f"{prefix}Last lines of the Fluent transcript ({log_path}):\n{supervisor.tail(20)}")
+        return rc
+
+    def cancel(self):
+        # safe to call from any thread, the supervisors stop Fluent and run() raises ProcessCancelled
+        self.cancel_event.set()
+
+    @traced()
+    def run_sharded(self, n_shards: Optional[int] = None, threads_per_shard: Optional[int] = None, timeout_s = 2000,
+                    only: Optional[set[str]] = None):
+        n_shards = n_shards or self.n_shards
+        threads_per_shard = threads_per_shard or self.threads_per_shard
+        plan = self.sweep_plan()
+
+        # split both plane ranges so every shard gets side and front planes
+        z_chunks = split_indices(len(plan["side"]["positions"]) if "side" in plan else 0, n_shards)
+        x_chunks = split_indices(len(plan["front"]["positions"]) if "front" in plan else 0, n_shards)
+        jou_paths = []
+        for k in range(n_shards):
+            jou_path = self.create_jou_content(
+                z_indices=z_chunks[k],
+                x_indices=x_chunks[k],
+                jou_path=self.jou_path.with_name(f"{self.jou_path.stem}_shard{k}.jou"),
+                with_forces=(k == 0),
+                only=only,
+            )
+            # shards without missing work don't need a Fluent process
+            if self.jou_renders:
+                jou_paths.append(jou_path)
+        n_shards = len(jou_paths)
+        if n_shards == 0:
+            return
+
+        # merged progress: every shard reports its own fraction, the callback gets the mean
+        shard_fractions = [0.0] * n_shards
+        lock = threading.Lock()
+
+        shard_etas = [0.0] * n_shards
+
+        def shard_progress(k):
+            def progress(event: ProgressEvent):
+                with lock:
+                    shard_fractions[k] = event.fraction
+                    shard_etas[k] = event.eta_s
+                    # the shards run in parallel, the slowest one decides
+                    self.eta_s = max(shard_etas)
+                    self.jou_progress(sum(shard_fractions) / n_shards)
+                    self.print_event(event, f"[shard {k}] ")
+                    if self.event_callback is not None:
+                        self.event_callback(event._replace(eta_s=self.eta_s))
+            return progress
+
+        failed = []
+        # only the runs of this sweep are stopped when a shard fails
+        self.supervisors = []
+        # stops shards that haven't started yet, without cancelling the processor
+        shard_stop = threading.Event()
+
+        def run_shard(k):
+            if shard_stop.is_set():
+                raise RuntimeError("not started, another shard failed")
+            return self.run_jou_file(timeout_s, jou_paths[k], threads_per_shard,
+                                     shard_progress(k), prefix=f"[shard {k}] ")
+
+        with ThreadPoolExecutor(max_workers=n_shards) as pool:
+            futures = {pool.submit(run_shard, k): k for k in range(n_shards)}
+            for future in as_completed(futures):
+                k = futures[future]
+                try:
+                    rc = future.result()
+                except Exception as e:
+                    rc = str(e)
+                if rc != 0:
+                    failed.append((k, rc))
+                    # one broken shard fails the whole run, no need to wait for the others
+                    shard_stop.set()
+                    for supervisor in list(self.supervisors):
+                        supervisor.stop()
+
+        if self.cancel_event.is_set():
+            raise ProcessCancelled("Processing was cancelled.")
+        if failed:
+            raise RuntimeError("Fluent shard(s) failed: " + ", ".join(f"shard {k} ({rc})" for k, rc in sorted(failed)))
+
+    def print_event(self, event: ProgressEvent, prefix: str = ""):
+        if event.stage == "queue":
+            print(f"{prefix}Fluent {event.quantity}")
+            return
+        plane = f" plane {event.index + 1}" if event.index >= 0 else ""
+        print(f"{prefix}{event.stage} {event.quantity}{plane} done ({event.done}/{event.total}), "
+              f"{event.fraction:.0%}, ETA {format_eta(event.eta_s)}")
+
+    def report_progress(self, event: ProgressEvent):
+        self.eta_s = event.eta_s
+        self.jou_progress(event.fraction)
+        self.print_event(event)
+        if self.event_callback is not None:
+            self.event_callback(event)
+
+    def jou_progress(self, fraction: float):
         if self.progress_flag == False:
             self.progress_old = 0
             self.progress = 0
             self.progress_flag = True
         else:
             self.progress_old = self.progress
-        self.progress = round(line_counter/n_lines * 100)
-        if self.progress != self.progress_old:
+        self.progress = round(fraction * 100)
+        if self.progress != self.progress_old and self.progress_callback is not None:
             self.progress_callback(self.progress)
             
+    def image_folders(self) -> list[Path]:
+        # images/ itself for the bottom view and one folder per render of the sweep
+        plan = self.sweep_plan()
+        return [self.images_dir] + [folder for view in PLANE_VIEWS if view in plan
+                                    for _, folder, _ in plan[view]["renders"]]
+
+    @traced()
+    def convert_plane_exports(self, keys: set[str]):
+        # Fluent's ASCII exports of this run -> .npy, before the manifest records them
+        txt_paths = []
+        for key in sorted(keys):
+            path = self.out_dir / key
+            if path.parent == self.planes_dir and path.with_suffix(".txt").exists():
+                txt_paths.append(path.with_suffix(".txt"))
+        if txt_paths:
+            print(f"Converting {len(txt_paths)} plane exports")
+            convert_exports(txt_paths)
+
+    @traced()
+    def write_plane_metrics(self) -> list[Path]:
+        written = write_metrics(self.planes_dir, self.metrics_dir, self.sweep_plan())
+        for path in written:
+            print(f"Plane metrics saved in: {path}")
+        return written
+
+    def series_recipes(self) -> dict[Path, str]:
+        # what decides where the content of a series' pictures is, a change makes its crop box outdated
+        plan = self.sweep_plan()
+        recipes = {}
+        if "bottom" in plan:
+            recipes[self.images_dir] = "\n".join(plan["bottom"]["setup"])
+        for view in PLANE_VIEWS:
+            if view not in plan:
+                continue
+            sweep = plan[view]
+            planes = f"{sweep['surface']} {sweep['axis']} " + " ".join(f"{pos:.4f}" for pos in sweep["positions"])
+            for contour, folder, _ in sweep["renders"]:
+                recipes[folder] = "\n".join(sweep["setup"] + [planes, f"contour {contour}"])
+        return recipes
+
+    @traced()
+    def optimize_image_folders(self, fmt: str = "png") -> list[Path]:
+        changed = optimize_folders(self.image_folders(), fmt=fmt, recipes=self.series_recipes())
+        if changed:
+            print(f"Cropped and recompressed {len(changed)} pictures")
+        return changed
+
+    @traced()
+    def pack_image_stacks(self, compression: str = "none") -> list[Path]:
+        plan = self.sweep_plan()
+        stacks = []
+        for view in PLANE_VIEWS:
+            if view not in plan:
+                continue
+            sweep = plan[view]
+            for _, folder, _ in sweep["renders"]:
+                stack_path = folder.with_suffix(".stack")
+                # up to date as long as nothing was written to the folder after packing
+                if stack_path.exists() and stack_path.stat().st_mtime >= folder.stat().st_mtime:
+                    stacks.append(stack_path)
+                    continue
+                stacks.append(pack_series(folder, stack_path, sweep["positions"], sweep["axis"], compression))
+                print(f"Packed {folder.name} into {stack_path}")
+        return stacks
+
+    @traced()
     def get_excel_data(self):
+        self.collect_force_reports()
+        reports = self.read_forces()
+        print(self.forces)
+        self.store_results(reports)
+        self.write_to_forcesheet()
+
+    @traced()
+    def collect_force_reports(self):
+        # Fluent writes the reports into the case folder
         source = self.work_dir / "df.csv"
         destination = self.forces_dir
         try:
@@ -227,58 +673,30 @@ class FluentPostProcesser():
         except:
             print("Couldn't find moment.csv")
 
-        df = pd.read_csv(
-            self.forces_dir / "df.csv",
-            skiprows=19,
-            sep=r"\s+",
-            engine="python"
-            )
-
-        drag = pd.read_csv(
-            self.forces_dir / "drag.csv",     # chemin vers ton fichier
-            skiprows=19,        # ignore les 19 premières lignes
-            sep=r"\s+",         # 1 ou plusieurs espaces comme séparateur
-            engine="python"     # nécessaire pour les regex
-            )
-        
-        moment = pd.read_csv(
-            self.forces_dir / "moment.csv",     # chemin vers ton fichier
-            skiprows=16,
-            sep=r"\s+",
-            engine="python",
-            on_bad_lines="skip",
-            )
-        
-
-        df_list = pd.to_numeric(df["Total"], errors="coerce").tolist()
-        drag_list = pd.to_numeric(drag["Total"], errors="coerce").tolist()
-
-        idx = {
-        "chassis": 1,
-        "front-wheel": 3,
-        "front-wing": 4,
-        "rear-wheel": 5,
-        "rear-wing": 6,
-        "sidepod": 8,
-        }
-
-        drag_fw = float(drag_list[idx["front-wing"]])
-        drag_sp = float(drag_list[idx["sidepod"]])
-        drag_rw = float(drag_list[idx["rear-wing"]])
-        drag_rwh = float(drag_list[idx["rear-wheel"]])
-        drag_fwh = float(drag_list[idx["front-wheel"]])
-        drag_ch = float(drag_list[idx["chassis"]])
+    @traced()
+    def read_forces(self) -> dict[str, ForceReport]:
+        # parses the reports in processed/forces and sets self.forces
+        df = parse_force_report(self.forces_dir / "df.csv")
+        drag = parse_force_report(self.forces_dir / "drag.csv")
+        moment = parse_force_report(self.forces_dir / "moment.csv")
+
+        drag_fw = drag.total("front-wing")
+        drag_sp = drag.total("sidepod")
+        drag_rw = drag.total("rear-wing")
+        drag_rwh = drag.total("rear-wheel")
+        drag_fwh = drag.total("front-wheel")
+        drag_ch = drag.total("chassis")
         drag_net = drag_fw + drag_sp + drag_rw + drag_rwh + drag_fwh + drag_ch
 
-        df_fw = float(df_list[idx["front-wing"]])
-        df_sp = float(df_list[idx["sidepod"]])
-        df_rw = float(df_list[idx["rear-wing"]])
-        df_rwh = float(df_list[idx["rear-wheel"]])
-        df_fwh = float(df_list[idx["front-wheel"]])
-        df_ch = float(df_list[idx["chassis"]])
+        df_fw = df.total("front-wing")
+        df_sp = df.total("sidepod")
+        df_rw = df.total("rear-wing")
+        df_rwh = df.total("rear-wheel")
+        df_fwh = df.total("front-wheel")
+        df_ch = df.total("chassis")
         df_net = df_fw + df_sp + df_rw + df_rwh + df_fwh + df_ch
 
-        moment_net = float(moment["Total"][7])
+        moment_net = moment.net_total()
 
 
         self.forces = [
@@ -292,15 +710,34 @@ class FluentPostProcesser():
         df_net,
         moment_net
         ]
-        print(self.forces)
-        self.write_to_forcesheet()
+        return {"df": df, "drag": drag, "moment": moment}
 
+    @traced()
+    def store_results(self, reports: dict):
+        if self.results_db is None:
+            return
+        # the database is a convenience, a locked or broken db must not fail the run
+        try:
+            store = ResultsStore(self.results_db)
+            store.insert_run(
+                self.work_dir,
+                reports,
+                case_hash=case_hash_from_manifest(self.out_dir),
+                processed_at=max((self.forces_dir / f"{name}.csv").stat().st_mtime for name in reports),
+                metadata={
+                    "case_file": str(self.case_file_path),
+                    "fluent_exe": str(self.fluent_exe_path),
+                    "n_shards": self.n_shards,
+                    "threads_per_shard": self.threads_per_shard,
+                    "forces": self.forces,
+                },
+            )
+            store.close()
+        except Exception as e:
+            print(f"Couldn't store results in {self.results_db}: {e}")
+
+    @traced()
     def write_to_forcesheet(self):
-        source = r"data\aero force sheet.xlsx"
-        destination = self.forces_dir
-        shutil.copy2(source, destination)
-        self.force_book = load_workbook(self.forces_dir / "aero force sheet.xlsx")
-        self.force_sheet = self.force_book.active
         '''
             forces must be in following format:
                 [Drag Frontwing,
@@ -313,16 +750,8 @@ class FluentPostProcesser():
                  Downforce Net,
                  Moment around front axis]
         '''
-        force_sheet_index = pd.read_csv(r"data\aero force sheet idx.csv")
-        force_sheet_index.columns = force_sheet_index.columns.str.strip()
-
-        assert len(self.forces) == len(force_sheet_index["rows"])
-
-        assert self.force_sheet["A1"].value == "v1.0"
-
-        for i, row in enumerate(force_sheet_index["rows"]):
-            self.force_sheet.cell(row=row, column=force_sheet_index.iloc[i, 2], value=self.forces[i])
-        
-        self.force_book.save(self.forces_dir / "aero force sheet.xlsx")
-        print(f"Forces saved in: {self.forces_dir}"+r"\aero force sheet.xlsx")
-
+        # batch runs export all cases at once (force_sheet.export_batch) instead
+        if not self.write_sheet:
+            return
+        destination = write_forcesheet(self.forces, self.forces_dir / "aero force sheet.xlsx")
+        print(f"Forces saved in: {destination}")
@@ -0,0 +1,259 @@
+"""
+Long-lived Fluent session that reads the case once and renders follow-up
+requests (extra planes, other contour ranges, a new camera) without reading
+the case again.
+
+run with: python -m scripts.fluent_session <fluent.exe> <case.cas.h5> --port 5050
+and send requests with scripts.fluent_session.request(5050, {...}).
+
+The pictures and plane exports of a request go to processed/session, the
+results of the full sweep in processed/images are never overwritten.
+"""
+from __future__ import annotations
+import argparse
+import copy
+import json
+import queue
+import shlex
+import socket
+import socketserver
+import subprocess
+import threading
+import time
+from pathlib import Path
+from typing import Optional
+
+from scripts.fluent_processing import FluentPostProcesser
+from scripts.sweep_definition import PLANE_VIEWS, optimize_journal
+
+SESSION_DIR = "session"
+
+
+def apply_overrides(plan: dict, overrides: dict, images_dir: Path) -> dict:
+    '''
+        overrides has the layout of FluentPostProcesser.sweep_plan, e.g.
+            {"side": {"positions": [0.1, 0.2],
+                      "renders": [["velocity-magnitude 0 20", "side_vel_slow", "side_vel"]]},
+             "front": {"setup": [...camera commands...]}}
+        Render folders are given relative to the images folder (processed/session/images
+        in a session).
+    '''
+    plan = copy.deepcopy(plan)
+    for view, changes in overrides.items():
+        if view not in plan:
+            raise KeyError(f"Unknown view in request: {view}")
+        for key, value in changes.items():
+            if key == "renders":
+                value = [(contour, images_dir / folder, prefix) for contour, folder, prefix in value]
+            elif key == "path":
+                value = images_dir / value
+            plan[view][key] = value
+    return plan
+
+
+def redirect(plan: dict, images_dir: Path, target_dir: Path) -> dict:
+    # pictures of the plan below images_dir are written below target_dir instead
+    def move(path: Path) -> Path:
+        try:
+            return target_dir / Path(path).relative_to(images_dir)
+        except ValueError:
+            return Path(path)
+
+    plan = copy.deepcopy(plan)
+    if "bottom" in plan:
+        plan["bottom"]["path"] = move(plan["bottom"]["path"])
+    for view in PLANE_VIEWS:
+        if view in plan:
+            plan[view]["renders"] = [(contour, move(folder), prefix) for contour, folder, prefix in plan[view]["renders"]]
+    return plan
+
+
+class FluentSession():
+    def __init__(self, processor: FluentPostProcesser, n_threads: int = 8, output_dir: Optional[Path] = None):
+        self.processor = processor
+        # follow-up renders are kept apart from the results of the sweep
+        self.output_dir = output_dir if output_dir is not None else processor.out_dir / SESSION_DIR
+        self.n_threads = n_threads
+        self.proc: Optional[subprocess.Popen] = None
+        self.lines: queue.Queue = queue.Queue()
+        self.lock = threading.Lock()
+        self.request_id = 0
+
+    def start(self, timeout_s = 3600):
+        cmd = self.processor.fluent_command(None, self.n_threads)
+        self.proc = subprocess.Popen(
+            cmd,
+            cwd=str(self.processor.work_dir),
+            stdin=subprocess.PIPE,
+            stdout=subprocess.PIPE,
+            stderr=subprocess.STDOUT,
+            text=True,
+            bufsize=1,
+            )
+        threading.Thread(target=self.read_output, daemon=True).start()
+        start = time.time()
+        self.execute([f'/file/read-case-data "{self.processor.case_file_path.as_posix()}"']
+                     + self.processor.setup_lines(), timeout_s)
+        print(f"Fluent session ready after {time.time() - start:.1f}s")
+
+    def read_output(self):
+        assert self.proc is not None and self.proc.stdout is not None
+        for line in self.proc.stdout:
+            self.lines.put(line)
+        self.lines.put(None)
+
+    def execute(self, commands: list[str], timeout_s = 2000) -> list[str]:
+        '''
+            Sends the commands and blocks until Fluent has worked through them.
+            Returns the transcript of this request.
+        '''
+        if self.proc is None or self.proc.poll() is not None:
+            raise RuntimeError("Fluent session is not running")
+        with self.lock:
+            self.request_id += 1
+            # Fluent prints the marker once every command before it is done,
+            # split in the command so the echo of the command doesn't contain it
+            marker = f"@@done {self.request_id}@@"
+            commands = [cmd for cmd in commands if cmd.strip() and not cmd.strip().startswith(";")]
+            text = "\n".join(commands + [f'(begin (display "@@done ") (display {self.request_id}) (display "@@") (newline))']) + "\n"
+            assert self.proc.stdin is not None
+            self.proc.stdin.write(text)
+            self.proc.stdin.flush()
+
+            transcript = []
+            deadline = time.time() + timeout_s
+            while True:
+                try:
+                    line = self.lines.get(timeout=max(deadline - time.time(), 0.01))
+                except queue.Empty:
+                    raise TimeoutError(f"Fluent request took longer than {timeout_s}s.")
+                if line is None:
+                    raise RuntimeError(f"Fluent session ended (Code {self.proc.wait()})")
+                # prompts or other output can stand in front of it on the same line
+                if marker in line:
+                    return transcript
+                transcript.append(line)
+
+    def run_sweep(self, overrides: Optional[dict] = None,
+                  z_indices: Optional[list[int]] = None,
+                  x_indices: Optional[list[int]] = None,
+                  with_forces: bool = False,
+                  timeout_s = 2000) -> list[Path]:
+        '''
+            Renders the views named in overrides, to render others give their
+            z_indices / x_indices. Pictures go to output_dir/images, exports
+            to output_dir/planes.
+        '''
+        overrides = overrides or {}
+        plan = self.processor.sweep_plan()
+        if overrides:
+            plan = apply_overrides(plan, overrides, self.processor.images_dir)
+        plan = redirect(plan, self.processor.images_dir, self.output_dir / "images")
+        # views that aren't asked for aren't rendered again
+        if z_indices is None and "side" not in overrides:
+            z_indices = []
+        if x_indices is None and "front" not in overrides:
+            x_indices = []
+        planes_dir = self.output_dir / "planes"
+        if self.processor.export_planes:
+            planes_dir.mkdir(parents=True, exist_ok=True)
+        lines = optimize_journal(self.processor.sweep_lines(plan, z_indices, x_indices, with_forces,
+                                                            planes_dir=planes_dir))
+        self.execute(lines, timeout_s)
+        pictures = []
+        for line in lines:
+            if line.startswith("/display/save-picture"):
+                pictures.append(Path(shlex.split(line)[1]))
+        return pictures
+
+    def close(self, timeout_s = 60):
+        if self.proc is None:
+            return
+        if self.proc.poll() is None:
+            try:
+                assert self.proc.stdin is not None
+                self.proc.stdin.write("/exit yes\n")
+                self.proc.stdin.close()
+                self.proc.wait(timeout_s)
+            except (OSError, subprocess.TimeoutExpired):
+                self.proc.kill()
+        self.proc = None
+
+
+class SessionRequestHandler(socketserver.StreamRequestHandler):
+    # one JSON request per line, one JSON answer per line
+    def handle(self):
+        for raw in self.rfile:
+            try:
+                request = json.loads(raw)
+                answer = self.server.dispatch(request)
+                answer["ok"] = True
+            except Exception as e:
+                answer = {"ok": False, "error": str(e)}
+            self.wfile.write((json.dumps(answer) + "\n").encode("utf-8"))
+            self.wfile.flush()
+
+
+class FluentSessionServer(socketserver.ThreadingTCPServer):
+    '''
+        Local socket in front of a FluentSession, requests:
+            {"op": "commands", "commands": [...]}
+            {"op": "sweep", "overrides": {...}, "z_indices": [...], "x_indices": [...]}
+            {"op": "close"}
+    '''
+    daemon_threads = True
+    allow_reuse_address = True
+
+    def __init__(self, session: FluentSession, host: str = "127.0.0.1", port: int = 0):
+        super().__init__((host, port), SessionRequestHandler)
+        self.session = session
+
+    def dispatch(self, request: dict) -> dict:
+        op = request.get("op")
+        if op == "commands":
+            return {"transcript": self.session.execute(request["commands"], request.get("timeout_s", 2000))}
+        if op == "sweep":
+            pictures = self.session.run_sweep(request.get("overrides"),
+                                              request.get("z_indices"),
+                                              request.get("x_indices"),
+                                              request.get("with_forces", False),
+                                              request.get("timeout_s", 2000))
+            return {"pictures": [p.as_posix() for p in pictures]}
+        if op == "close":
+            self.session.close()
+            threading.Thread(target=self.shutdown, daemon=True).start()
+            return {}
+        raise ValueError(f"Unknown request: {op}")
+
+
+def request(port: int, payload: dict, host: str = "127.0.0.1", timeout_s: float = 3600) -> dict:
+    with socket.create_connection((host, port), timeout=timeout_s) as sock:
+        sock.sendall((json.dumps(payload) + "\n").encode("utf-8"))
+        answer = sock.makefile("r", encoding="utf-8").readline()
+    answer = json.loads(answer)
+    if not answer.pop("ok"):
+        raise RuntimeError(answer["error"])
+    return answer
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Keep one Fluent session with a loaded case running.")
+    parser.add_argument("fluent_exe_path", type=Path)
+    parser.add_argument("case_file_path", type=Path)
+    parser.add_argument("--port", type=int, default=5050)
+    parser.add_argument("--threads", type=int, default=8)
+    args = parser.parse_args()
+
+    processor = FluentPostProcesser(args.fluent_exe_path, args.case_file_path)
+    session = FluentSession(processor, args.threads)
+    session.start()
+    with FluentSessionServer(session, port=args.port) as server:
+        print(f"Fluent session listening on 127.0.0.1:{server.server_address[1]}")
+        try:
+            server.serve_forever()
+        finally:
+            session.close()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,122 @@
+"""
+Watches the image folders of a running job, so the viewer can show every
+frame as soon as Fluent has completely written it.
+"""
+from __future__ import annotations
+import os
+from pathlib import Path
+
+from PyQt6.QtCore import QFileSystemWatcher, QObject, QTimer, pyqtSignal
+
+from scripts.manifest import is_complete
+
+
+class FolderWatcher(QObject):
+    '''
+        QFileSystemWatcher reports that a folder changed, the folder is then
+        listed once (os.scandir) for all changes within settle_ms. Pictures that are
+        still being written are checked again on a short timer until their
+        PNG is complete.
+    '''
+    frames_added = pyqtSignal(object, object)      # folder, list of new pictures
+    frames_changed = pyqtSignal(object, object)    # folder, pictures written again (e.g. cropped)
+    frames_removed = pyqtSignal(object, object)    # folder, deleted pictures
+
+    def __init__(self, settle_ms: int = 150, retry_ms: int = 400):
+        super().__init__()
+        self.watcher = QFileSystemWatcher()
+        self.watcher.directoryChanged.connect(self.on_directory_changed)
+        # folder -> picture name -> mtime_ns of the complete pictures
+        self.known: dict[Path, dict[str, int]] = {}
+        # pictures that exist but aren't completely written yet
+        self.incomplete: dict[Path, set[str]] = {}
+        self.changed_folders: set[Path] = set()
+        self.settle_timer = QTimer(self)
+        self.settle_timer.setSingleShot(True)
+        self.settle_timer.setInterval(settle_ms)
+        self.settle_timer.timeout.connect(self.scan_changed)
+        self.retry_timer = QTimer(self)
+        self.retry_timer.setInterval(retry_ms)
+        self.retry_timer.timeout.connect(self.retry_incomplete)
+
+    def watch(self, folder: Path) -> list[Path]:
+        '''
+            Starts watching folder, returns the pictures that are already complete.
+        '''
+        folder = Path(folder)
+        self.known[folder] = {}
+        self.incomplete[folder] = set()
+        self.watcher.addPath(str(folder))
+        added, _, _ = self.scan(folder)
+        return added
+
+    def stop(self):
+        self.settle_timer.stop()
+        self.retry_timer.stop()
+        if self.watcher.directories():
+            self.watcher.removePaths(self.watcher.directories())
+        self.known.clear()
+        self.incomplete.clear()
+
+    def on_directory_changed(self, path: str):
+        # one scan per settle_ms at most, restarting the timer on every change
+        # would postpone it until Fluent stops writing
+        self.changed_folders.add(Path(path))
+        if not self.settle_timer.isActive():
+            self.settle_timer.start()
+
+    def scan_changed(self):
+        folders, self.changed_folders = self.changed_folders, set()
+        for folder in folders:
+            if folder in self.known:
+                self.emit_scan(folder, *self.scan(folder))
+
+    def retry_incomplete(self):
+        for folder, names in list(self.incomplete.items()):
+            if names:
+                self.emit_scan(folder, *self.scan(folder))
+        if not any(self.incomplete.values()):
+            self.retry_timer.stop()
+
+    def emit_scan(self, folder: Path, added: list[Path], changed: list[Path], removed: list[Path]):
+        if added:
+            self.frames_added.emit(folder, added)
+        if changed:
+            self.frames_changed.emit(folder, changed)
+        if removed:
+            self.frames_removed.emit(folder, removed)
+
+    def scan(self, folder: Path) -> tuple[list[Path], list[Path], list[Path]]:
+        known = self.known[folder]
+        incomplete = self.incomplete[folder]
+        added, changed = [], []
+        seen = set()
+        try:
+            entries = list(os.scandir(folder))
+        except OSError:
+            entries = []
+        for entry in entries:
+            # .png.tmp of image_pyramid and anything else is skipped
+            if not entry.name.endswith(".png") or not entry.is_file():
+                continue
+            seen.add(entry.name)
+            mtime_ns = entry.stat().st_mtime_ns
+            if known.get(entry.name) == mtime_ns:
+                continue
+            path = folder / entry.name
+            if not is_complete(path):
+                incomplete.add(entry.name)
+                continue
+            incomplete.discard(entry.name)
+            if entry.name in known:
+                changed.append(path)
+            else:
+                added.append(path)
+            known[entry.name] = mtime_ns
+        removed = [folder / name for name in known if name not in seen]
+        for path in removed:
+            del known[path.name]
+        incomplete &= seen
+        if incomplete and not self.retry_timer.isActive():
+            self.retry_timer.start()
+        return sorted(added), sorted(changed), sorted(removed)
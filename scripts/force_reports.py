@@ -0,0 +1,99 @@
+"""
+Parser for the text reports written by Fluent's /report/forces/wall-forces and
+/report/forces/wall-moments commands (df.csv, drag.csv, moment.csv).
+
+The rows are found by zone name, not by position, so added or renamed zones
+can't silently shift the values.
+"""
+from __future__ import annotations
+from concurrent.futures import ProcessPoolExecutor
+from pathlib import Path
+from typing import NamedTuple, Optional
+
+
+class ForceComponents(NamedTuple):
+    pressure: float
+    viscous: float
+    total: float
+
+
+class ForceReport():
+    def __init__(self, path: Path, title: str,
+                 zones: dict[str, ForceComponents],
+                 net: Optional[ForceComponents]):
+        self.path = path
+        self.title = title
+        self.zones = zones
+        self.net = net
+
+    def __getitem__(self, zone: str) -> ForceComponents:
+        try:
+            return self.zones[zone]
+        except KeyError:
+            raise KeyError(f"Zone '{zone}' not in {self.path.name}, zones: {', '.join(self.zones)}") from None
+
+    def __contains__(self, zone: str) -> bool:
+        return zone in self.zones
+
+    def total(self, zone: str) -> float:
+        return self[zone].total
+
+    def net_total(self) -> float:
+        if self.net is not None:
+            return self.net.total
+        return sum(components.total for components in self.zones.values())
+
+
+def parse_number(token: str) -> Optional[float]:
+    try:
+        return float(token)
+    except ValueError:
+        return None
+
+
+def parse_force_report(path: Path) -> ForceReport:
+    '''
+        Reads the report line by line. Everything before the column header
+        (the line starting with "Zone") is the title block, every row after it
+        with a name and at least three numbers is a zone, the row "Net" is the
+        sum over all zones. Dashed separator lines are skipped.
+    '''
+    path = Path(path)
+    title = ""
+    zones: dict[str, ForceComponents] = {}
+    net = None
+    in_table = False
+    with open(path, encoding="utf-8", errors="replace") as f:
+        for line in f:
+            tokens = line.split()
+            if not tokens:
+                continue
+            if not in_table:
+                if tokens[0].lower() == "zone":
+                    in_table = True
+                elif not title:
+                    title = line.strip().strip('"')
+                continue
+            if tokens[0].startswith("-"):
+                continue
+            if len(tokens) < 4:
+                continue
+            values = [parse_number(token) for token in tokens[1:4]]
+            if any(value is None for value in values):
+                continue
+            components = ForceComponents(*values)
+            if tokens[0].lower() == "net":
+                net = components
+            else:
+                zones[tokens[0]] = components
+    if not in_table:
+        raise ValueError(f"No zone table found in {path}")
+    return ForceReport(path, title, zones, net)
+
+
+def parse_force_reports(paths: list[Path], max_workers: Optional[int] = None) -> list[ForceReport]:
+    # for trend studies over many archived reports
+    if len(paths) < 16:
+        return [parse_force_report(path) for path in paths]
+    with ProcessPoolExecutor(max_workers=max_workers) as pool:
+        return list(pool.map(parse_force_report, paths, chunksize=32))
@@ -0,0 +1,103 @@
+"""
+Writing forces into the aero force sheet template (data/aero force sheet.xlsx),
+for a single case or for many cases in one pass.
+"""
+from __future__ import annotations
+import csv
+import shutil
+from functools import lru_cache
+from pathlib import Path
+from typing import NamedTuple
+
+DATA_DIR = Path(__file__).resolve().parent.parent / "data"
+TEMPLATE_PATH = DATA_DIR / "aero force sheet.xlsx"
+INDEX_PATH = DATA_DIR / "aero force sheet idx.csv"
+TEMPLATE_VERSION = "v1.0"
+
+
+class SheetCell(NamedTuple):
+    area: str
+    row: int
+    col: int
+
+
+@lru_cache(maxsize=4)
+def load_sheet_index(index_path: Path = INDEX_PATH) -> tuple[SheetCell, ...]:
+    '''
+        Cells of the template the forces go into, in the order of
+        FluentPostProcesser.forces. Parsed once per process.
+    '''
+    with open(index_path, newline="", encoding="utf-8") as f:
+        reader = csv.reader(f)
+        next(reader)
+        return tuple(SheetCell(area.strip(), int(row), int(col)) for area, row, col in reader)
+
+
+def fill_sheet(sheet, forces: list[float], index: tuple[SheetCell, ...]):
+    assert len(forces) == len(index)
+    assert sheet["A1"].value == TEMPLATE_VERSION
+    for cell, value in zip(index, forces):
+        sheet.cell(row=cell.row, column=cell.col, value=value)
+
+
+def write_forcesheet(forces: list[float], destination: Path,
+                     template_path: Path = TEMPLATE_PATH) -> Path:
+    # one case, a copy of the template with its forces
+    from openpyxl import load_workbook
+
+    destination = Path(destination)
+    shutil.copy2(template_path, destination)
+    book = load_workbook(destination)
+    fill_sheet(book.active, forces, load_sheet_index())
+    book.save(destination)
+    return destination
+
+
+def sheet_title(name: str, used: set[str]) -> str:
+    # excel sheet names: max 31 characters, no []:*?/\ and unique
+    title = "".join("_" if c in "[]:*?/\\" else c for c in name)[:31] or "case"
+    base, n = title, 1
+    while title in used:
+        n += 1
+        title = f"{base[:31 - len(str(n)) - 1]}_{n}"
+    used.add(title)
+    return title
+
+
+def export_batch(cases: list[tuple[str, list[float]]], destination: Path,
+                 mode: str = "sheets", template_path: Path = TEMPLATE_PATH) -> Path:
+    '''
+        Writes the forces of many cases in a single pass.
+            mode "sheets": the template is loaded once and copied into one
+                           sheet per case, the workbook is saved once
+            mode "table":  write-only (streamed) workbook with one row per case
+    '''
+    from openpyxl import Workbook, load_workbook
+
+    if not cases:
+        # a workbook without sheets can't be saved
+        raise ValueError("No cases to export")
+    index = load_sheet_index()
+    destination = Path(destination)
+    if mode == "table":
+        book = Workbook(write_only=True)
+        sheet = book.create_sheet("forces")
+        sheet.append(["case"] + [cell.area for cell in index])
+        for name, forces in cases:
+            assert len(forces) == len(index)
+            sheet.append([name] + list(forces))
+        book.save(destination)
+        return destination
+    if mode != "sheets":
+        raise ValueError(f"Unknown export mode: {mode}")
+
+    book = load_workbook(template_path)
+    template = book.active
+    used: set[str] = set()
+    for name, forces in cases:
+        sheet = book.copy_worksheet(template)
+        sheet.title = sheet_title(name, used)
+        fill_sheet(sheet, forces, index)
+    book.remove(template)
+    book.save(destination)
+    return destination
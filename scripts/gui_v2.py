@@ -3,35 +3,91 @@ run with: python -m scripts.gui_v2
 """
 import sys, time
 from pathlib import Path
+from typing import Optional
 
 from PyQt6 import uic
-from PyQt6.QtWidgets import QApplication, QMainWindow, QFileDialog, QPushButton, QSlider, QHBoxLayout, QVBoxLayout, QWidget, QSizePolicy, QLabel, QProgressBar
-from PyQt6.QtGui import QPixmap, QIcon
-from PyQt6.QtCore import Qt, QTimer, pyqtSignal, QObject, QThread
+from PyQt6.QtWidgets import QApplication, QMainWindow, QFileDialog, QPushButton, QSlider, QHBoxLayout, QVBoxLayout, QWidget, QSizePolicy, QLabel, QProgressBar, QTableWidget, QTableWidgetItem, QSpinBox, QDoubleSpinBox, QAbstractItemView
+from PyQt6.QtGui import QPixmap, QIcon, QImage
+from PyQt6.QtCore import Qt, pyqtSignal, QObject
+
+from scripts.folder_watcher import FolderWatcher
+from scripts.job_queue import CANCELLED, DONE, FAILED, QUEUED, RUNNING, Job, JobQueue
+from scripts.image_cache import ImageCache, FrameLoader, FrameKey, image_cache
+from scripts.image_stack import StackFrame, open_stack
+from scripts.playback import PlaybackEngine
+from scripts.progress import format_eta
+from scripts.sweep_definition import PLANE_VIEWS, compile_plan, find_definition, load_definition
+
+
+def live_folders(plan: dict, images_dir: Path) -> list[Path]:
+    # the render folders of the sweep, series 0 drives the slider, images/ only has the bottom view
+    return [folder for view in PLANE_VIEWS if view in plan
+            for _, folder, _ in plan[view]["renders"]] + [images_dir]
 
-from scripts.fluent_processing import FluentPostProcesser
 
 class Images():
-    def __init__(self, folder):
+    def __init__(self, folder, cache: Optional[ImageCache] = None, live: bool = False):
         self.folder = Path(folder)
-        self.n_images = 0
-        self.current_image_index = 0
-        self.images: list[QPixmap] = []
-
-        for f in sorted(self.folder.glob("*.png")):
-            pixmap = QPixmap(str(f))
-            if not pixmap.isNull():
-                self.n_images += 1
-                self.images.append(pixmap)
+        # a packed stack (see image_stack.py) next to the folder is read instead of the PNGs,
+        # as long as no PNG was added to the folder after packing
+        stack_path = self.folder if self.folder.suffix == ".stack" else self.folder.with_suffix(".stack")
+        if live:
+            # filled by the FolderWatcher as Fluent writes the pictures
+            self.files: list[FrameKey] = []
+        elif stack_path.is_file() and (not self.folder.is_dir()
+                                     or stack_path.stat().st_mtime >= self.folder.stat().st_mtime):
+            self.files: list[FrameKey] = [StackFrame(stack_path, i) for i in range(len(open_stack(stack_path)))]
+        else:
+            # only the file names are scanned, frames are decoded on demand
+            self.files = sorted(self.folder.glob("*.png"))
+        self.n_images = len(self.files)
+        self.cache = cache if cache is not None else image_cache
+        self._current_image_index = 0
+        # +1 / -1, the direction the user is scrubbing in, used for prefetching
+        self.direction = 1
+
+    @property
+    def current_image_index(self) -> int:
+        return self._current_image_index
+
+    @current_image_index.setter
+    def current_image_index(self, index: int):
+        old = self._current_image_index
+        if index > old or (old == self.n_images - 1 and index == 0):
+            self.direction = 1
+        elif index < old:
+            self.direction = -1
+        self._current_image_index = index
+
+    def add_files(self, paths: list[Path]):
+        # keeps the current frame, the planes are sorted by name
+        current = self.path(self._current_image_index)
+        self.files = sorted(set(self.files) | set(paths))
+        self.n_images = len(self.files)
+        if current is not None:
+            self._current_image_index = self.files.index(current)
+
+    def remove_files(self, paths: list[Path]):
+        removed = set(paths)
+        self.files = [path for path in self.files if path not in removed]
+        self.n_images = len(self.files)
+        self._current_image_index = max(min(self._current_image_index, self.n_images - 1), 0)
+
+    def path(self, index) -> Optional[FrameKey]:
+        if 0 <= index < self.n_images:
+            return self.files[index]
+        return None
     
-    def get_image(self, index):
+    def get_image(self, index) -> Optional[QImage]:
         if 0 <= index < self.n_images:
-            return self.images[index]
+            return self.cache.get(self.files[index])
         return None
 
 class ImageViewerWindow(QMainWindow):
-    def __init__(self):
+    def __init__(self, cache_budget_mb: Optional[int] = None):
         super().__init__()
+        if cache_budget_mb is not None:
+            image_cache.set_budget(cache_budget_mb * 1024 * 1024)
 
         central_widget = QWidget(self)
         self.setCentralWidget(central_widget)
@@ -61,8 +117,6 @@ class ImageViewerWindow(QMainWindow):
         self.btnStop: QPushButton = QPushButton("⏯")
         self.play_state = False
         self.btnStop.clicked.connect(self.click_start_stop)
-        self.timer = QTimer()
-        self.timer.timeout.connect(self.update_image_animation)
         self.btnPrevious: QPushButton = QPushButton("⏮")
         self.btnPrevious.clicked.connect(self.click_previous)
         self.btnNext: QPushButton = QPushButton("⏭")
@@ -73,9 +127,21 @@ class ImageViewerWindow(QMainWindow):
             btn.setMaximumWidth(60)
             btn.setMinimumHeight(30)
 
+        self.fpsSpin = QSpinBox()
+        self.fpsSpin.setRange(1, 60)
+        self.fpsSpin.setValue(15)
+        self.fpsSpin.setSuffix(" fps")
+        self.speedSpin = QDoubleSpinBox()
+        self.speedSpin.setRange(0.25, 4.0)
+        self.speedSpin.setSingleStep(0.25)
+        self.speedSpin.setValue(1.0)
+        self.speedSpin.setSuffix("x")
+
         self.controllsLayout.addWidget(self.btnPrevious)
         self.controllsLayout.addWidget(self.btnStop)
         self.controllsLayout.addWidget(self.btnNext)
+        self.controllsLayout.addWidget(self.fpsSpin)
+        self.controllsLayout.addWidget(self.speedSpin)
         self.parentLayout.addLayout(self.controllsLayout)
 
         self.parentLayout.setStretch(0, 5)
@@ -83,7 +149,16 @@ class ImageViewerWindow(QMainWindow):
         self.parentLayout.setStretch(2, 1)
 
         self.image_series: list[Images] = []
-        self.thumb_pixmaps: list[QPixmap] = []
+        # decoding and scaling runs on a thread pool, the GUI thread only swaps icons
+        self.thumb_side = 0
+        self.frame_loader = FrameLoader()
+        self.frame_loader.ready.connect(self.on_frame_ready)
+
+        self.playback = PlaybackEngine(target_fps=self.fpsSpin.value(), loader=self.frame_loader)
+        self.playback.tick.connect(self.update_image_animation)
+        self.playback.stats.connect(self.show_playback_stats)
+        self.fpsSpin.valueChanged.connect(self.playback.set_fps)
+        self.speedSpin.valueChanged.connect(self.playback.set_speed)
 
         self.showMaximized()
 
@@ -99,27 +174,26 @@ class ImageViewerWindow(QMainWindow):
             return
         
         btn.setText("")
+        self.add_series(Images(folder), i)
 
-        imgs = Images(folder)
+    def add_series(self, imgs: Images, i: int):
         print(len(self.image_series), i)
-        
+
+        # the first frame is requested from the frame loader like every other one
         if i < len(self.image_series):
             self.image_series[i] = imgs
-            thumb_px = imgs.get_image(0)
             self.imageSlider.setValue(0)
             for imgs in self.image_series:
                 imgs.current_image_index = 0
-            self.thumb_pixmaps[i] = thumb_px
             self.update_thumbnails()
         else:
             self.image_series.append(imgs)
-            thumb_px = imgs.get_image(0)
             self.imageSlider.setValue(0)
             for imgs in self.image_series:
                 imgs.current_image_index = 0
-            self.thumb_pixmaps.append(thumb_px)
             self.create_add_image_button()
             self.update_thumbnails()
+        self.visual_update_slider()
 
     def create_add_image_button(self):
         new_btn = self.btnAddImage.__class__("+")
@@ -142,48 +216,140 @@ class ImageViewerWindow(QMainWindow):
                 btn.setMinimumWidth(40)
                 self.imageLayout.setStretch(i, 0)
     
-    def update_thumbnails(self):
-        if not self.thumb_pixmaps:
-            return
+    def update_thumbnails(self) -> bool:
+        # returns True if the current frame of every series is shown
+        if not self.image_series:
+            return False
         
         # size of square-ish thumbnail that fits button
         self.thumb_side = int(min(self.img_width, self.imageContainer.height()))
         if self.thumb_side <= 0:
+            return False
+        complete = True
+        for btn, imgs in zip(self.btnsAddImage[:len(self.image_series)], self.image_series):
+            path = imgs.path(imgs.current_image_index)
+            if path is None:
+                continue
+            # the current frame goes first, the old icon stays until it is ready
+            scaled = self.frame_loader.request(path, self.thumb_side, priority=10)
+            if scaled is not None:
+                self.set_thumbnail(btn, scaled)
+            else:
+                complete = False
+            self.frame_loader.prefetch(imgs.files, imgs.current_image_index, imgs.direction, self.thumb_side)
+        return complete
+
+    def set_thumbnail(self, btn: QPushButton, scaled: QImage):
+        btn.setIcon(QIcon(QPixmap.fromImage(scaled)))
+        btn.setIconSize(scaled.size())
+
+    def on_frame_ready(self, path: FrameKey, side: int):
+        if side != self.thumb_side:
+            return
+        for btn, imgs in zip(self.btnsAddImage[:len(self.image_series)], self.image_series):
+            if imgs.path(imgs.current_image_index) == path:
+                scaled = self.frame_loader.cache.lookup(path, side)
+                if scaled is not None:
+                    self.set_thumbnail(btn, scaled)
+
+    def attach(self, folders: list[Path]):
+        '''
+            Live view of a running job: opens the series folders (see
+            live_folders) and adds every picture once Fluent has completely
+            written it.
+        '''
+        folders = [Path(folder) for folder in folders]
+        # processed/images/<series> -> case folder
+        self.setWindowTitle(f"Live: {folders[-1].parent.parent.name}")
+        self.folder_watcher = FolderWatcher()
+        self.folder_watcher.frames_added.connect(self.on_frames_added)
+        self.folder_watcher.frames_changed.connect(self.on_frames_changed)
+        self.folder_watcher.frames_removed.connect(self.on_frames_removed)
+        for folder in folders:
+            folder.mkdir(parents=True, exist_ok=True)
+            imgs = Images(folder, live=True)
+            imgs.add_files(self.folder_watcher.watch(folder))
+            self.btnsAddImage[-1].setText("")
+            self.add_series(imgs, len(self.image_series))
+
+    def live_series(self, folder: Path) -> Optional[Images]:
+        for imgs in self.image_series:
+            if imgs.folder == folder:
+                return imgs
+        return None
+
+    def on_frames_added(self, folder: Path, paths: list[Path]):
+        imgs = self.live_series(folder)
+        if imgs is None:
+            return
+        imgs.add_files(paths)
+        self.sync_playback()
+        self.visual_update_slider()
+        self.update_thumbnails()
+
+    def on_frames_changed(self, folder: Path, paths: list[Path]):
+        # e.g. cropped by the optimize stage, the cached frames are outdated
+        for path in paths:
+            self.frame_loader.cache.invalidate(path)
+        self.update_thumbnails()
+
+    def on_frames_removed(self, folder: Path, paths: list[Path]):
+        imgs = self.live_series(folder)
+        if imgs is None:
             return
-        for btn, imgs in zip(self.btnsAddImage[:len(self.thumb_pixmaps)], self.image_series):
-            orig_px = imgs.get_image(imgs.current_image_index)
-            scaled = orig_px.scaled(
-                self.thumb_side,
-                self.thumb_side,
-                Qt.AspectRatioMode.KeepAspectRatio,
-                Qt.TransformationMode.SmoothTransformation
-            )
-            btn.setIcon(QIcon(scaled))
-            btn.setIconSize(scaled.size())
+        for path in paths:
+            self.frame_loader.cache.invalidate(path)
+        imgs.remove_files(paths)
+        self.sync_playback()
+        self.visual_update_slider()
+        self.update_thumbnails()
+
+    def closeEvent(self, event):
+        if hasattr(self, "folder_watcher"):
+            self.folder_watcher.stop()
+        super().closeEvent(event)
 
     def on_slider_change(self, value: int):
         print("Slider value:", value)
+        # the slider has one step per frame of series 0, the others follow proportionally
+        spot = value / max(self.imageSlider.maximum(), 1)
         for imgs in self.image_series:
-            imgs.current_image_index = round(imgs.n_images * value // 100)
+            imgs.current_image_index = max(min(round(spot * (imgs.n_images - 1)), imgs.n_images - 1), 0)
+        self.sync_playback()
         self.update_thumbnails()
 
     def click_start_stop(self):
+        if not self.image_series:
+            return
         if self.play_state:
             self.play_state = False
-            self.timer.stop()
+            self.playback.stop()
+            self.statusBar().clearMessage()
         else:
             self.play_state = True
-            self.timer.start(200)
+            self.sync_playback()
+            self.playback.start()
+
+    def sync_playback(self):
+        # the playback clock follows series 0, manual navigation moves it along
+        if not self.image_series:
+            return
+        master = self.image_series[0]
+        self.playback.set_frame_count(master.n_images)
+        self.playback.seek(master.current_image_index / max(master.n_images, 1))
 
-    def update_image_animation(self):
+    def update_image_animation(self, position: float):
         for imgs in self.image_series:
-            imgs.current_image_index = imgs.current_image_index + 1
-            if imgs.current_image_index >= imgs.n_images:
-                imgs.current_image_index = 0
+            imgs.current_image_index = int(position * imgs.n_images) % max(imgs.n_images, 1)
         self.visual_update_slider()
-        self.update_thumbnails()
+        self.playback.frame_presented(self.update_thumbnails())
+
+    def show_playback_stats(self, fps: float, latency_ms: float, dropped: int):
+        self.statusBar().showMessage(f"{fps:.0f} fps | decode {latency_ms:.1f} ms | dropped {dropped} frames")
 
     def click_previous(self):
+        if not self.image_series or not self.image_series[0].n_images:
+            return
         idx_img_1 = self.image_series[0].current_image_index - 1
         n_imgs = self.image_series[0].n_images
         spot = idx_img_1 / n_imgs
@@ -191,10 +357,13 @@ class ImageViewerWindow(QMainWindow):
             imgs.current_image_index = round(spot * imgs.n_images)
             if imgs.current_image_index < 0:
                 imgs.current_image_index = 0
+        self.sync_playback()
         self.visual_update_slider()
         self.update_thumbnails()
 
     def click_next(self):
+        if not self.image_series or not self.image_series[0].n_images:
+            return
         idx_img_1 = self.image_series[0].current_image_index + 1
         n_imgs = self.image_series[0].n_images
         spot = idx_img_1 / n_imgs
@@ -202,41 +371,60 @@ class ImageViewerWindow(QMainWindow):
             imgs.current_image_index = round(spot * imgs.n_images)
             if imgs.current_image_index >= imgs.n_images:
                 imgs.current_image_index = imgs.n_images - 1
+        self.sync_playback()
         self.visual_update_slider()
         self.update_thumbnails()
 
     def visual_update_slider(self):
-        slider_idx = round(self.image_series[0].current_image_index / self.image_series[0].n_images * 100)
+        if not self.image_series:
+            return
+        master = self.image_series[0]
         self.imageSlider.blockSignals(True)
-        self.imageSlider.setValue(slider_idx)
+        # grows with the live series
+        self.imageSlider.setMaximum(max(master.n_images - 1, 0))
+        self.imageSlider.setValue(master.current_image_index)
         self.imageSlider.blockSignals(False)
 
 
 
-class Worker(QObject):
-    progress = pyqtSignal(int)
-    finished = pyqtSignal()
-    error = pyqtSignal(str)
+def job_live_folders(job) -> list[Path]:
+    if job.processor is not None:
+        return live_folders(job.processor.sweep_plan(), job.processor.images_dir)
+    # not started yet, the sweep the processor will use
+    images_dir = job.case_file_path.parent / "processed" / "images"
+    definition = load_definition(find_definition(job.case_file_path.parent))
+    return live_folders(compile_plan(definition, images_dir), images_dir)
 
-    def __init__(self, fluent_processor: FluentPostProcesser):
-        super().__init__()
-        self.fluent_processor = fluent_processor
 
-    def run(self):
-        try:
-            self.fluent_processor.run()
-        except Exception as e:
-            self.error.emit(str(e))
-        finally:
-            self.finished.emit()
+def progress_text(job) -> str:
+    processor = job.processor
+    if job.state == RUNNING and processor is not None and processor.eta_s is not None:
+        return f"{job.progress}% (ETA {format_eta(processor.eta_s)})"
+    return f"{job.progress}%"
+
+
+class JobSignals(QObject):
+    # job updates come from the scheduler threads, the table is refreshed on the GUI thread
+    changed = pyqtSignal(int)
 
 
 class AddSimulationWindow(QMainWindow):
-    def __init__(self, file_path: Path, fluent_exe_path: Path):
+    '''
+        View on one case in the shared job queue, the queue decides when it
+        runs so all cases stay within the core and licence budget.
+    '''
+    def __init__(self, file_path: Path, job_queue: JobQueue):
         super().__init__()
         self.setWindowTitle(f"Processing: {file_path.name}")
         self.setMinimumSize(400, 200)
-        self.statusBar().showMessage("Processing simulation...")
+        self.statusBar().showMessage("Ready to queue the simulation")
+        self.file_path = file_path
+        self.job_queue = job_queue
+        self.job: Optional[Job] = None
+        self.signals = JobSignals()
+        self.signals.changed.connect(self.job_changed)
+        self.listener = lambda job: self.signals.changed.emit(job.job_id)
+        self.job_queue.listeners.append(self.listener)
         
         central_widget = QWidget(self)
         self.setCentralWidget(central_widget)
@@ -252,11 +440,15 @@ class AddSimulationWindow(QMainWindow):
 
         self.buttonLayout = QHBoxLayout()
         self.cancelButton = QPushButton("Cancel")
-        self.cancelButton.clicked.connect(self.close)
+        self.cancelButton.clicked.connect(self.cancel_processing)
+        self.processing = False
         self.startButton = QPushButton("Start Processing")
         self.startButton.clicked.connect(self.start_processing)
+        self.liveButton = QPushButton("Live View")
+        self.liveButton.clicked.connect(self.click_live_view)
         self.buttonLayout.addWidget(self.cancelButton)
         self.buttonLayout.addWidget(self.startButton)
+        self.buttonLayout.addWidget(self.liveButton)
         self.parentLayout.addLayout(self.buttonLayout)
 
         self.progressBarContainer = QWidget()
@@ -266,55 +458,181 @@ class AddSimulationWindow(QMainWindow):
         self.progressBar.setValue(0)
         self.progressBarLayout.addWidget(self.progressBar)
         self.parentLayout.addWidget(self.progressBarContainer)
-
-        try:
-            self.fluent_processor = FluentPostProcesser(fluent_exe_path, file_path, callback=None)
-        except Exception as e:
-            fluent_exe_path = QFileDialog.getOpenFileName(self, "Select Fluent Executable", filter="Executable Files (*.exe)")[0]
-            if fluent_exe_path:
-                try:
-                    self.fluent_processor = FluentPostProcesser(fluent_exe_path, file_path, callback=None)
-                except Exception as e:
-                    print(f"Error initializing FluentPostProcesser: {e}")
-                    self.close()
-                    return
-            else:
-                self.close()
-                return
         self.show()
 
     def start_processing(self):
         self.startButton.setEnabled(False)
+        try:
+            if self.job is not None and self.job.state in (FAILED, CANCELLED):
+                self.job_queue.retry(self.job.job_id)
+            else:
+                self.job = self.job_queue.add(self.file_path)
+        except (ValueError, OSError) as e:
+            self.statusBar().showMessage(f"Error: {e}")
+            self.startButton.setEnabled(True)
+            return
+        self.processing = True
+        self.job_queue.start()
+        self.job_changed(self.job.job_id)
+
+    def job_changed(self, job_id: int):
+        if self.job is None or job_id != self.job.job_id:
+            return
+        job = self.job
+        self.progressBar.setValue(job.progress)
+        if job.state == QUEUED:
+            self.statusBar().showMessage(f"Job {job.job_id} waits for free cores and licences...")
+        elif job.state == RUNNING:
+            self.statusBar().showMessage(f"Processing... {progress_text(job)}")
+        elif not job.active:
+            self.processing = False
+            self.startButton.setEnabled(True)
+            self.cancelButton.setEnabled(True)
+            if job.state == DONE:
+                self.statusBar().showMessage("Processing complete!")
+            elif job.state == FAILED:
+                self.statusBar().showMessage(f"Error: {job.error}")
+            else:
+                self.statusBar().showMessage("Processing cancelled")
+
+    def cancel_processing(self):
+        # while the job is queued or running the button cancels it, otherwise it closes the window
+        if not self.processing or self.job is None:
+            self.close()
+            return
         self.cancelButton.setEnabled(False)
+        self.statusBar().showMessage("Cancelling...")
+        self.job_queue.cancel(self.job.job_id)
 
-        self.thread: QThread = QThread()
-        self.worker = Worker(self.fluent_processor)
-        self.fluent_processor.progress_callback = self.worker.progress.emit
-        self.worker.moveToThread(self.thread)
+    def click_live_view(self):
+        # the pictures show up while Fluent is still rendering
+        self.image_viewer = ImageViewerWindow()
+        if self.job is not None:
+            self.image_viewer.attach(job_live_folders(self.job))
+        else:
+            self.image_viewer.attach(job_live_folders(Job(0, self.file_path)))
 
-       # Wire signals
-        self.thread.started.connect(self.worker.run)
-        self.worker.progress.connect(self.update_progress)      # updates progressBar + status
-        self.worker.error.connect(lambda msg: self.statusBar().showMessage(f"Error: {msg}"))
-        self.worker.finished.connect(self.thread.quit)
+    def closeEvent(self, event):
+        # only the view is closed, the job keeps running in the queue
+        if self.listener in self.job_queue.listeners:
+            self.job_queue.listeners.remove(self.listener)
+        super().closeEvent(event)
 
-        self.worker.finished.connect(self.worker.deleteLater)
-        self.thread.finished.connect(self.thread.deleteLater)
 
-        self.thread.finished.connect(lambda: self.startButton.setEnabled(True))
-        self.thread.finished.connect(lambda: self.cancelButton.setEnabled(True))
+class JobQueueWindow(QMainWindow):
+    columns = ["ID", "Case", "Priority", "Cores", "State", "Progress", "Attempts", "Error"]
 
-        self.thread.start()
+    def __init__(self, job_queue: JobQueue):
+        super().__init__()
+        self.setWindowTitle("Job Queue")
+        self.setMinimumSize(900, 400)
+        self.job_queue = job_queue
+        self.signals = JobSignals()
+        self.signals.changed.connect(self.refresh)
+        self.listener = lambda job: self.signals.changed.emit(job.job_id)
+        self.job_queue.listeners.append(self.listener)
 
-    def cancel_processing(self):
-        self.close()
+        central_widget = QWidget(self)
+        self.setCentralWidget(central_widget)
+        self.parentLayout = QVBoxLayout(central_widget)
 
-    def update_progress(self, value: int):
-        self.progressBar.setValue(value)
-        if value >= 100:
-            self.statusBar().showMessage("Processing complete!")
-        else:
-            self.statusBar().showMessage(f"Processing... {value}%")
+        self.jobTable = QTableWidget(0, len(self.columns))
+        self.jobTable.setHorizontalHeaderLabels(self.columns)
+        self.jobTable.setSelectionBehavior(QAbstractItemView.SelectionBehavior.SelectRows)
+        self.jobTable.setEditTriggers(QAbstractItemView.EditTrigger.NoEditTriggers)
+        self.jobTable.horizontalHeader().setStretchLastSection(True)
+        self.parentLayout.addWidget(self.jobTable)
+
+        self.buttonLayout = QHBoxLayout()
+        self.btnAddCases = QPushButton("Add Cases")
+        self.btnAddCases.clicked.connect(self.click_add_cases)
+        self.prioritySpin = QSpinBox()
+        self.prioritySpin.setRange(-10, 10)
+        self.prioritySpin.setPrefix("Priority: ")
+        self.btnSetPriority = QPushButton("Set Priority")
+        self.btnSetPriority.clicked.connect(self.click_set_priority)
+        self.btnCancel = QPushButton("Cancel Job")
+        self.btnCancel.clicked.connect(self.click_cancel)
+        self.btnRetry = QPushButton("Retry Job")
+        self.btnRetry.clicked.connect(self.click_retry)
+        self.btnClear = QPushButton("Clear Finished")
+        self.btnClear.clicked.connect(self.click_clear)
+        self.btnExport = QPushButton("Export Forces")
+        self.btnExport.clicked.connect(self.click_export)
+        self.btnLiveView = QPushButton("Live View")
+        self.btnLiveView.clicked.connect(self.click_live_view)
+        for widget in (self.btnAddCases, self.prioritySpin, self.btnSetPriority,
+                       self.btnCancel, self.btnRetry, self.btnClear, self.btnExport, self.btnLiveView):
+            self.buttonLayout.addWidget(widget)
+        self.parentLayout.addLayout(self.buttonLayout)
+
+        self.statusBar().showMessage(f"Budget: {self.job_queue.max_cores} cores, {self.job_queue.max_licences} licences")
+        self.job_queue.start()
+        self.refresh()
+        self.show()
+
+    def refresh(self, job_id: int = 0):
+        jobs = list(self.job_queue.jobs)
+        self.jobTable.setRowCount(len(jobs))
+        for row, job in enumerate(jobs):
+            values = [job.job_id, job.case_file_path.name, job.priority, job.cores,
+                      job.state, progress_text(job), job.attempts, job.error]
+            for col, value in enumerate(values):
+                self.jobTable.setItem(row, col, QTableWidgetItem(str(value)))
+
+    def selected_job_ids(self) -> list[int]:
+        rows = {index.row() for index in self.jobTable.selectedIndexes()}
+        return [int(self.jobTable.item(row, 0).text()) for row in sorted(rows)]
+
+    def click_add_cases(self):
+        file_paths = QFileDialog.getOpenFileNames(self, "Select Simulation Files", filter="Simulation Files (*.cas.h5)")[0]
+        for file_path in file_paths:
+            self.job_queue.add(Path(file_path), priority=self.prioritySpin.value())
+
+    def click_set_priority(self):
+        for job_id in self.selected_job_ids():
+            self.job_queue.set_priority(job_id, self.prioritySpin.value())
+
+    def click_cancel(self):
+        for job_id in self.selected_job_ids():
+            self.job_queue.cancel(job_id)
+
+    def click_retry(self):
+        for job_id in self.selected_job_ids():
+            self.job_queue.retry(job_id)
+
+    def click_clear(self):
+        self.job_queue.remove_finished()
+        self.refresh()
+
+    def click_live_view(self):
+        job_ids = self.selected_job_ids()
+        if not job_ids:
+            return
+        job = next(job for job in self.job_queue.jobs if job.job_id == job_ids[0])
+        folders = job_live_folders(job)
+        self.image_viewer = ImageViewerWindow()
+        self.image_viewer.attach(folders)
+
+    def click_export(self):
+        if not any(job.forces for job in self.job_queue.jobs_by_state(DONE)):
+            self.statusBar().showMessage("No finished jobs to export yet")
+            return
+        file_path = QFileDialog.getSaveFileName(self, "Export Forces", "aero forces.xlsx", filter="Excel Files (*.xlsx)")[0]
+        if file_path:
+            # an exception in a slot would close the whole window
+            try:
+                destination = self.job_queue.export_forces(Path(file_path))
+            except (ValueError, OSError) as e:
+                self.statusBar().showMessage(f"Export failed: {e}")
+                return
+            self.statusBar().showMessage(f"Forces exported to {destination}")
+
+    def closeEvent(self, event):
+        # the jobs keep running, the queue only stops updating this window
+        if self.listener in self.job_queue.listeners:
+            self.job_queue.listeners.remove(self.listener)
+        super().closeEvent(event)
 
 
 
@@ -359,8 +677,13 @@ class MainWindow(QMainWindow):
         self.btnAddSimulation.setMinimumWidth(100)
         self.btnAddSimulation.setMaximumWidth(100)
         self.btnAddSimulation.clicked.connect(self.click_add_simulation)
+        self.btnJobQueue: QPushButton = QPushButton("Job Queue")
+        self.btnJobQueue.setMinimumWidth(100)
+        self.btnJobQueue.setMaximumWidth(100)
+        self.btnJobQueue.clicked.connect(self.click_job_queue)
         self.buttons_layout.addWidget(self.btnViewImages)
         self.buttons_layout.addWidget(self.btnAddSimulation)
+        self.buttons_layout.addWidget(self.btnJobQueue)
 
         # Set size policies to respect layout stretch
         self.titleWidget.setSizePolicy(QSizePolicy.Policy.Expanding, QSizePolicy.Policy.Expanding)
@@ -376,9 +699,25 @@ class MainWindow(QMainWindow):
         print("View images button clicked")
         self.image_viewer = ImageViewerWindow()
 
+    def shared_queue(self) -> JobQueue:
+        # one queue for the whole application, every window is only a view on it
+        if not hasattr(self, "job_queue"):
+            self.job_queue = JobQueue(Path(self.fluent_exe_path))
+        return self.job_queue
+
     def click_add_simulation(self):
         file_path = QFileDialog.getOpenFileName(self, "Select Simulation File", filter="Simulation Files (*.cas.h5)")[0]
-        if file_path:
-            print("Selected simulation file:", file_path)
-            self.add_simulation_window = AddSimulationWindow(Path(file_path), Path(self.fluent_exe_path))
+        if not file_path:
+            return
+        print("Selected simulation file:", file_path)
+        if not Path(self.fluent_exe_path).exists():
+            fluent_exe_path = QFileDialog.getOpenFileName(self, "Select Fluent Executable", filter="Executable Files (*.exe)")[0]
+            if not fluent_exe_path:
+                return
+            self.fluent_exe_path = fluent_exe_path
+            self.shared_queue().fluent_exe_path = Path(fluent_exe_path)
+        self.add_simulation_window = AddSimulationWindow(Path(file_path), self.shared_queue())
+
+    def click_job_queue(self):
+        self.job_queue_window = JobQueueWindow(self.shared_queue())
         
\ No newline at end of file
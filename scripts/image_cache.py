@@ -0,0 +1,182 @@
+from __future__ import annotations
+import os
+import threading
+import time
+from collections import OrderedDict, deque
+from pathlib import Path
+from typing import Optional
+
+from PyQt6.QtGui import QImage
+from PyQt6.QtCore import Qt, QObject, QRunnable, QThreadPool, pyqtSignal
+
+from scripts.image_stack import StackFrame, open_stack
+from scripts.image_pyramid import pyramid_source
+
+# a frame is either a single PNG or a frame inside a packed image stack
+FrameKey = Path | StackFrame
+
+
+def load_image(path: FrameKey, side: int = 0) -> Optional[QImage]:
+    # QImage (unlike QPixmap) may be decoded and scaled outside of the GUI thread
+    if isinstance(path, StackFrame):
+        image = open_stack(path.stack_path).qimage(path.index)
+        # scaling below makes its own copy, full frames must not point into the mapping
+        if side <= 0:
+            return image.copy()
+    else:
+        # a downscaled level (see image_pyramid.py) close to side is much faster to decode
+        image = QImage(str(pyramid_source(path, side)))
+    if image.isNull():
+        return None
+    if side > 0:
+        image = image.scaled(
+            side,
+            side,
+            Qt.AspectRatioMode.KeepAspectRatio,
+            Qt.TransformationMode.SmoothTransformation
+        )
+    return image
+
+
+class ImageCache():
+    '''
+        LRU cache of decoded frames with a memory budget in bytes.
+        Entries are keyed by (path, side), side 0 is the full resolution
+        frame, otherwise the frame scaled to fit a side x side thumbnail.
+        One cache is shared by all image series of the viewer, so memory
+        stays bounded no matter how many series are open.
+    '''
+    def __init__(self, budget_bytes: int = 512 * 1024 * 1024):
+        self.budget_bytes = budget_bytes
+        self.used_bytes = 0
+        self.entries: OrderedDict[tuple[FrameKey, int], tuple[QImage, int]] = OrderedDict()
+        self.lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+
+    def set_budget(self, budget_bytes: int):
+        with self.lock:
+            self.budget_bytes = budget_bytes
+            self.evict()
+
+    def evict(self):
+        # least recently used entries go first
+        while self.used_bytes > self.budget_bytes and self.entries:
+            _, (_, cost) = self.entries.popitem(last=False)
+            self.used_bytes -= cost
+
+    def lookup(self, path: FrameKey, side: int = 0) -> Optional[QImage]:
+        with self.lock:
+            entry = self.entries.get((path, side))
+            if entry is None:
+                self.misses += 1
+                return None
+            self.entries.move_to_end((path, side))
+            self.hits += 1
+            return entry[0]
+
+    def get(self, path: FrameKey, side: int = 0) -> Optional[QImage]:
+        image = self.lookup(path, side)
+        if image is not None:
+            return image
+        image = load_image(path, side)
+        if image is not None:
+            self.put(path, side, image)
+        return image
+
+    def put(self, path: FrameKey, side: int, image: QImage):
+        cost = image.sizeInBytes()
+        with self.lock:
+            old = self.entries.pop((path, side), None)
+            if old is not None:
+                self.used_bytes -= old[1]
+            self.entries[(path, side)] = (image, cost)
+            self.used_bytes += cost
+            self.evict()
+
+    def invalidate(self, path: FrameKey):
+        # all sizes of a frame that was written again on disk
+        with self.lock:
+            for key in [key for key in self.entries if key[0] == path]:
+                _, cost = self.entries.pop(key)
+                self.used_bytes -= cost
+
+    def clear(self):
+        with self.lock:
+            self.entries.clear()
+            self.used_bytes = 0
+
+
+# shared by every Images series of the application
+image_cache = ImageCache()
+
+
+class LoadTask(QRunnable):
+    def __init__(self, loader: FrameLoader, path: FrameKey, side: int):
+        super().__init__()
+        self.loader = loader
+        self.path = path
+        self.side = side
+
+    def run(self):
+        start = time.perf_counter()
+        try:
+            self.loader.cache.get(self.path, self.side)
+            self.loader.latencies.append(time.perf_counter() - start)
+        finally:
+            self.loader.finish(self.path, self.side)
+
+
+class FrameLoader(QObject):
+    '''
+        Decodes and scales frames on a thread pool. ready is emitted (and
+        delivered on the GUI thread) once a requested frame is in the cache.
+    '''
+    ready = pyqtSignal(object, int)
+
+    def __init__(self, cache: Optional[ImageCache] = None, max_threads: Optional[int] = None):
+        super().__init__()
+        self.cache = cache if cache is not None else image_cache
+        self.pool = QThreadPool()
+        self.pool.setMaxThreadCount(max_threads or max(2, (os.cpu_count() or 2) - 1))
+        self.pending: set[tuple[FrameKey, int]] = set()
+        self.lock = threading.Lock()
+        # decode + scale time of the last frames in seconds
+        self.latencies: deque[float] = deque(maxlen=100)
+
+    def request(self, path: FrameKey, side: int, priority: int = 0) -> Optional[QImage]:
+        # returns the frame if it is ready, otherwise schedules it
+        image = self.cache.lookup(path, side)
+        if image is not None:
+            return image
+        with self.lock:
+            if (path, side) in self.pending:
+                return None
+            self.pending.add((path, side))
+        self.pool.start(LoadTask(self, path, side), priority)
+        return None
+
+    def finish(self, path: FrameKey, side: int):
+        with self.lock:
+            self.pending.discard((path, side))
+        self.ready.emit(path, side)
+
+    def prefetch(self, files: list[FrameKey], index: int, direction: int, side: int,
+                 ahead: int = 8, behind: int = 2):
+        # mostly frames in the direction of travel, wraps around like the playback does
+        n = len(files)
+        if n == 0:
+            return
+        for k in range(1, min(ahead, n - 1) + 1):
+            self.request(files[(index + direction * k) % n], side, priority=-k)
+        for k in range(1, min(behind, n - 1) + 1):
+            self.request(files[(index - direction * k) % n], side, priority=-ahead - k)
+
+    def mean_latency_ms(self) -> float:
+        latencies = list(self.latencies)
+        if not latencies:
+            return 0.0
+        return sum(latencies) / len(latencies) * 1000
+
+    def wait(self, timeout_ms: int = -1) -> bool:
+        return self.pool.waitForDone(timeout_ms)
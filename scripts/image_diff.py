@@ -0,0 +1,214 @@
+"""
+Difference images between two processed cases, frame by frame for every plane
+and quantity both cases have.
+
+run with: python -m scripts.image_diff <case A>/processed <case B>/processed [--gain 2]
+
+The contour colours are mapped back to a scalar (position in the rainbow
+colour map), the difference B - A is written as a blue-white-red image series
+to <case B>/processed/compare/<case A>/<series>/, which the viewer opens like
+any other image folder. Results are cached with the hashes of both inputs from
+their manifests, only frames with changed inputs are computed again.
+"""
+from __future__ import annotations
+import argparse
+import hashlib
+import json
+import os
+from concurrent.futures import ProcessPoolExecutor
+from pathlib import Path
+from typing import Optional
+
+from scripts.image_pyramid import LEVELS_DIR
+from scripts.manifest import file_hash
+
+DIFF_VERSION = 1
+CACHE_NAME = "diff_manifest.json"
+# colours with less saturation are background, mesh lines or text
+MIN_SATURATION = 0.15
+
+
+def images_root(tree: Path) -> Path:
+    tree = Path(tree)
+    return tree / "images" if (tree / "images").is_dir() else tree
+
+
+def crop_info(folder: Path) -> Optional[dict]:
+    # box the pictures of this folder were cropped with (image_pyramid.py)
+    crop_path = folder / LEVELS_DIR / "crop.json"
+    try:
+        crop = json.loads(crop_path.read_text(encoding="utf-8"))
+    except (OSError, json.JSONDecodeError):
+        return None
+    return crop if crop.get("box") else None
+
+
+def scalar_field(rgb):
+    '''
+        Position of every pixel in the rainbow colour map, 0 (blue) .. 1 (red).
+        NaN for pixels that are not part of the contour (white, grey, black).
+    '''
+    import numpy as np
+
+    rgb = rgb.astype(np.float32) / 255.0
+    r, g, b = rgb[..., 0], rgb[..., 1], rgb[..., 2]
+    high = rgb.max(axis=-1)
+    delta = high - rgb.min(axis=-1)
+    with np.errstate(divide="ignore", invalid="ignore"):
+        hue = np.where(high == r, ((g - b) / delta) % 6,
+                       np.where(high == g, (b - r) / delta + 2, (r - g) / delta + 4)) * 60.0
+    value = np.clip((240.0 - hue) / 240.0, 0.0, 1.0)
+    value[delta < MIN_SATURATION] = np.nan
+    return value
+
+
+def load_field(path: Path, crop: Optional[dict]):
+    # scalar field in the coordinates of the uncropped window, so differently cropped cases line up
+    import numpy as np
+    from PIL import Image
+
+    with Image.open(path) as image:
+        field = scalar_field(np.asarray(image.convert("RGB")))
+    if crop is None:
+        return field, None
+    x0, y0, x1, y1 = crop["box"]
+    if field.shape != (y1 - y0, x1 - x0):
+        # not cropped (yet)
+        return field, None
+    width, height = crop["full_size"]
+    canvas = np.full((height, width), np.nan, dtype=np.float32)
+    canvas[y0:y1, x0:x1] = field
+    return canvas, (x0, y0, x1, y1)
+
+
+def diff_colors(diff, a_missing, b_missing):
+    # blue (B lower) - white - red (B higher), grey where neither case has a contour
+    import numpy as np
+
+    d = np.clip(np.nan_to_num(diff), -1.0, 1.0)
+    rgb = np.empty(d.shape + (3,), dtype=np.float32)
+    rgb[..., 0] = np.where(d > 0, 1.0, 1.0 + d)
+    rgb[..., 1] = 1.0 - np.abs(d)
+    rgb[..., 2] = np.where(d < 0, 1.0, 1.0 - d)
+    rgb[a_missing & b_missing] = 0.85
+    # geometry or range changed: only one case has a value here
+    rgb[a_missing ^ b_missing] = 0.25
+    return (rgb * 255.0 + 0.5).astype(np.uint8)
+
+
+def diff_frame(path_a: Path, path_b: Path, crop_a: Optional[dict], crop_b: Optional[dict],
+               out_path: Path, gain: float = 1.0) -> dict:
+    '''
+        Writes the difference image of one frame and returns its statistics.
+        Runs in the worker processes.
+    '''
+    import numpy as np
+    from PIL import Image
+
+    field_a, box_a = load_field(path_a, crop_a)
+    field_b, box_b = load_field(path_b, crop_b)
+    if field_a.shape != field_b.shape:
+        return {"error": f"size {field_a.shape} != {field_b.shape}"}
+    # only the part of the window that has content in one of the cases
+    if box_a is not None and box_b is not None:
+        x0, y0 = min(box_a[0], box_b[0]), min(box_a[1], box_b[1])
+        x1, y1 = max(box_a[2], box_b[2]), max(box_a[3], box_b[3])
+        field_a, field_b = field_a[y0:y1, x0:x1], field_b[y0:y1, x0:x1]
+    a_missing = np.isnan(field_a)
+    b_missing = np.isnan(field_b)
+    diff = field_b - field_a
+    both = ~(a_missing | b_missing)
+    values = np.abs(diff[both])
+    out_path.parent.mkdir(parents=True, exist_ok=True)
+    tmp_path = out_path.with_name(out_path.name + ".tmp")
+    Image.fromarray(diff_colors(diff * gain, a_missing, b_missing)).save(tmp_path, "PNG", compress_level=6)
+    os.replace(tmp_path, out_path)
+    return {
+        "mean_abs": float(values.mean()) if values.size else 0.0,
+        "max_abs": float(values.max()) if values.size else 0.0,
+        "changed": float((values > 0.05).mean()) if values.size else 0.0,
+        "only_one": float((a_missing ^ b_missing).mean()),
+    }
+
+
+def input_hash(path: Path, manifest: dict, key: str) -> str:
+    # the hash the manifest recorded, if the file wasn't touched since
+    entry = manifest.get("artifacts", {}).get(key)
+    st = path.stat()
+    if entry and entry.get("size") == st.st_size and entry.get("mtime_ns") == st.st_mtime_ns:
+        return entry["sha256"]
+    return file_hash(path)
+
+
+def load_json(path: Path) -> dict:
+    try:
+        return json.loads(path.read_text(encoding="utf-8"))
+    except (OSError, json.JSONDecodeError):
+        return {}
+
+
+def compare_trees(tree_a: Path, tree_b: Path, out_dir: Optional[Path] = None, gain: float = 1.0,
+                  max_workers: Optional[int] = None) -> Path:
+    '''
+        Difference images of all frames both processed folders have.
+        Returns the output folder, one sub folder per series.
+    '''
+    images_a, images_b = images_root(tree_a), images_root(tree_b)
+    if out_dir is None:
+        out_dir = images_b.parent / "compare" / images_a.parent.parent.name
+    out_dir = Path(out_dir)
+    manifest_a = load_json(images_a.parent / "manifest.json")
+    manifest_b = load_json(images_b.parent / "manifest.json")
+    cache_path = out_dir / CACHE_NAME
+    cache = load_json(cache_path)
+    frames = cache.get("frames", {}) if cache.get("version") == DIFF_VERSION else {}
+
+    series = [images_a] + sorted(p for p in images_a.iterdir() if p.is_dir() and (images_b / p.name).is_dir())
+    tasks = []
+    keys = []
+    for folder_a in series:
+        folder_b = images_b / folder_a.relative_to(images_a)
+        crop_a, crop_b = crop_info(folder_a), crop_info(folder_b)
+        names = sorted({p.name for p in folder_a.glob("*.png")} & {p.name for p in folder_b.glob("*.png")})
+        for name in names:
+            path_a, path_b = folder_a / name, folder_b / name
+            key = (folder_a.relative_to(images_a) / name).as_posix()
+            artifact_key = f"images/{key}"
+            frame_hash = hashlib.sha256(
+                f"{DIFF_VERSION}|{gain}|{input_hash(path_a, manifest_a, artifact_key)}|"
+                f"{input_hash(path_b, manifest_b, artifact_key)}".encode()
+            ).hexdigest()
+            out_path = out_dir / key
+            cached = frames.get(key)
+            if cached and cached.get("hash") == frame_hash and out_path.exists():
+                continue
+            frames[key] = {"hash": frame_hash}
+            keys.append(key)
+            tasks.append((path_a, path_b, crop_a, crop_b, out_path, gain))
+
+    print(f"{len(tasks)} of {len(frames)} difference images to compute")
+    if tasks:
+        with ProcessPoolExecutor(max_workers=max_workers) as pool:
+            results = pool.map(diff_frame, *zip(*tasks), chunksize=4)
+            for key, stats in zip(keys, results):
+                frames[key].update(stats)
+    cache_path.parent.mkdir(parents=True, exist_ok=True)
+    cache_path.write_text(json.dumps({"version": DIFF_VERSION, "tree_a": str(images_a), "tree_b": str(images_b),
+                                      "frames": frames}, indent=1), encoding="utf-8")
+    return out_dir
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Difference images between two processed cases (B - A).")
+    parser.add_argument("tree_a", type=Path)
+    parser.add_argument("tree_b", type=Path)
+    parser.add_argument("--out", type=Path, default=None)
+    parser.add_argument("--gain", type=float, default=1.0, help="amplifies small differences")
+    parser.add_argument("--workers", type=int, default=None)
+    args = parser.parse_args()
+    out_dir = compare_trees(args.tree_a, args.tree_b, args.out, args.gain, args.workers)
+    print(f"Difference images saved in: {out_dir}")
+
+
+if __name__ == "__main__":
+    main()
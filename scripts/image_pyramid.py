@@ -0,0 +1,210 @@
+"""
+Post-render stage for the pictures of save-picture: crops the blank window
+margins, recompresses and writes downscaled levels for the viewer.
+
+    images/side_vel/side_vel_03.png              cropped, optimized PNG
+    images/side_vel/levels/crop.json             crop box of the series
+    images/side_vel/levels/512/side_vel_03.png   longest side <= 512 px
+
+All frames of a series are cropped with the same box (union of their
+content), so the planes don't jump when scrubbing. Frames rendered later with
+the same recipe (camera, contour, planes) are cropped with the stored box; a
+changed recipe or a new frame with content outside the box computes it again.
+Runs on a process pool.
+The levels can be written as lossless WebP, the full picture always stays a
+PNG: Fluent writes it and the manifest and the viewer know it by that name.
+"""
+from __future__ import annotations
+import json
+import os
+from collections import Counter
+from concurrent.futures import ProcessPoolExecutor
+from functools import lru_cache
+from pathlib import Path
+from typing import Optional
+
+LEVELS = (1024, 512, 256)
+LEVELS_DIR = "levels"
+PADDING = 8
+
+
+def content_box(path: Path) -> tuple[Optional[tuple[int, int, int, int]], tuple[int, int]]:
+    # bounding box of everything that differs from the background (colour of the top left pixel)
+    from PIL import Image, ImageChops
+
+    with Image.open(path) as image:
+        image = image.convert("RGB")
+        background = Image.new("RGB", image.size, image.getpixel((0, 0)))
+        return ImageChops.difference(image, background).getbbox(), image.size
+
+
+def image_size(path: Path) -> tuple[int, int]:
+    from PIL import Image
+
+    with Image.open(path) as image:
+        return image.size
+
+
+def inside(box: Optional[tuple[int, int, int, int]], outer: Optional[tuple[int, int, int, int]]) -> bool:
+    if box is None:
+        return True
+    if outer is None:
+        return False
+    return box[0] >= outer[0] and box[1] >= outer[1] and box[2] <= outer[2] and box[3] <= outer[3]
+
+
+def save_image(image, path: Path, fmt: str):
+    # write next to the target and replace, a reader never sees half a file
+    path.parent.mkdir(parents=True, exist_ok=True)
+    tmp_path = path.with_name(path.name + ".tmp")
+    if fmt == "webp":
+        image.save(tmp_path, "WEBP", lossless=True, method=4)
+    else:
+        image.save(tmp_path, "PNG", optimize=True)
+    os.replace(tmp_path, path)
+
+
+def level_path(path: Path, level: int, fmt: str = "png") -> Path:
+    return path.parent / LEVELS_DIR / str(level) / f"{path.stem}.{fmt}"
+
+
+def process_image(path: Path, box: Optional[tuple[int, int, int, int]], full_size: Optional[tuple[int, int]],
+                  levels: tuple[int, ...] = LEVELS, fmt: str = "png") -> bool:
+    '''
+        Crops a full-window picture to box and writes the missing levels.
+        Returns True if the picture itself was changed. Runs in the worker processes.
+    '''
+    from PIL import Image
+
+    with Image.open(path) as image:
+        # opening only reads the header, most pictures are up to date after the first run
+        crop = box is not None and full_size is not None and image.size == tuple(full_size)
+        size = (box[2] - box[0], box[3] - box[1]) if crop else image.size
+        source_mtime = path.stat().st_mtime
+        missing = [level for level in levels if max(size) > level
+                   and not (level_path(path, level, fmt).exists()
+                            and level_path(path, level, fmt).stat().st_mtime >= source_mtime)]
+        if not crop and not missing:
+            return False
+        image.load()
+    if crop:
+        image = image.convert("RGB").crop(box)
+        save_image(image, path, "png")
+        # the levels of the uncropped picture are outdated as well
+        missing = [level for level in levels if max(image.size) > level]
+    for level in missing:
+        target = level_path(path, level, fmt)
+        scaled = image.convert("RGB")
+        scaled.thumbnail((level, level), Image.Resampling.LANCZOS)
+        save_image(scaled, target, fmt)
+    return crop
+
+
+def union_box(boxes: list[Optional[tuple[int, int, int, int]]], size: tuple[int, int],
+              padding: int = PADDING) -> Optional[tuple[int, int, int, int]]:
+    boxes = [box for box in boxes if box is not None]
+    if not boxes:
+        return None
+    return (max(min(box[0] for box in boxes) - padding, 0),
+            max(min(box[1] for box in boxes) - padding, 0),
+            min(max(box[2] for box in boxes) + padding, size[0]),
+            min(max(box[3] for box in boxes) + padding, size[1]))
+
+
+def optimize_folders(folders: list[Path], levels: tuple[int, ...] = LEVELS, fmt: str = "png",
+                     max_workers: Optional[int] = None, recipes: Optional[dict[Path, str]] = None) -> list[Path]:
+    '''
+        Crops and downscales the PNGs of every folder (one series per folder).
+        Pictures that are already cropped only get their missing levels.
+        recipes: render recipe per folder, the stored crop box is only used
+        for pictures of the same recipe.
+        fmt: format of the levels, the cropped full picture is saved as PNG.
+        Returns the pictures that were changed.
+    '''
+    series = {}
+    for folder in folders:
+        files = sorted(Path(folder).glob("*.png"))
+        if files:
+            series[Path(folder)] = files
+    if not series:
+        return []
+
+    recipes = {Path(folder): recipe for folder, recipe in (recipes or {}).items()}
+    with ProcessPoolExecutor(max_workers=max_workers) as pool:
+        # crop box per series: stored from an earlier run or the union over all uncropped frames
+        crops = {}
+        stored = {}
+        for folder in series:
+            crop_path = folder / LEVELS_DIR / "crop.json"
+            if crop_path.exists():
+                crop = json.loads(crop_path.read_text(encoding="utf-8"))
+                if crop.get("recipe") == recipes.get(folder):
+                    stored[folder] = (tuple(crop["box"]) if crop["box"] else None, tuple(crop["full_size"]))
+        all_files = [path for files in series.values() for path in files]
+        sizes = dict(zip(all_files, pool.map(image_size, all_files, chunksize=16)))
+        # frames at window size were rendered since the last crop, only these are looked at
+        uncropped = {}
+        for folder, files in series.items():
+            full_size = stored[folder][1] if folder in stored else Counter(sizes[path] for path in files).most_common(1)[0][0]
+            uncropped[folder] = [path for path in files if sizes[path] == full_size]
+        fresh = [path for files in uncropped.values() for path in files]
+        boxes = dict(zip(fresh, pool.map(content_box, fresh, chunksize=4)))
+        for folder, files in series.items():
+            if folder in stored and all(inside(boxes[path][0], stored[folder][0]) for path in uncropped[folder]):
+                crops[folder] = stored[folder]
+                continue
+            if folder in stored:
+                print(f"Content of {folder.name} is outside of its crop box, computing it again")
+            if not uncropped[folder]:
+                crops[folder] = (None, None)
+                continue
+            full_size = sizes[uncropped[folder][0]]
+            box = union_box([boxes[path][0] for path in uncropped[folder]], full_size)
+            if box == (0, 0, *full_size):
+                # no margins, nothing to crop
+                box = None
+            crops[folder] = (box, full_size)
+            crop_path = folder / LEVELS_DIR / "crop.json"
+            crop_path.parent.mkdir(parents=True, exist_ok=True)
+            crop_path.write_text(json.dumps({"box": box, "full_size": full_size, "recipe": recipes.get(folder)}),
+                                 encoding="utf-8")
+
+        tasks = [(path, *crops[folder]) for folder, files in series.items() for path in files]
+        changed = pool.map(process_image, [t[0] for t in tasks], [t[1] for t in tasks], [t[2] for t in tasks],
+                           [levels] * len(tasks), [fmt] * len(tasks), chunksize=4)
+        return [task[0] for task, was_changed in zip(tasks, changed) if was_changed]
+
+
+@lru_cache(maxsize=64)
+def available_levels(folder: Path, mtime_ns: int) -> tuple[tuple[int, str], ...]:
+    # (level, file suffix) sorted ascending, cached until the levels folder changes
+    levels = []
+    for level_dir in (folder / LEVELS_DIR).iterdir():
+        if level_dir.is_dir() and level_dir.name.isdigit():
+            suffix = ".webp" if next(level_dir.glob("*.webp"), None) is not None else ".png"
+            levels.append((int(level_dir.name), suffix))
+    return tuple(sorted(levels))
+
+
+def pyramid_source(path: Path, side: int) -> Path:
+    '''
+        Smallest level that is still at least side pixels, the full picture if
+        there is none. Used by the viewer to decode as few pixels as possible.
+    '''
+    if side <= 0:
+        return path
+    try:
+        mtime_ns = (path.parent / LEVELS_DIR).stat().st_mtime_ns
+    except OSError:
+        return path
+    for level, suffix in available_levels(path.parent, mtime_ns):
+        if level >= side:
+            candidate = path.parent / LEVELS_DIR / str(level) / (path.stem + suffix)
+            try:
+                # a picture rendered again after the levels were made
+                if candidate.stat().st_mtime >= path.stat().st_mtime:
+                    return candidate
+            except OSError:
+                pass
+            break
+    return path
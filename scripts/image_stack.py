@@ -0,0 +1,168 @@
+"""
+Packed image stack: all frames of one series (e.g. processed/images/side_vel)
+in a single indexed file that can be memory-mapped.
+
+Layout:
+    8 bytes   magic b"BRTSTK01"
+    4 bytes   length of the JSON header (little endian)
+    n bytes   JSON header: frame size, pixel format, compression and per frame
+              name, offset, length and plane coordinate
+    frames    raw RGB888 rows (or zlib compressed), every frame starts on a
+              page boundary so reading a raw frame touches only its own pages
+"""
+from __future__ import annotations
+import json
+import mmap
+import struct
+import zlib
+from functools import lru_cache
+from pathlib import Path
+from typing import NamedTuple, Optional
+
+STACK_MAGIC = b"BRTSTK01"
+PAGE_SIZE = mmap.ALLOCATIONGRANULARITY
+
+
+class StackFrame(NamedTuple):
+    # cache key of a frame inside a stack, used like the Path of a single PNG
+    stack_path: Path
+    index: int
+
+
+def pack_series(folder: Path, out_path: Optional[Path] = None,
+                positions: Optional[list[float]] = None, axis: str = "",
+                compression: str = "none") -> Path:
+    '''
+        Packs all PNGs of folder (sorted by name) into folder.stack.
+        positions / axis are stored as plane coordinate of each frame.
+    '''
+    from PIL import Image
+
+    folder = Path(folder)
+    if out_path is None:
+        out_path = folder.with_suffix(".stack")
+    if compression not in ("none", "zlib"):
+        raise ValueError(f"Unknown compression: {compression}")
+    files = sorted(folder.glob("*.png"))
+    if not files:
+        raise FileNotFoundError(f"No .png files found in {folder}")
+
+    frames = []
+    width = height = None
+    for i, f in enumerate(files):
+        with Image.open(f) as img:
+            img = img.convert("RGB")
+            if width is None:
+                width, height = img.size
+            elif img.size != (width, height):
+                img = img.resize((width, height))
+            data = img.tobytes()
+        if compression == "zlib":
+            data = zlib.compress(data, 1)
+        frame = {"name": f.name, "length": len(data)}
+        if positions is not None and i < len(positions):
+            frame["plane"] = {"axis": axis, "position": positions[i]}
+        frames.append((frame, data))
+
+    header = {
+        "width": width,
+        "height": height,
+        "format": "RGB888",
+        "compression": compression,
+        "frames": [frame for frame, _ in frames],
+    }
+    # offsets depend on the header length, which depends on the offsets: reserve room first
+    for frame, _ in frames:
+        frame["offset"] = 0
+    header_len = len(json.dumps(header).encode("utf-8")) + 16 * len(frames) + 64
+    offset = align(len(STACK_MAGIC) + 4 + header_len)
+    for frame, data in frames:
+        frame["offset"] = offset
+        offset = align(offset + len(data))
+    header_bytes = json.dumps(header).encode("utf-8")
+    assert len(header_bytes) <= header_len
+    header_bytes = header_bytes.ljust(header_len)
+
+    tmp_path = out_path.with_suffix(".stack.tmp")
+    with open(tmp_path, "wb") as f:
+        f.write(STACK_MAGIC)
+        f.write(struct.pack("<I", header_len))
+        f.write(header_bytes)
+        for frame, data in frames:
+            f.seek(frame["offset"])
+            f.write(data)
+        f.truncate(offset)
+    # let go of the mappings of the old stack, Windows can't replace a mapped file
+    cached_stack.cache_clear()
+    tmp_path.replace(out_path)
+    return out_path
+
+
+def align(offset: int) -> int:
+    return (offset + PAGE_SIZE - 1) // PAGE_SIZE * PAGE_SIZE
+
+
+class ImageStack():
+    def __init__(self, path: Path):
+        self.path = Path(path)
+        self.file = open(self.path, "rb")
+        self.mm = mmap.mmap(self.file.fileno(), 0, access=mmap.ACCESS_READ)
+        if self.mm[:len(STACK_MAGIC)] != STACK_MAGIC:
+            self.close()
+            raise ValueError(f"{self.path} is not an image stack")
+        (header_len,) = struct.unpack_from("<I", self.mm, len(STACK_MAGIC))
+        start = len(STACK_MAGIC) + 4
+        self.header = json.loads(bytes(self.mm[start:start + header_len]))
+        self.width = self.header["width"]
+        self.height = self.header["height"]
+        self.compression = self.header["compression"]
+        self.frames = self.header["frames"]
+        self.n_frames = len(self.frames)
+
+    def __len__(self):
+        return self.n_frames
+
+    def frame_bytes(self, index: int) -> memoryview:
+        # raw frames are a view into the mapping, nothing is copied
+        frame = self.frames[index]
+        view = memoryview(self.mm)[frame["offset"]:frame["offset"] + frame["length"]]
+        if self.compression == "zlib":
+            return memoryview(zlib.decompress(view))
+        return view
+
+    def frame(self, index: int):
+        # (height, width, 3) uint8 array
+        import numpy as np
+        return np.frombuffer(self.frame_bytes(index), dtype=np.uint8).reshape(self.height, self.width, 3)
+
+    def qimage(self, index: int):
+        # the QImage points into the mapping, copy() it to keep it after the stack is closed
+        from PyQt6.QtGui import QImage
+        data = self.frame_bytes(index)
+        image = QImage(data, self.width, self.height, self.width * 3, QImage.Format.Format_RGB888)
+        if self.compression == "zlib":
+            # the decompressed buffer dies with this function
+            return image.copy()
+        return image
+
+    def plane(self, index: int) -> Optional[dict]:
+        return self.frames[index].get("plane")
+
+    def close(self):
+        try:
+            self.mm.close()
+        except (BufferError, ValueError):
+            # views into the mapping are still alive, the mapping closes with them
+            pass
+        self.file.close()
+
+
+@lru_cache(maxsize=32)
+def cached_stack(path: Path, mtime_ns: int, size: int) -> ImageStack:
+    return ImageStack(path)
+
+
+def open_stack(path: Path) -> ImageStack:
+    # the viewer keeps the stacks it reads from mapped, a packed again stack is mapped again
+    stat = Path(path).stat()
+    return cached_stack(Path(path), stat.st_mtime_ns, stat.st_size)
@@ -0,0 +1,200 @@
+"""
+Timing of the pipeline stages: wall time, CPU time and peak RSS per stage,
+exported as JSON summary and as Chrome trace (open in chrome://tracing or
+https://ui.perfetto.dev).
+
+A stage costs two clock reads and one getrusage call, so it stays on.
+"""
+from __future__ import annotations
+import functools
+import json
+import os
+import sys
+import threading
+import time
+from contextlib import contextmanager
+from pathlib import Path
+from typing import Optional
+
+try:
+    import resource
+except ImportError:  # Windows
+    resource = None
+
+
+def peak_rss_mb(children: bool = False) -> Optional[float]:
+    '''
+        High-water mark of the resident memory of this process, or of its
+        terminated child processes (e.g. Fluent) with children=True.
+    '''
+    if resource is not None:
+        who = resource.RUSAGE_CHILDREN if children else resource.RUSAGE_SELF
+        # ru_maxrss is in kB on Linux and in bytes on macOS
+        scale = 1 if sys.platform == "darwin" else 1024
+        return resource.getrusage(who).ru_maxrss * scale / 2**20
+    if os.name == "nt" and not children:
+        return windows_peak_rss_mb()
+    return None
+
+
+def windows_peak_rss_mb() -> Optional[float]:
+    import ctypes
+    from ctypes import wintypes
+
+    class PROCESS_MEMORY_COUNTERS(ctypes.Structure):
+        _fields_ = [
+            ("cb", wintypes.DWORD),
+            ("PageFaultCount", wintypes.DWORD),
+            ("PeakWorkingSetSize", ctypes.c_size_t),
+            ("WorkingSetSize", ctypes.c_size_t),
+            ("QuotaPeakPagedPoolUsage", ctypes.c_size_t),
+            ("QuotaPagedPoolUsage", ctypes.c_size_t),
+            ("QuotaPeakNonPagedPoolUsage", ctypes.c_size_t),
+            ("QuotaNonPagedPoolUsage", ctypes.c_size_t),
+            ("PagefileUsage", ctypes.c_size_t),
+            ("PeakPagefileUsage", ctypes.c_size_t),
+        ]
+
+    counters = PROCESS_MEMORY_COUNTERS()
+    counters.cb = ctypes.sizeof(counters)
+    kernel32 = ctypes.WinDLL("kernel32")
+    kernel32.GetCurrentProcess.restype = wintypes.HANDLE
+    get_info = kernel32.K32GetProcessMemoryInfo
+    get_info.argtypes = [wintypes.HANDLE, ctypes.POINTER(PROCESS_MEMORY_COUNTERS), wintypes.DWORD]
+    if not get_info(kernel32.GetCurrentProcess(), ctypes.byref(counters), counters.cb):
+        return None
+    return counters.PeakWorkingSetSize / 2**20
+
+
+class Span():
+    def __init__(self, name: str, lane: str, start: float, wall_s: float,
+                 cpu_s: Optional[float] = None, peak_rss_mb: Optional[float] = None,
+                 args: Optional[dict] = None):
+        self.name = name
+        self.lane = lane
+        self.start = start
+        self.wall_s = wall_s
+        self.cpu_s = cpu_s
+        self.peak_rss_mb = peak_rss_mb
+        self.args = args or {}
+
+
+class Tracer():
+    '''
+        Collects spans from every thread. Times are time.perf_counter values,
+        the same clock progress.ProgressTracker uses for the Fluent steps.
+    '''
+    def __init__(self, enabled: bool = True):
+        self.enabled = enabled
+        self.origin = time.perf_counter()
+        self.origin_epoch = time.time()
+        self.spans: list[Span] = []
+        self.lock = threading.Lock()
+
+    @contextmanager
+    def stage(self, name: str, **args):
+        if not self.enabled:
+            yield
+            return
+        start = time.perf_counter()
+        # process time of all threads, parallel stages see each other's CPU time
+        cpu_start = time.process_time()
+        try:
+            yield
+        finally:
+            wall_s = time.perf_counter() - start
+            span = Span(name, threading.current_thread().name, start, wall_s,
+                        time.process_time() - cpu_start, peak_rss_mb(), args)
+            with self.lock:
+                self.spans.append(span)
+
+    def add(self, name: str, lane: str, start: float, end: float, **args):
+        # spans measured elsewhere, e.g. the Fluent steps inferred from the transcript
+        if not self.enabled:
+            return
+        with self.lock:
+            self.spans.append(Span(name, lane, start, end - start, args=args))
+
+    def summary(self) -> dict:
+        with self.lock:
+            spans = sorted(self.spans, key=lambda span: span.start)
+        totals: dict[str, dict] = {}
+        for span in spans:
+            total = totals.setdefault(span.name, {"count": 0, "wall_s": 0.0, "cpu_s": 0.0})
+            total["count"] += 1
+            total["wall_s"] += span.wall_s
+            total["cpu_s"] += span.cpu_s or 0.0
+        return {
+            "started": self.origin_epoch,
+            "peak_rss_mb": peak_rss_mb(),
+            "children_peak_rss_mb": peak_rss_mb(children=True),
+            "totals": totals,
+            "spans": [
+                {
+                    "name": span.name,
+                    "lane": span.lane,
+                    "start_s": span.start - self.origin,
+                    "wall_s": span.wall_s,
+                    "cpu_s": span.cpu_s,
+                    "peak_rss_mb": span.peak_rss_mb,
+                    "args": span.args,
+                }
+                for span in spans
+            ],
+        }
+
+    def chrome_trace(self) -> dict:
+        with self.lock:
+            spans = list(self.spans)
+        pid = os.getpid()
+        lanes: dict[str, int] = {}
+        events = []
+        for span in spans:
+            tid = lanes.setdefault(span.lane, len(lanes) + 1)
+            args = dict(span.args)
+            if span.cpu_s is not None:
+                args["cpu_ms"] = round(span.cpu_s * 1e3, 3)
+            if span.peak_rss_mb is not None:
+                args["peak_rss_mb"] = round(span.peak_rss_mb, 1)
+            events.append({
+                "name": span.name,
+                "cat": "fluent" if span.cpu_s is None else "python",
+                "ph": "X",
+                "ts": (span.start - self.origin) * 1e6,
+                "dur": span.wall_s * 1e6,
+                "pid": pid,
+                "tid": tid,
+                "args": args,
+            })
+        for lane, tid in lanes.items():
+            events.append({"name": "thread_name", "ph": "M", "pid": pid, "tid": tid, "args": {"name": lane}})
+        return {"traceEvents": events, "displayTimeUnit": "ms"}
+
+    def export(self, folder: Path, stem: str = "timings") -> Optional[tuple[Path, Path]]:
+        # <stem>.json (summary) and <stem>.trace.json (Chrome trace)
+        if not self.enabled or not self.spans:
+            return None
+        folder = Path(folder)
+        json_path = folder / f"{stem}.json"
+        trace_path = folder / f"{stem}.trace.json"
+        json_path.write_text(json.dumps(self.summary(), indent=1), encoding="utf-8")
+        trace_path.write_text(json.dumps(self.chrome_trace()), encoding="utf-8")
+        return json_path, trace_path
+
+
+def traced(name: Optional[str] = None):
+    '''
+        Method decorator, times the call as a stage of self.tracer.
+    '''
+    def decorator(func):
+        stage_name = name or func.__name__
+
+        @functools.wraps(func)
+        def wrapper(self, *args, **kwargs):
+            tracer = getattr(self, "tracer", None)
+            if tracer is None:
+                return func(self, *args, **kwargs)
+            with tracer.stage(stage_name):
+                return func(self, *args, **kwargs)
+        return wrapper
+    return decorator
@@ -0,0 +1,319 @@
+from __future__ import annotations
+import json
+import os
+import threading
+import time
+from pathlib import Path
+from typing import Callable, Optional
+
+from scripts.case_catalog import CaseCatalog
+from scripts.fluent_processing import FluentPostProcesser
+from scripts.force_sheet import export_batch
+from scripts.supervisor import ProcessCancelled
+from scripts.tuning import Tuner, estimate_cells
+
+QUEUED = "queued"
+RUNNING = "running"
+DONE = "done"
+FAILED = "failed"
+CANCELLED = "cancelled"
+
+
+class Job():
+    def __init__(self, job_id: int, case_file_path: Path, priority: int = 0,
+                 threads: int = 8, n_shards: int = 1):
+        self.job_id = job_id
+        self.case_file_path = Path(case_file_path)
+        # higher priority runs first, equal priorities run in order of submission
+        self.priority = priority
+        self.threads = threads
+        self.n_shards = n_shards
+        self.state = QUEUED
+        self.progress = 0
+        self.attempts = 0
+        self.error = ""
+        self.submitted = time.time()
+        self.started: Optional[float] = None
+        self.finished: Optional[float] = None
+        self.forces: Optional[list[float]] = None
+        self.processor: Optional[FluentPostProcesser] = None
+        # set by cancel(), also before the processor exists
+        self.cancel_event = threading.Event()
+        self.thread: Optional[threading.Thread] = None
+
+    @property
+    def active(self) -> bool:
+        # a cancelled job still holds its cores until its thread is done
+        return self.thread is not None and self.thread.is_alive()
+
+    @property
+    def cores(self) -> int:
+        return self.threads * self.n_shards
+
+    @property
+    def licences(self) -> int:
+        # every Fluent process holds one solver licence
+        return self.n_shards
+
+    def to_dict(self) -> dict:
+        return {
+            "job_id": self.job_id,
+            "case_file_path": str(self.case_file_path),
+            "priority": self.priority,
+            "threads": self.threads,
+            "n_shards": self.n_shards,
+            "state": self.state,
+            "progress": self.progress,
+            "attempts": self.attempts,
+            "error": self.error,
+            "submitted": self.submitted,
+            "started": self.started,
+            "finished": self.finished,
+            "forces": self.forces,
+        }
+
+    @classmethod
+    def from_dict(cls, d: dict) -> Job:
+        job = cls(d["job_id"], Path(d["case_file_path"]), d["priority"], d["threads"], d.get("n_shards", 1))
+        job.state = d["state"]
+        job.progress = d["progress"]
+        job.attempts = d["attempts"]
+        job.error = d["error"]
+        job.submitted = d["submitted"]
+        job.started = d["started"]
+        job.finished = d["finished"]
+        job.forces = d.get("forces")
+        # a job that was running when the queue stopped starts over
+        if job.state == RUNNING:
+            job.state = QUEUED
+            job.progress = 0
+        return job
+
+
+class JobQueue():
+    '''
+        Persistent queue of Fluent post-processing jobs.
+        Jobs are started as long as their cores and licences fit into the
+        global budget, so the machine is never oversubscribed.
+    '''
+    def __init__(self, fluent_exe_path: Path,
+                 state_path: Path = Path.home() / ".post_processing" / "job_queue.json",
+                 max_cores: Optional[int] = None,
+                 max_licences: int = 4,
+                 per_case_workbooks: bool = True,
+                 executor=None,
+                 on_change: Optional[Callable[[Job], None]] = None):
+        self.fluent_exe_path = fluent_exe_path
+        self.state_path = Path(state_path)
+        self.max_cores = max_cores or os.cpu_count() or 8
+        self.max_licences = max_licences
+        # False: no aero force sheet per case, use export_forces for the whole batch
+        self.per_case_workbooks = per_case_workbooks
+        # None runs Fluent on this machine, a BatchExecutor submits the jobs to a cluster (see executors.py)
+        self.executor = executor
+        self.on_change = on_change
+        # windows that show the jobs, called like on_change
+        self.listeners: list[Callable[[Job], None]] = []
+        self.jobs: list[Job] = []
+        self.lock = threading.RLock()
+        self.wakeup = threading.Event()
+        self.stop_flag = False
+        self.scheduler_thread: Optional[threading.Thread] = None
+        self.load()
+
+    # --- persistence ---
+    def load(self):
+        if self.state_path.exists():
+            data = json.loads(self.state_path.read_text(encoding="utf-8"))
+            self.jobs = [Job.from_dict(d) for d in data["jobs"]]
+
+    def save(self):
+        # jobs finish on several threads, they must not replace the file at the same time
+        with self.lock:
+            data = {"jobs": [job.to_dict() for job in self.jobs]}
+            self.state_path.parent.mkdir(parents=True, exist_ok=True)
+            tmp_path = self.state_path.with_suffix(".tmp")
+            tmp_path.write_text(json.dumps(data, indent=2), encoding="utf-8")
+            os.replace(tmp_path, self.state_path)
+
+    def changed(self, job: Job):
+        self.save()
+        self.notify(job)
+        self.wakeup.set()
+
+    def notify(self, job: Job):
+        if self.on_change is not None:
+            self.on_change(job)
+        for listener in list(self.listeners):
+            listener(job)
+
+    # --- public api ---
+    def tuned_threads(self, case_file_path: Path, n_shards: int) -> int:
+        # threads for the best throughput of everything that is queued, with the run history of this machine
+        info = CaseCatalog().get(case_file_path)
+        size_mb = case_file_path.stat().st_size / 2**20 if case_file_path.exists() else 0.0
+        n_cases = len(self.jobs_by_state(QUEUED)) + len(self.jobs_by_state(RUNNING)) + 1
+        tuner = Tuner(cores=self.max_cores // n_shards, licences=max(self.max_licences // n_shards, 1))
+        threads, _ = tuner.plan(estimate_cells(info.cell_count if info else None, size_mb), n_cases)
+        return threads
+
+    def add(self, case_file_path: Path, priority: int = 0, threads: Optional[int] = None, n_shards: int = 1) -> Job:
+        # threads None: chosen from the mesh size, the queue and the run history
+        if n_shards > self.max_cores:
+            raise ValueError(f"{n_shards} shards need more than the {self.max_cores} cores of the queue")
+        if n_shards > self.max_licences:
+            raise ValueError(f"{n_shards} shards need more than the {self.max_licences} licences of the queue")
+        if threads is None:
+            threads = self.tuned_threads(Path(case_file_path), n_shards)
+        with self.lock:
+            job_id = max((job.job_id for job in self.jobs), default=0) + 1
+            # a single job can never need more than the whole machine
+            threads = max(min(threads, self.max_cores // n_shards), 1)
+            job = Job(job_id, case_file_path, priority, threads, n_shards)
+            self.jobs.append(job)
+        self.changed(job)
+        return job
+
+    def get(self, job_id: int) -> Job:
+        with self.lock:
+            for job in self.jobs:
+                if job.job_id == job_id:
+                    return job
+        raise KeyError(f"No job with id {job_id}")
+
+    def set_priority(self, job_id: int, priority: int):
+        job = self.get(job_id)
+        job.priority = priority
+        self.changed(job)
+
+    def cancel(self, job_id: int):
+        job = self.get(job_id)
+        with self.lock:
+            if job.state == QUEUED:
+                job.state = CANCELLED
+            elif job.state == RUNNING:
+                job.state = CANCELLED
+                # the processor may still be built, run_job checks the event before starting Fluent
+                job.cancel_event.set()
+                if job.processor is not None:
+                    job.processor.cancel()
+            else:
+                return
+        self.changed(job)
+
+    def retry(self, job_id: int):
+        job = self.get(job_id)
+        with self.lock:
+            if job.state not in (FAILED, CANCELLED):
+                return
+            if job.active:
+                # a second run on the same case folder while the cancelled one is still stopping
+                print(f"Job {job_id} is still stopping, retry it when it has finished")
+                return
+            job.cancel_event = threading.Event()
+            job.state = QUEUED
+            job.progress = 0
+            job.error = ""
+        self.changed(job)
+
+    def remove_finished(self):
+        with self.lock:
+            self.jobs = [job for job in self.jobs if job.state in (QUEUED, RUNNING) or job.active]
+        self.save()
+
+    def export_forces(self, destination: Path, mode: str = "sheets") -> Path:
+        # one workbook for all finished jobs, see force_sheet.export_batch
+        with self.lock:
+            cases = [(job.case_file_path.name.replace(".cas.h5", ""), job.forces)
+                     for job in self.jobs if job.state == DONE and job.forces]
+        if not cases:
+            raise ValueError("No finished jobs with forces to export")
+        return export_batch(cases, destination, mode)
+
+    def jobs_by_state(self, state: str) -> list[Job]:
+        with self.lock:
+            return [job for job in self.jobs if job.state == state]
+
+    # --- scheduling ---
+    def start(self):
+        if self.scheduler_thread is not None and self.scheduler_thread.is_alive():
+            return
+        self.stop_flag = False
+        self.scheduler_thread = threading.Thread(target=self.schedule_loop, daemon=True)
+        self.scheduler_thread.start()
+
+    def stop(self):
+        self.stop_flag = True
+        self.wakeup.set()
+
+    def wait(self):
+        # blocks until no job is queued or running anymore
+        while self.jobs_by_state(QUEUED) or self.jobs_by_state(RUNNING) or self.active_jobs():
+            time.sleep(0.2)
+
+    def active_jobs(self) -> list[Job]:
+        with self.lock:
+            return [job for job in self.jobs if job.active]
+
+    def next_jobs(self) -> list[Job]:
+        with self.lock:
+            # cancelled jobs keep their cores and licences until Fluent has stopped
+            running = [job for job in self.jobs if job.state == RUNNING or job.active]
+            free_cores = self.max_cores - sum(job.cores for job in running)
+            free_licences = self.max_licences - sum(job.licences for job in running)
+            queued = sorted(self.jobs_by_state(QUEUED), key=lambda job: (-job.priority, job.submitted))
+            selected = []
+            # highest priority first, smaller jobs may backfill cores a big one can't use yet
+            for job in queued:
+                if job.cores <= free_cores and job.licences <= free_licences:
+                    selected.append(job)
+                    free_cores -= job.cores
+                    free_licences -= job.licences
+                    job.state = RUNNING
+            return selected
+
+    def schedule_loop(self):
+        while not self.stop_flag:
+            for job in self.next_jobs():
+                job.thread = threading.Thread(target=self.run_job, args=(job,), daemon=True)
+                job.thread.start()
+            self.wakeup.wait(timeout=1.0)
+            self.wakeup.clear()
+
+    def run_job(self, job: Job):
+        job.attempts += 1
+        job.started = time.time()
+        job.finished = None
+        job.error = ""
+        self.changed(job)
+
+        def progress(value):
+            job.progress = value
+            self.notify(job)
+
+        processor = None
+        try:
+            processor = FluentPostProcesser(self.fluent_exe_path, job.case_file_path, callback=progress,
+                                            n_shards=job.n_shards, threads_per_shard=job.threads,
+                                            write_sheet=self.per_case_workbooks, executor=self.executor,
+                                            cancel_event=job.cancel_event)
+            job.processor = processor
+            # cancelled while the processor was built (catalog, case headers)
+            if job.cancel_event.is_set():
+                raise ProcessCancelled("Job was cancelled.")
+            processor.run()
+            job.forces = getattr(processor, "forces", None)
+            with self.lock:
+                if job.state == RUNNING:
+                    job.state = DONE
+                    job.progress = 100
+        except Exception as e:
+            with self.lock:
+                if job.state == RUNNING:
+                    job.state = FAILED
+                    job.error = str(e)
+        finally:
+            if job.processor is processor:
+                job.processor = None
+            job.finished = time.time()
+            self.changed(job)
@@ -0,0 +1,153 @@
+from __future__ import annotations
+import hashlib
+import json
+import os
+import time
+from pathlib import Path
+from typing import Optional
+
+MANIFEST_VERSION = 1
+PNG_SIGNATURE = b"\x89PNG\r\n\x1a\n"
+PNG_IEND = b"\x00\x00\x00\x00IEND\xaeB`\x82"
+
+
+def file_hash(path: Path, chunk_size: int = 4 * 1024 * 1024) -> str:
+    h = hashlib.sha256()
+    with open(path, "rb") as f:
+        while chunk := f.read(chunk_size):
+            h.update(chunk)
+    return h.hexdigest()
+
+
+def text_hash(text: str) -> str:
+    return hashlib.sha256(text.encode("utf-8")).hexdigest()
+
+
+def is_complete(path: Path) -> bool:
+    # a PNG is only completely written once the IEND chunk is at its end
+    try:
+        if path.suffix.lower() != ".png":
+            return path.stat().st_size > 0
+        with open(path, "rb") as f:
+            if f.read(8) != PNG_SIGNATURE:
+                return False
+            f.seek(-len(PNG_IEND), os.SEEK_END)
+            return f.read(len(PNG_IEND)) == PNG_IEND
+    except OSError:
+        return False
+
+
+class Manifest():
+    '''
+        processed/manifest.json, records what the last runs produced:
+            case:      hash of the case (and data) file
+            artifacts: per output file the hash of its recipe (journal commands)
+                       and of the file content
+            pending:   artifacts of a run that was started but never recorded,
+                       e.g. because Fluent or the application crashed
+        Hashes of big files are only recomputed if size or mtime changed.
+    '''
+    def __init__(self, path: Path):
+        self.path = Path(path)
+        self.data = {"version": MANIFEST_VERSION, "case": {}, "artifacts": {}, "pending": None}
+        if self.path.exists():
+            try:
+                data = json.loads(self.path.read_text(encoding="utf-8"))
+                if data.get("version") == MANIFEST_VERSION:
+                    self.data = data
+            except (json.JSONDecodeError, OSError):
+                print(f"Manifest {self.path} unreadable, starting a new one")
+
+    def save(self):
+        tmp_path = self.path.with_suffix(".tmp")
+        tmp_path.write_text(json.dumps(self.data, indent=1), encoding="utf-8")
+        os.replace(tmp_path, self.path)
+
+    @staticmethod
+    def stat_entry(path: Path, cached: Optional[dict]) -> dict:
+        st = path.stat()
+        if cached and cached.get("size") == st.st_size and cached.get("mtime_ns") == st.st_mtime_ns:
+            return cached
+        return {"size": st.st_size, "mtime_ns": st.st_mtime_ns, "sha256": file_hash(path)}
+
+    def case_hash(self, case_files: list[Path]) -> str:
+        cached = self.data["case"].get("files", {})
+        files = {}
+        for path in case_files:
+            files[str(path)] = self.stat_entry(path, cached.get(str(path)))
+        self.current_case = {"files": files,
+                             "sha256": text_hash("".join(files[str(p)]["sha256"] for p in case_files))}
+        return self.current_case["sha256"]
+
+    def stale_artifacts(self, out_dir: Path, case_hash: str, expected: dict[str, str]) -> set[str]:
+        # everything is stale if the case changed
+        if self.data["case"].get("sha256") != case_hash:
+            return set(expected)
+        stale = set()
+        for key, recipe in expected.items():
+            entry = self.data["artifacts"].get(key)
+            path = out_dir / key
+            if entry is None or entry["recipe"] != text_hash(recipe) or not path.exists():
+                stale.add(key)
+                continue
+            st = path.stat()
+            if st.st_size != entry["size"]:
+                stale.add(key)
+            elif st.st_mtime_ns != entry["mtime_ns"] and file_hash(path) != entry["sha256"]:
+                stale.add(key)
+        return stale
+
+    def begin(self, case_hash: str, expected: dict[str, str], keys: set[str]):
+        self.data["pending"] = {
+            "case": case_hash,
+            "started_ns": time.time_ns(),
+            "recipes": {key: text_hash(expected[key]) for key in keys},
+        }
+        self.save()
+
+    def adopt_pending(self, out_dir: Path, case_hash: str, expected: dict[str, str]) -> int:
+        '''
+            Records the completely written artifacts of an interrupted run, so
+            a resumed run only renders the remaining ones. Returns the number
+            of adopted artifacts.
+        '''
+        pending = self.data.get("pending")
+        if not pending:
+            return 0
+        adopted = 0
+        if pending["case"] == case_hash:
+            if self.data["case"].get("sha256") != case_hash:
+                self.data["artifacts"] = {}
+                self.data["case"] = self.current_case
+            for key, recipe_hash in pending["recipes"].items():
+                path = out_dir / key
+                if key not in expected or text_hash(expected[key]) != recipe_hash:
+                    continue
+                if not is_complete(path) or path.stat().st_mtime_ns < pending["started_ns"]:
+                    continue
+                entry = self.stat_entry(path, None)
+                entry["recipe"] = recipe_hash
+                self.data["artifacts"][key] = entry
+                adopted += 1
+        self.data["pending"] = None
+        self.save()
+        return adopted
+
+    def update(self, out_dir: Path, expected: dict[str, str], keys: set[str]):
+        '''
+            Records the artifacts in keys that are completely written now.
+            Artifacts of a changed case are dropped before.
+        '''
+        if self.data["case"].get("sha256") != self.current_case["sha256"]:
+            self.data["artifacts"] = {}
+        self.data["case"] = self.current_case
+        for key in keys:
+            path = out_dir / key
+            if not is_complete(path):
+                self.data["artifacts"].pop(key, None)
+                continue
+            entry = self.stat_entry(path, None)
+            entry["recipe"] = text_hash(expected[key])
+            self.data["artifacts"][key] = entry
+        self.data["pending"] = None
+        self.save()
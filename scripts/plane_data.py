@@ -0,0 +1,234 @@
+"""
+Field data on the sweep planes: Fluent's ASCII exports are converted to
+memory-mappable NumPy files and reduced to one row of metrics per plane.
+
+    processed/planes/side_data_03.txt   written by Fluent (/file/export/ascii)
+    processed/planes/side_data_03.npy   float32 record array, one field per column
+    processed/metrics/side_planes.csv   metrics of every side plane
+
+The exports are hundreds of MB per case, they are parsed in chunks straight
+into the .npy file and removed afterwards, a whole file is never in memory.
+
+run with: python -m scripts.plane_data <case>/processed   (metrics again from the .npy files)
+"""
+from __future__ import annotations
+import argparse
+import csv
+import os
+from concurrent.futures import ProcessPoolExecutor
+from pathlib import Path
+from typing import Optional
+
+from scripts.sweep_definition import PLANE_VIEWS, compile_plan, find_definition, load_definition
+
+# exported on every plane, coordinates are always written by Fluent
+FIELD_VARIABLES = ["total-pressure", "x-velocity", "y-velocity", "z-velocity", "helicity", "density"]
+CHUNK_BYTES = 16 * 1024 * 1024
+# |helicity| above this counts as vortex core (the contours go from -10000 to 10000)
+VORTEX_HELICITY = 1000.0
+DEFAULT_DENSITY = 1.225
+METRIC_COLUMNS = ["index", "n_points", "area", "mass_flow", "velocity_mfw", "total_pressure_mfw",
+                  "total_pressure_loss", "helicity_abs", "helicity_net", "vortex_area", "p0_ref"]
+
+
+def export_command(path: Path, surface: str) -> str:
+    # surfaces, node values, quantities, no more quantities
+    return f'/file/export/ascii "{path.as_posix()}" {surface} () yes {" ".join(FIELD_VARIABLES)} () no'
+
+
+def read_header(line: str) -> tuple[list[str], Optional[str]]:
+    # "nodenumber, x-coordinate, ..." comma separated, older versions use spaces
+    delimiter = "," if "," in line else None
+    return [name.strip() for name in line.split(delimiter) if name.strip()], delimiter
+
+
+def count_rows(path: Path) -> int:
+    # first pass, only counts lines with content, the file is read in binary lines
+    with open(path, "rb") as f:
+        f.readline()
+        return sum(1 for line in f if line.strip())
+
+
+def convert_export(txt_path: Path, npy_path: Optional[Path] = None, remove: bool = True) -> int:
+    '''
+        Streams a Fluent ASCII export into a float32 record array (.npy) with
+        one field per column, the point number column is dropped. Returns the
+        number of points. Runs in the worker processes.
+    '''
+    import numpy as np
+
+    txt_path = Path(txt_path)
+    npy_path = Path(npy_path) if npy_path is not None else txt_path.with_suffix(".npy")
+    with open(txt_path, encoding="utf-8") as f:
+        names, delimiter = read_header(f.readline())
+    if not names:
+        raise ValueError(f"{txt_path} has no header")
+    n_rows = count_rows(txt_path)
+    fields = names[1:] if names[0] in ("nodenumber", "cellnumber") else names
+    first = len(names) - len(fields)
+    dtype = np.dtype([(name, "<f4") for name in fields])
+
+    tmp_path = npy_path.with_name(npy_path.name + ".tmp")
+    array = np.lib.format.open_memmap(tmp_path, mode="w+", dtype=dtype, shape=(n_rows,))
+    # the records are float32 only, a 2D view takes the parsed chunks without copying field by field
+    table = array.view("<f4").reshape(n_rows, len(fields))
+    row = 0
+    with open(txt_path, encoding="utf-8") as f:
+        f.readline()
+        while True:
+            lines = f.readlines(CHUNK_BYTES)
+            if not lines:
+                break
+            chunk = np.loadtxt(lines, delimiter=delimiter, dtype=np.float32, ndmin=2,
+                               usecols=range(first, len(names)))
+            table[row:row + len(chunk)] = chunk
+            row += len(chunk)
+    array.flush()
+    del table, array
+    if row != n_rows:
+        tmp_path.unlink()
+        raise ValueError(f"{txt_path}: read {row} of {n_rows} rows")
+    os.replace(tmp_path, npy_path)
+    if remove:
+        txt_path.unlink()
+    return n_rows
+
+
+def convert_exports(txt_paths: list[Path], max_workers: Optional[int] = None) -> int:
+    # returns the number of converted files
+    if not txt_paths:
+        return 0
+    with ProcessPoolExecutor(max_workers=max_workers) as pool:
+        return len(list(pool.map(convert_export, txt_paths)))
+
+
+def point_areas(u, v, per_cell: float = 4.0):
+    '''
+        Area each point of a plane stands for. Fluent exports no face areas,
+        the plane is binned into a grid with about per_cell points per cell
+        and every cell's area is shared by its points. Cells without points
+        (inside the car) don't count.
+    '''
+    import numpy as np
+
+    n = len(u)
+    if n == 0:
+        return np.zeros(0)
+    u0, v0 = u.min(), v.min()
+    width, height = max(float(u.max() - u0), 1e-9), max(float(v.max() - v0), 1e-9)
+    cell = max((width * height * per_cell / n) ** 0.5, 1e-9)
+    nu, nv = int(width / cell) + 1, int(height / cell) + 1
+    iu = np.minimum(((u - u0) / cell).astype(np.int64), nu - 1)
+    iv = np.minimum(((v - v0) / cell).astype(np.int64), nv - 1)
+    flat = iu * nv + iv
+    counts = np.bincount(flat, minlength=nu * nv)
+    return cell * cell / counts[flat]
+
+
+def weighted_mean(values, weights) -> float:
+    total = float(weights.sum())
+    return float((values * weights).sum()) / total if total > 0 else float("nan")
+
+
+def plane_metrics(data, normal: str, p0_ref: float) -> dict:
+    '''
+        Metrics of one plane from its record array (memmap), all sums are
+        vectorized over the points.
+    '''
+    import numpy as np
+
+    axes = [axis for axis in "xyz" if axis != normal]
+    u = np.asarray(data[f"{axes[0]}-coordinate"], dtype=np.float64)
+    v = np.asarray(data[f"{axes[1]}-coordinate"], dtype=np.float64)
+    area = point_areas(u, v)
+    velocity = np.stack([np.asarray(data[f"{axis}-velocity"], dtype=np.float64) for axis in "xyz"])
+    names = data.dtype.names
+    density = np.asarray(data["density"], dtype=np.float64) if "density" in names else DEFAULT_DENSITY
+    total_pressure = np.asarray(data["total-pressure"], dtype=np.float64)
+    helicity = np.asarray(data["helicity"], dtype=np.float64)
+
+    mass_flux = density * velocity["xyz".index(normal)] * area
+    # weights of the mass flow averages, reverse flow (wake) counts as well
+    weights = np.abs(mass_flux)
+    return {
+        "n_points": len(area),
+        "area": float(area.sum()),
+        "mass_flow": float(mass_flux.sum()),
+        "velocity_mfw": weighted_mean(np.sqrt((velocity ** 2).sum(axis=0)), weights),
+        "total_pressure_mfw": weighted_mean(total_pressure, weights),
+        # integral of the total pressure deficit against the free stream [Pa m^2]
+        "total_pressure_loss": float((np.maximum(p0_ref - total_pressure, 0.0) * area).sum()),
+        "helicity_abs": float((np.abs(helicity) * area).sum()),
+        "helicity_net": float((helicity * area).sum()),
+        "vortex_area": float(area[np.abs(helicity) > VORTEX_HELICITY].sum()),
+        "p0_ref": p0_ref,
+    }
+
+
+def plane_files(planes_dir: Path, sweep: dict) -> dict[int, Path]:
+    # planned planes of a view that were exported, files of an older, longer sweep are left out
+    files = {}
+    for index in range(len(sweep["positions"])):
+        path = Path(planes_dir) / f"{sweep['export']}_{index:02d}.npy"
+        if path.exists():
+            files[index] = path
+    return files
+
+
+def free_stream_total_pressure(paths: list[Path]) -> float:
+    # the highest total pressure of the case (99th percentile, a few points are noise)
+    import numpy as np
+
+    p0 = [float(np.percentile(np.load(path, mmap_mode="r")["total-pressure"], 99)) for path in paths]
+    return max(p0) if p0 else 0.0
+
+
+def write_metrics(planes_dir: Path, metrics_dir: Path, plan: dict, p0_ref: Optional[float] = None) -> list[Path]:
+    '''
+        One CSV per view with the metrics of every exported plane of the sweep
+        plan (see sweep_definition.compile_plan), sorted by plane index. The
+        plane normal is the axis of the view.
+        Returns the written files.
+    '''
+    import numpy as np
+
+    files = {view: plane_files(planes_dir, plan[view]) for view in PLANE_VIEWS if view in plan}
+    if p0_ref is None:
+        p0_ref = free_stream_total_pressure([path for paths in files.values() for path in paths.values()])
+    written = []
+    for view, paths in files.items():
+        if not paths:
+            continue
+        columns = METRIC_COLUMNS[:1] + ["position"] + METRIC_COLUMNS[1:]
+        metrics_dir.mkdir(parents=True, exist_ok=True)
+        out_path = metrics_dir / f"{view}_planes.csv"
+        with open(out_path, "w", newline="", encoding="utf-8") as f:
+            writer = csv.DictWriter(f, fieldnames=columns)
+            writer.writeheader()
+            for index, path in paths.items():
+                row = {"index": index, "position": plan[view]["positions"][index],
+                       **plane_metrics(np.load(path, mmap_mode="r"), plan[view]["axis"], p0_ref)}
+                writer.writerow(row)
+        written.append(out_path)
+    return written
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Per-plane metrics from the exported field data.")
+    parser.add_argument("processed", type=Path, help="processed folder of a case")
+    parser.add_argument("--p0-ref", type=float, default=None, help="free stream total pressure [Pa]")
+    parser.add_argument("--sweep", type=Path, default=None, help="sweep definition, default the one of the case")
+    args = parser.parse_args()
+    planes_dir = args.processed / "planes"
+    leftover = sorted(planes_dir.glob("*_data_*.txt"))
+    if leftover:
+        print(f"Converting {convert_exports(leftover)} exports")
+    # the sweep of the case tells which planes there are and their normals
+    case_dir = args.processed.resolve().parent
+    plan = compile_plan(load_definition(find_definition(case_dir, args.sweep)), args.processed / "images")
+    for path in write_metrics(planes_dir, args.processed / "metrics", plan, p0_ref=args.p0_ref):
+        print(f"Metrics saved in: {path}")
+
+
+if __name__ == "__main__":
+    main()
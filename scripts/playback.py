@@ -0,0 +1,99 @@
+from __future__ import annotations
+import time
+from collections import deque
+from typing import Optional
+
+from PyQt6.QtCore import Qt, QObject, QTimer, pyqtSignal
+
+from scripts.image_cache import FrameLoader
+
+
+class PlaybackEngine(QObject):
+    '''
+        Playback clock for the image viewer. The position is the fraction
+        [0, 1) of the sweep, so series with different frame counts stay
+        synchronized. The position follows the wall clock, if showing a
+        frame takes too long the next tick jumps ahead (frames are dropped)
+        instead of the playback lagging behind.
+    '''
+    tick = pyqtSignal(float)
+    # measured fps, mean decode latency in ms, dropped frames
+    stats = pyqtSignal(float, float, int)
+
+    def __init__(self, n_frames: int = 1, target_fps: float = 15.0, speed: float = 1.0,
+                 loader: Optional[FrameLoader] = None):
+        super().__init__()
+        self.n_frames = max(n_frames, 1)
+        self.target_fps = target_fps
+        self.speed = speed
+        self.loader = loader
+        self.position = 0.0
+        self.playing = False
+        self.last_time = 0.0
+        self.last_frame = -1
+        self.dropped = 0
+        self.presented: deque[float] = deque(maxlen=240)
+
+        self.timer = QTimer()
+        self.timer.setTimerType(Qt.TimerType.PreciseTimer)
+        self.timer.timeout.connect(self.on_timer)
+        self.stats_timer = QTimer()
+        self.stats_timer.timeout.connect(self.emit_stats)
+
+    def set_fps(self, fps: float):
+        self.target_fps = max(fps, 1.0)
+        if self.playing:
+            self.timer.start(round(1000 / self.target_fps))
+
+    def set_speed(self, speed: float):
+        self.speed = speed
+
+    def set_frame_count(self, n_frames: int):
+        self.n_frames = max(n_frames, 1)
+
+    def seek(self, position: float):
+        self.position = position % 1.0
+        self.last_frame = int(self.position * self.n_frames)
+
+    def start(self):
+        self.playing = True
+        self.last_time = time.perf_counter()
+        self.last_frame = int(self.position * self.n_frames)
+        self.timer.start(round(1000 / self.target_fps))
+        self.stats_timer.start(500)
+
+    def stop(self):
+        self.playing = False
+        self.timer.stop()
+        self.stats_timer.stop()
+
+    def on_timer(self):
+        now = time.perf_counter()
+        dt = now - self.last_time
+        self.last_time = now
+        # target fps x speed frames per second of wall clock
+        self.position = (self.position + dt * self.target_fps * self.speed / self.n_frames) % 1.0
+        frame = int(self.position * self.n_frames)
+        if frame == self.last_frame:
+            return
+        skipped = (frame - self.last_frame) % self.n_frames - 1
+        if skipped > 0:
+            self.dropped += skipped
+        self.last_frame = frame
+        self.tick.emit(self.position)
+
+    def frame_presented(self, complete: bool = True):
+        # called by the viewer once the icons of a tick were swapped in
+        if complete:
+            self.presented.append(time.perf_counter())
+        else:
+            self.dropped += 1
+
+    def measured_fps(self) -> float:
+        now = time.perf_counter()
+        recent = [t for t in self.presented if now - t <= 1.0]
+        return float(len(recent))
+
+    def emit_stats(self):
+        latency = self.loader.mean_latency_ms() if self.loader is not None else 0.0
+        self.stats.emit(self.measured_fps(), latency, self.dropped)
@@ -0,0 +1,247 @@
+"""
+Structured progress of a Fluent journal run.
+
+The steps (case reading, force reports, pictures) are read from the journal
+itself, a step is complete when its file is written or Fluent echoes a later
+step. The ETA comes from the measured throughput, weighted with the step
+timings of earlier runs on meshes of the same size.
+"""
+from __future__ import annotations
+import json
+import math
+import os
+import threading
+import time
+from pathlib import Path
+from typing import Callable, NamedTuple, Optional
+
+from scripts.manifest import is_complete
+
+TIMINGS_PATH = Path.home() / ".post_processing" / "step_timings.json"
+
+# seconds per step if there is no history for the mesh yet
+DEFAULT_ESTIMATES = {
+    "case": 60.0,
+    "forces": 2.0,
+    "bottom": 10.0,
+    "side": 3.0,
+    "front": 3.0,
+}
+
+
+class JournalStep(NamedTuple):
+    stage: str      # case, forces, bottom, side, front
+    index: int      # plane index, -1 for steps without a plane
+    quantity: str   # e.g. vel, pressure, heli, df, drag, moment
+    artifact: Optional[Path]
+
+    @property
+    def key(self) -> str:
+        return f"{self.stage}/{self.quantity}"
+
+
+class ProgressEvent(NamedTuple):
+    stage: str
+    index: int
+    quantity: str
+    done: int           # completed steps
+    total: int
+    fraction: float     # weighted with the expected step durations
+    elapsed_s: float
+    eta_s: float
+
+
+def quoted(line: str) -> Optional[str]:
+    start = line.find('"')
+    end = line.rfind('"')
+    if start < 0 or end <= start:
+        return None
+    return line[start + 1:end]
+
+
+def picture_step(path: Path) -> JournalStep:
+    # side_vel_03.png -> side, 3, vel / bottom_iso.png -> bottom, -1, iso
+    name, _, number = path.stem.rpartition("_")
+    if name and number.isdigit():
+        index = int(number)
+    else:
+        name, index = path.stem, -1
+    stage, _, quantity = name.partition("_")
+    return JournalStep(stage, index, quantity or stage, path)
+
+
+def step_marker(line: str) -> Optional[tuple[str, JournalStep]]:
+    '''
+        Recognises the commands that make a step, in the journal as well as
+        echoed in the transcript. Returns the marker the transcript is matched
+        with and the step.
+    '''
+    if "save-picture" in line or "/export/ascii" in line:
+        # side_data_03.txt of the plane data export is a step like a picture
+        path = quoted(line)
+        if path:
+            return path, picture_step(Path(path))
+    elif "/report/forces/" in line:
+        report = line.split()[-1]
+        return report, JournalStep("forces", -1, Path(report).stem, None)
+    elif "read-case" in line:
+        return "read-case", JournalStep("case", -1, "read", None)
+    return None
+
+
+def parse_journal(jou_path: Path) -> tuple[list[JournalStep], dict[str, int]]:
+    # steps in the order Fluent runs them and marker -> step number
+    steps: list[JournalStep] = []
+    markers: dict[str, int] = {}
+    with open(jou_path, encoding="utf-8") as f:
+        for line in f:
+            line = line.strip()
+            if not line or line.startswith(";"):
+                continue
+            found = step_marker(line)
+            if found is not None:
+                markers[found[0]] = len(steps)
+                steps.append(found[1])
+    return steps, markers
+
+
+def mesh_bucket(case_files: list[Path], n_threads: int) -> str:
+    # runs on meshes of a similar size (factor 2) and thread count share their timings
+    size_mb = sum(path.stat().st_size for path in case_files if path.exists()) / 2**20
+    return f"mb{2 ** max(int(math.log2(max(size_mb, 1.0))), 0)}-t{n_threads}"
+
+
+class StepTimings():
+    '''
+        Mean duration per step type (stage/quantity) and mesh bucket,
+        persisted as JSON and shared by all runs on this machine.
+    '''
+    lock = threading.Lock()
+
+    def __init__(self, path: Path = TIMINGS_PATH):
+        self.path = Path(path)
+
+    def load(self) -> dict:
+        try:
+            return json.loads(self.path.read_text(encoding="utf-8"))
+        except (OSError, json.JSONDecodeError):
+            return {}
+
+    def estimates(self, bucket: str) -> dict[str, float]:
+        return {key: entry[0] for key, entry in self.load().get(bucket, {}).items()}
+
+    def record(self, bucket: str, durations: dict[str, list[float]]):
+        if not durations:
+            return
+        with self.lock:
+            data = self.load()
+            entries = data.setdefault(bucket, {})
+            for key, values in durations.items():
+                mean = sum(values) / len(values)
+                old = entries.get(key)
+                if old is None:
+                    entries[key] = [mean, len(values)]
+                else:
+                    # moving average, the machine or Fluent version may change
+                    entries[key] = [0.7 * old[0] + 0.3 * mean, old[1] + len(values)]
+            self.path.parent.mkdir(parents=True, exist_ok=True)
+            tmp_path = self.path.with_suffix(".tmp")
+            tmp_path.write_text(json.dumps(data, indent=1), encoding="utf-8")
+            os.replace(tmp_path, self.path)
+
+
+class ProgressTracker():
+    '''
+        Feed it the transcript lines of one Fluent process. Emits a
+        ProgressEvent for every completed step.
+    '''
+    def __init__(self, jou_path: Path,
+                 estimates: Optional[dict[str, float]] = None,
+                 on_event: Optional[Callable[[ProgressEvent], None]] = None,
+                 file_check_s: float = 0.5):
+        self.steps, self.markers = parse_journal(jou_path)
+        estimates = estimates or {}
+        self.weights = [estimates.get(step.key, DEFAULT_ESTIMATES.get(step.stage, 3.0)) for step in self.steps]
+        self.total_weight = sum(self.weights) or 1.0
+        self.on_event = on_event
+        self.file_check_s = file_check_s
+        self.done = 0
+        self.done_weight = 0.0
+        self.start_time = time.perf_counter()
+        self.last_completion = self.start_time
+        self.last_file_check = self.start_time
+        # measured durations per step type, only steps completed on their own
+        self.durations: dict[str, list[float]] = {}
+        # (step, start, end) of these steps, for the pipeline trace
+        self.spans: list[tuple[JournalStep, float, float]] = []
+
+    def reset_clock(self):
+        # the process only starts now (e.g. after waiting in a batch queue)
+        self.start_time = self.last_completion = self.last_file_check = time.perf_counter()
+
+    @property
+    def total(self) -> int:
+        return len(self.steps)
+
+    @property
+    def fraction(self) -> float:
+        if not self.steps:
+            return 1.0
+        return self.done_weight / self.total_weight
+
+    def elapsed_s(self) -> float:
+        return time.perf_counter() - self.start_time
+
+    def eta_s(self) -> float:
+        remaining = self.total_weight - self.done_weight
+        if self.done_weight <= 0:
+            return remaining
+        # observed speed relative to the estimates
+        return remaining * self.elapsed_s() / self.done_weight
+
+    def feed_line(self, line: str):
+        if "save-picture" in line or "/report/forces/" in line:
+            found = step_marker(line)
+            if found is not None and found[0] in self.markers:
+                # Fluent works sequentially, echoing a step means every earlier one is done
+                self.complete_until(self.markers[found[0]])
+        now = time.perf_counter()
+        if now - self.last_file_check > self.file_check_s:
+            self.last_file_check = now
+            self.check_files()
+
+    def check_files(self):
+        # pictures are complete as soon as the PNG is fully written
+        while self.done < self.total:
+            artifact = self.steps[self.done].artifact
+            if artifact is None or not is_complete(artifact):
+                break
+            self.complete_until(self.done + 1)
+
+    def complete_until(self, end: int):
+        if end <= self.done:
+            return
+        now = time.perf_counter()
+        if end - self.done == 1:
+            step = self.steps[self.done]
+            self.durations.setdefault(step.key, []).append(now - self.last_completion)
+            self.spans.append((step, self.last_completion, now))
+        self.last_completion = now
+        for k in range(self.done, end):
+            self.done += 1
+            self.done_weight += self.weights[k]
+            if self.on_event is not None:
+                step = self.steps[k]
+                self.on_event(ProgressEvent(step.stage, step.index, step.quantity, self.done, self.total,
+                                            self.fraction, self.elapsed_s(), self.eta_s()))
+
+    def finish(self):
+        # the process exited successfully, so the last steps are done as well
+        self.complete_until(self.total)
+
+
+def format_eta(seconds: float) -> str:
+    seconds = int(round(seconds))
+    if seconds >= 3600:
+        return f"{seconds // 3600}h{seconds % 3600 // 60:02d}m"
+    return f"{seconds // 60}m{seconds % 60:02d}s"
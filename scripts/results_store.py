@@ -0,0 +1,201 @@
+"""
+SQLite database with the forces of all processed cases, so design iterations
+can be compared without opening one workbook per case.
+
+backfill existing cases with: python -m scripts.results_store <project folder> ...
+"""
+from __future__ import annotations
+import argparse
+import json
+import os
+import sqlite3
+import threading
+import time
+from concurrent.futures import ProcessPoolExecutor
+from pathlib import Path
+from typing import Optional
+
+from scripts.force_reports import ForceReport, parse_force_report
+
+DEFAULT_DB_PATH = Path.home() / ".post_processing" / "results.sqlite"
+REPORTS = ("df", "drag", "moment")
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS runs (
+    run_id       INTEGER PRIMARY KEY,
+    case_path    TEXT NOT NULL,
+    case_hash    TEXT,
+    processed_at REAL NOT NULL,
+    inserted_at  REAL NOT NULL,
+    metadata     TEXT,
+    UNIQUE (case_path, processed_at)
+);
+CREATE TABLE IF NOT EXISTS forces (
+    run_id   INTEGER NOT NULL REFERENCES runs(run_id) ON DELETE CASCADE,
+    report   TEXT NOT NULL,
+    zone     TEXT NOT NULL,
+    pressure REAL,
+    viscous  REAL,
+    total    REAL
+);
+CREATE INDEX IF NOT EXISTS idx_runs_case ON runs(case_path);
+CREATE INDEX IF NOT EXISTS idx_runs_hash ON runs(case_hash);
+CREATE INDEX IF NOT EXISTS idx_runs_date ON runs(processed_at);
+CREATE INDEX IF NOT EXISTS idx_forces_run ON forces(run_id);
+CREATE INDEX IF NOT EXISTS idx_forces_zone ON forces(zone, report);
+"""
+
+
+def case_hash_from_manifest(out_dir: Path) -> Optional[str]:
+    manifest_path = Path(out_dir) / "manifest.json"
+    try:
+        return json.loads(manifest_path.read_text(encoding="utf-8"))["case"].get("sha256")
+    except (OSError, KeyError, json.JSONDecodeError):
+        return None
+
+
+def read_forces_folder(forces_dir: Path) -> Optional[dict]:
+    # runs in the backfill worker processes
+    forces_dir = Path(forces_dir)
+    try:
+        reports = {name: parse_force_report(forces_dir / f"{name}.csv") for name in REPORTS}
+    except (OSError, ValueError) as e:
+        print(f"Skipping {forces_dir}: {e}")
+        return None
+    out_dir = forces_dir.parent
+    return {
+        "case_path": str(out_dir.parent),
+        "case_hash": case_hash_from_manifest(out_dir),
+        "processed_at": max((forces_dir / f"{name}.csv").stat().st_mtime for name in REPORTS),
+        "reports": reports,
+    }
+
+
+class ResultsStore():
+    def __init__(self, db_path: Path = DEFAULT_DB_PATH):
+        self.db_path = Path(db_path)
+        self.db_path.parent.mkdir(parents=True, exist_ok=True)
+        # several jobs of the queue may finish at the same time
+        self.lock = threading.Lock()
+        self.conn = sqlite3.connect(self.db_path, check_same_thread=False, timeout=30)
+        self.conn.execute("PRAGMA journal_mode=WAL")
+        self.conn.execute("PRAGMA foreign_keys=ON")
+        self.conn.executescript(SCHEMA)
+
+    def close(self):
+        self.conn.close()
+
+    def insert_run(self, case_path: Path, reports: dict[str, ForceReport],
+                   case_hash: Optional[str] = None,
+                   processed_at: Optional[float] = None,
+                   metadata: Optional[dict] = None) -> Optional[int]:
+        '''
+            Stores one run with every zone (and the Net row) of its reports.
+            Returns the run id, None if this run is already stored.
+        '''
+        processed_at = processed_at if processed_at is not None else time.time()
+        with self.lock, self.conn:
+            cur = self.conn.execute(
+                "INSERT OR IGNORE INTO runs (case_path, case_hash, processed_at, inserted_at, metadata) "
+                "VALUES (?, ?, ?, ?, ?)",
+                (str(case_path), case_hash, processed_at, time.time(), json.dumps(metadata or {})),
+            )
+            if cur.rowcount == 0:
+                return None
+            run_id = cur.lastrowid
+            rows = []
+            for name, report in reports.items():
+                for zone, components in report.zones.items():
+                    rows.append((run_id, name, zone, *components))
+                if report.net is not None:
+                    rows.append((run_id, name, "net", *report.net))
+            self.conn.executemany(
+                "INSERT INTO forces (run_id, report, zone, pressure, viscous, total) VALUES (?, ?, ?, ?, ?, ?)",
+                rows,
+            )
+        return run_id
+
+    def query(self, sql: str, params: tuple = ()) -> list[sqlite3.Row]:
+        with self.lock:
+            self.conn.row_factory = sqlite3.Row
+            try:
+                return self.conn.execute(sql, params).fetchall()
+            finally:
+                self.conn.row_factory = None
+
+    def runs(self, case_path: Optional[str] = None, since: Optional[float] = None,
+             until: Optional[float] = None) -> list[sqlite3.Row]:
+        sql = "SELECT * FROM runs WHERE 1=1"
+        params: list = []
+        if case_path is not None:
+            sql += " AND case_path = ?"
+            params.append(case_path)
+        if since is not None:
+            sql += " AND processed_at >= ?"
+            params.append(since)
+        if until is not None:
+            sql += " AND processed_at < ?"
+            params.append(until)
+        return self.query(sql + " ORDER BY processed_at", tuple(params))
+
+    def component_history(self, zone: str, report: str = "drag") -> list[sqlite3.Row]:
+        # one value per run, e.g. drag of the rear-wing over all design iterations
+        return self.query(
+            "SELECT runs.case_path, runs.case_hash, runs.processed_at, forces.pressure, forces.viscous, forces.total "
+            "FROM forces JOIN runs ON runs.run_id = forces.run_id "
+            "WHERE forces.zone = ? AND forces.report = ? ORDER BY runs.processed_at",
+            (zone, report),
+        )
+
+    def to_dataframe(self):
+        import pandas as pd
+        with self.lock:
+            return pd.read_sql_query(
+                "SELECT runs.run_id, runs.case_path, runs.case_hash, runs.processed_at, runs.inserted_at, "
+                "forces.report, forces.zone, forces.pressure, forces.viscous, forces.total "
+                "FROM forces JOIN runs ON runs.run_id = forces.run_id",
+                self.conn,
+            )
+
+    def export_parquet(self, path: Path) -> Path:
+        # needs pyarrow or fastparquet, which are not part of data/requirements.txt
+        self.to_dataframe().to_parquet(path, index=False)
+        return Path(path)
+
+    def backfill(self, roots: list[Path], max_workers: Optional[int] = None) -> int:
+        '''
+            Scans the roots for processed/forces folders, parses the reports in
+            parallel and stores the runs that are not in the database yet.
+        '''
+        folders = []
+        for root in roots:
+            for dirpath, dirnames, _ in os.walk(root):
+                if Path(dirpath).name == "processed" and "forces" in dirnames:
+                    folders.append(Path(dirpath) / "forces")
+                    dirnames[:] = []
+        print(f"Found {len(folders)} forces folders")
+        inserted = 0
+        with ProcessPoolExecutor(max_workers=max_workers) as pool:
+            for result in pool.map(read_forces_folder, folders, chunksize=8):
+                if result is None:
+                    continue
+                run_id = self.insert_run(result["case_path"], result["reports"], result["case_hash"],
+                                         result["processed_at"], {"source": "backfill"})
+                if run_id is not None:
+                    inserted += 1
+        return inserted
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Import existing processed/forces folders into the results database.")
+    parser.add_argument("roots", type=Path, nargs="+")
+    parser.add_argument("--db", type=Path, default=DEFAULT_DB_PATH)
+    parser.add_argument("--workers", type=int, default=None)
+    args = parser.parse_args()
+    store = ResultsStore(args.db)
+    print(f"Inserted {store.backfill(args.roots, args.workers)} runs into {args.db}")
+    store.close()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,151 @@
+from __future__ import annotations
+import os
+import signal
+import subprocess
+import threading
+import time
+from collections import deque
+from pathlib import Path
+from typing import Callable, Optional
+
+
+class ProcessCancelled(RuntimeError):
+    pass
+
+
+def popen_group_kwargs() -> dict:
+    # own process group, so the solver processes Fluent spawns are stopped with it
+    if os.name == "nt":
+        return {"creationflags": subprocess.CREATE_NEW_PROCESS_GROUP}
+    return {"start_new_session": True}
+
+
+def stop_process_tree(proc: subprocess.Popen, grace_s: float = 10.0):
+    # terminate the whole process tree, kill it if it doesn't exit in time
+    if proc.poll() is not None:
+        return
+    try:
+        if os.name == "nt":
+            subprocess.run(["taskkill", "/T", "/PID", str(proc.pid)], capture_output=True)
+        else:
+            os.killpg(proc.pid, signal.SIGTERM)
+        proc.wait(grace_s)
+    except (subprocess.TimeoutExpired, ProcessLookupError, PermissionError):
+        pass
+    if proc.poll() is None:
+        if os.name == "nt":
+            subprocess.run(["taskkill", "/F", "/T", "/PID", str(proc.pid)], capture_output=True)
+        else:
+            try:
+                os.killpg(proc.pid, signal.SIGKILL)
+            except ProcessLookupError:
+                pass
+        proc.wait()
+
+
+class ProcessSupervisor():
+    '''
+        Runs a process and watches it from the outside:
+            - stdout is read on its own thread, the transcript is kept in a
+              bounded ring buffer and written to log_path
+            - the wall-clock (timeout_s) and no-output (idle_timeout_s)
+              watchdogs fire even if the process never prints again
+            - setting cancel_event stops the process and its children
+    '''
+    def __init__(self, cmd: list[str], cwd: Path,
+                 log_path: Optional[Path] = None,
+                 timeout_s: Optional[float] = None,
+                 idle_timeout_s: Optional[float] = None,
+                 on_line: Optional[Callable[[str], None]] = None,
+                 cancel_event: Optional[threading.Event] = None,
+                 buffer_lines: int = 2000,
+                 poll_s: float = 0.2):
+        self.cmd = cmd
+        self.cwd = cwd
+        self.log_path = log_path
+        self.timeout_s = timeout_s
+        self.idle_timeout_s = idle_timeout_s
+        self.on_line = on_line
+        self.cancel_event = cancel_event if cancel_event is not None else threading.Event()
+        self.transcript: deque[str] = deque(maxlen=buffer_lines)
+        self.poll_s = poll_s
+        self.proc: Optional[subprocess.Popen] = None
+        self.eof = threading.Event()
+        self.last_output = 0.0
+        self.n_lines = 0
+        self.callback_errors = 0
+
+    def run(self) -> int:
+        '''
+            Blocks until the process exits and returns its exit code.
+            Raises TimeoutError if a watchdog fired and ProcessCancelled if
+            the run was cancelled.
+        '''
+        self.proc = subprocess.Popen(
+            self.cmd,
+            cwd=str(self.cwd),
+            stdin=subprocess.DEVNULL,
+            stdout=subprocess.PIPE,
+            stderr=subprocess.STDOUT,
+            text=True,
+            bufsize=1,
+            errors="replace",
+            **popen_group_kwargs(),
+            )
+        start = time.monotonic()
+        self.last_output = start
+        reader = threading.Thread(target=self.read_output, daemon=True)
+        reader.start()
+        try:
+            while not self.eof.wait(self.poll_s):
+                now = time.monotonic()
+                if self.cancel_event.is_set():
+                    self.stop()
+                    raise ProcessCancelled("Process was cancelled.")
+                if self.timeout_s is not None and now - start > self.timeout_s:
+                    self.stop()
+                    raise TimeoutError(f"Process was longer than {self.timeout_s}s.")
+                if self.idle_timeout_s is not None and now - self.last_output > self.idle_timeout_s:
+                    self.stop()
+                    raise TimeoutError(f"Process printed nothing for {self.idle_timeout_s}s.")
+                # children that inherited stdout can keep the pipe open after the process exited
+                if self.proc.poll() is not None and now - self.last_output > 5.0:
+                    break
+        finally:
+            if self.proc.poll() is not None:
+                reader.join(timeout=5.0)
+        return self.proc.wait()
+
+    def read_output(self):
+        assert self.proc is not None and self.proc.stdout is not None
+        log = open(self.log_path, "w", encoding="utf-8") if self.log_path is not None else None
+        try:
+            for line in self.proc.stdout:
+                self.last_output = time.monotonic()
+                self.n_lines += 1
+                self.transcript.append(line)
+                if log is not None:
+                    log.write(line)
+                if self.on_line is not None:
+                    try:
+                        self.on_line(line)
+                    except Exception as e:
+                        # the pipe has to be drained, otherwise Fluent blocks on a full pipe
+                        self.callback_errors += 1
+                        if self.callback_errors == 1:
+                            print(f"Error in the transcript callback, reading on: {type(e).__name__}: {e}")
+        finally:
+            if log is not None:
+                log.close()
+            try:
+                self.proc.stdout.close()
+            except Exception:
+                pass
+            self.eof.set()
+
+    def stop(self, grace_s: float = 10.0):
+        if self.proc is not None:
+            stop_process_tree(self.proc, grace_s)
+
+    def tail(self, n: int = 50) -> str:
+        return "".join(list(self.transcript)[-n:])
@@ -0,0 +1,243 @@
+"""
+Sweep definitions: which planes, contours, ranges and cameras Fluent renders,
+read from a TOML (or YAML, needs PyYAML) file instead of being written in the
+code. data/sweeps/default.toml is the sweep of the car, a sweep.toml next to a
+case replaces it for that case.
+
+check a definition with: python -m scripts.sweep_definition <sweep.toml>
+
+The definition is compiled to the plan of FluentPostProcesser.sweep_plan.
+Renders are grouped by view, so every plane is created once and all pictures
+of the view are saved on it, and optimize_journal drops settings that don't
+change anything (same camera position, same contour options twice).
+"""
+from __future__ import annotations
+import argparse
+from pathlib import Path
+from typing import Optional
+
+DEFAULT_SWEEP_PATH = Path(__file__).resolve().parent.parent / "data" / "sweeps" / "default.toml"
+# a sweep file in the case folder is used instead of the default
+CASE_SWEEP_NAMES = ("sweep.toml", "sweep.yaml", "sweep.yml")
+# the viewer, the image stacks and the plane metrics know these views
+PLANE_VIEWS = ("side", "front")
+
+
+def linspace(start: float, end: float, num: int) -> list[float]:
+    # same values as numpy.linspace, numpy isn't needed to write a journal
+    if num == 1:
+        return [start]
+    step = (end - start) / (num - 1)
+    return [i * step + start for i in range(num - 1)] + [end]
+
+
+def number(value: float) -> str:
+    # 35 -> "35", 0.5 -> "0.5", like the literals in the journal
+    value = float(value)
+    return str(int(value)) if value.is_integer() else repr(value)
+
+
+def load_definition(path: Path) -> dict:
+    path = Path(path)
+    if path.suffix in (".yaml", ".yml"):
+        try:
+            import yaml
+        except ImportError:
+            raise ImportError(f"PyYAML is needed for {path.name}, install it or use a .toml sweep")
+        with open(path, encoding="utf-8") as f:
+            definition = yaml.safe_load(f) or {}
+    else:
+        try:
+            import tomllib
+        except ImportError:
+            # Python < 3.11
+            import tomli as tomllib
+        with open(path, "rb") as f:
+            definition = tomllib.load(f)
+    validate(definition, path)
+    return definition
+
+
+def find_definition(case_dir: Path, path: Optional[Path] = None) -> Path:
+    # given file, else a sweep file of the case, else the default sweep
+    if path is not None:
+        return Path(path)
+    for name in CASE_SWEEP_NAMES:
+        if (case_dir / name).exists():
+            return case_dir / name
+    return DEFAULT_SWEEP_PATH
+
+
+def validate(definition: dict, path: Path):
+    def fail(message: str):
+        raise ValueError(f"{path}: {message}")
+
+    if not definition.get("forces", {}).get("commands"):
+        fail("[forces] needs the 'commands' that write df.csv, drag.csv and moment.csv")
+    for view in PLANE_VIEWS:
+        spec = definition.get(view)
+        if spec is None:
+            continue
+        for key in ("surface", "axis", "positions"):
+            if key not in spec:
+                fail(f"[{view}] needs '{key}'")
+        positions = spec["positions"]
+        if isinstance(positions, dict):
+            if set(positions) != {"start", "end", "count"} or int(positions["count"]) < 1:
+                fail(f"[{view}] positions must be a list or {{start, end, count}} with count >= 1")
+        elif not isinstance(positions, list) or not positions:
+            fail(f"[{view}] positions must be a list or {{start, end, count}}")
+    names = set()
+    for k, render in enumerate(definition.get("renders", [])):
+        for key in ("view", "name", "field", "range"):
+            if key not in render:
+                fail(f"render {k + 1} needs '{key}'")
+        if render["view"] not in PLANE_VIEWS:
+            fail(f"render {render['name']}: unknown view {render['view']!r}, use one of {', '.join(PLANE_VIEWS)}")
+        if render["view"] not in definition:
+            fail(f"render {render['name']}: there is no [{render['view']}] section")
+        if len(render["range"]) != 2:
+            fail(f"render {render['name']}: range needs a minimum and a maximum")
+        if render["name"] in names:
+            fail(f"render {render['name']} is defined twice, the pictures would overwrite each other")
+        names.add(render["name"])
+    bottom = definition.get("bottom")
+    if bottom is not None:
+        for key in ("picture", "iso", "contour"):
+            if key not in bottom:
+                fail(f"[bottom] needs '{key}'")
+
+
+def camera_lines(camera: dict) -> list[str]:
+    lines = []
+    if camera.get("auto_scale"):
+        lines.append("/views/auto-scale")
+    for key, command in (("target", "target"), ("position", "position"), ("up", "up-vector")):
+        if key in camera:
+            lines.append(f"/views/camera/{command} {' '.join(number(v) for v in camera[key])}")
+    if "zoom" in camera:
+        lines.append(f"/views/camera/zoom-camera {number(camera['zoom'])}")
+    return lines
+
+
+def contour(field: str, value_range: list[float]) -> str:
+    return f"{field} {number(value_range[0])} {number(value_range[1])}"
+
+
+def positions(spec) -> list[float]:
+    if isinstance(spec, dict):
+        return [float(p) for p in linspace(float(spec["start"]), float(spec["end"]), int(spec["count"]))]
+    return [float(p) for p in spec]
+
+
+def compile_plan(definition: dict, images_dir: Path) -> dict:
+    '''
+        Plan in the layout of FluentPostProcesser.sweep_plan, views without
+        a section are left out.
+    '''
+    plan = {"forces": list(definition.get("forces", {}).get("commands", []))}
+    bottom = definition.get("bottom")
+    if bottom is not None:
+        iso = bottom["iso"]
+        plan["bottom"] = {
+            "setup": [
+                f"/display/surface/iso-surface {iso['field']} {iso['name']} () () {number(iso['value'])} ()",
+                f"/display/set/contours surfaces {iso['name']} ()",
+                f"/display/contour/{contour(bottom['contour']['field'], bottom['contour']['range'])}",
+            ] + list(bottom.get("display", [])) + camera_lines(bottom.get("camera", {})),
+            "path": images_dir / bottom["picture"],
+        }
+    for view in PLANE_VIEWS:
+        spec = definition.get(view)
+        if spec is None:
+            continue
+        # all renders of the view share its camera and planes, so they are saved on the same plane
+        renders = [(contour(render["field"], render["range"]), images_dir / render["name"], render["name"])
+                   for render in definition.get("renders", []) if render["view"] == view]
+        plan[view] = {
+            "setup": list(spec.get("display", [])) + camera_lines(spec.get("camera", {})),
+            "surface": spec["surface"],
+            "axis": spec["axis"],
+            "positions": positions(spec["positions"]),
+            "export": spec.get("export", f"{view}_data"),
+            "renders": renders,
+        }
+    return plan
+
+
+def setting_key(command: str) -> Optional[str]:
+    '''
+        Commands that only set a value: the setting they change, None for
+        every other command. A setting sent again with the same value does
+        nothing.
+    '''
+    parts = command.split()
+    if not parts:
+        return None
+    path = parts[0].lstrip("/")
+    if path == "display/set/contours" and len(parts) > 1:
+        return f"{path} {parts[1]}"
+    # apply-mirror-planes isn't one of them, the front sweep applies it again on purpose
+    if path in ("views/camera/target", "views/camera/position", "views/camera/up-vector",
+                "views/camera/projection", "display/set-window", "file/set-batch-options"):
+        return path
+    return None
+
+
+def optimize_journal(lines: list[str]) -> list[str]:
+    '''
+        Drops commands that set a value the setting already has. Commands
+        that move the camera relatively (auto-scale, zoom) forget the
+        camera, surface commands forget the contour surfaces.
+    '''
+    state: dict[str, str] = {}
+    optimized = []
+    for line in lines:
+        command = line.strip()
+        if not command or command.startswith(";"):
+            optimized.append(line)
+            continue
+        key = setting_key(command)
+        if key is not None:
+            value = " ".join(command.split()[1:])
+            if state.get(key) == value:
+                continue
+            state[key] = value
+        else:
+            path = command.split()[0].lstrip("/")
+            if path.startswith("views/"):
+                for name in ("views/camera/target", "views/camera/position", "views/camera/up-vector"):
+                    state.pop(name, None)
+            elif path.startswith(("surface/", "display/surface/")):
+                state.pop("display/set/contours surfaces", None)
+        optimized.append(line)
+    return optimized
+
+
+def count_renders(plan: dict, with_forces: bool = True) -> dict[str, int]:
+    # Fluent commands that write a file, per view
+    counts = {}
+    if with_forces:
+        counts["forces"] = len(plan.get("forces", []))
+        if "bottom" in plan:
+            counts["bottom"] = 1
+    for view in PLANE_VIEWS:
+        if view in plan:
+            counts[view] = len(plan[view]["positions"]) * len(plan[view]["renders"])
+    return counts
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Check a sweep definition and count its renders.")
+    parser.add_argument("definition", type=Path, nargs="?", default=DEFAULT_SWEEP_PATH)
+    args = parser.parse_args()
+    plan = compile_plan(load_definition(args.definition), Path("processed") / "images")
+    counts = count_renders(plan)
+    for view, count in counts.items():
+        planes = f" ({len(plan[view]['positions'])} planes x {len(plan[view]['renders'])})" if view in PLANE_VIEWS else ""
+        print(f"{view:>7}: {count} renders{planes}")
+    print(f"{'total':>7}: {sum(counts.values())} renders")
+
+
+if __name__ == "__main__":
+    main()
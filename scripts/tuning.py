@@ -0,0 +1,134 @@
+"""
+Picks the Fluent thread count (-t) and the number of cases run at the same
+time from the run history of this machine.
+
+Every successful Fluent run records how long a full sweep takes on its mesh
+size with its thread count. From these the run time for other thread counts
+is fitted (T = a + b/t, a is what doesn't get faster with more threads), the
+plan with the shortest total time for the queued cases wins. Without history
+the thread count follows the mesh size.
+"""
+from __future__ import annotations
+import json
+import math
+import os
+import platform
+import statistics
+import threading
+import time
+from pathlib import Path
+from typing import Optional
+
+HISTORY_PATH = Path.home() / ".post_processing" / "run_history.json"
+THREAD_CHOICES = (1, 2, 4, 8, 16, 32, 64, 128)
+# below this Fluent spends more time on partition boundaries than on cells
+MIN_CELLS_PER_THREAD = 50_000
+# rough cells per MB of a .cas.h5, if the catalog has no cell count
+CELLS_PER_MB = 2_500
+# share of a run that doesn't scale (reading, rendering) while only one thread count is known
+DEFAULT_SERIAL = 0.35
+# plans within 5 % count as equal, the one with fewer cores wins
+TOLERANCE = 0.05
+MAX_RECORDS = 1000
+
+
+def estimate_cells(cell_count: Optional[int], size_mb: float) -> int:
+    return cell_count if cell_count else int(size_mb * CELLS_PER_MB)
+
+
+def mesh_class(cells: int) -> str:
+    # meshes within a factor of 2 share their history
+    return f"c{2 ** max(int(math.log2(max(cells, 1))), 0)}"
+
+
+def fit_runtime(samples: dict[int, float]) -> tuple[float, float]:
+    '''
+        Least squares fit of T(t) = a + b / t to measured run times
+        (thread count -> seconds), a and b >= 0.
+    '''
+    if len(samples) == 1:
+        (t0, T0), = samples.items()
+        return DEFAULT_SERIAL * T0, (1 - DEFAULT_SERIAL) * T0 * t0
+    xs = [1.0 / t for t in samples]
+    ys = list(samples.values())
+    mean_x, mean_y = statistics.fmean(xs), statistics.fmean(ys)
+    var_x = sum((x - mean_x) ** 2 for x in xs)
+    b = sum((x - mean_x) * (y - mean_y) for x, y in zip(xs, ys)) / var_x if var_x else 0.0
+    b = max(b, 0.0)
+    a = max(mean_y - b * mean_x, 0.0)
+    return a, b
+
+
+class RunHistory():
+    '''
+        Run times of full sweeps per host, mesh class and thread count,
+        persisted as JSON like the step timings.
+    '''
+    lock = threading.Lock()
+
+    def __init__(self, path: Path = HISTORY_PATH):
+        self.path = Path(path)
+
+    def load(self) -> list[dict]:
+        try:
+            return json.loads(self.path.read_text(encoding="utf-8"))
+        except (OSError, json.JSONDecodeError):
+            return []
+
+    def record(self, cells: int, threads: int, run_s: float, **extra):
+        with self.lock:
+            records = self.load()
+            records.append({"host": platform.node(), "cpu_count": os.cpu_count(), "mesh": mesh_class(cells),
+                            "cells": cells, "threads": threads, "run_s": run_s, "time": time.time(), **extra})
+            self.path.parent.mkdir(parents=True, exist_ok=True)
+            tmp_path = self.path.with_suffix(".tmp")
+            tmp_path.write_text(json.dumps(records[-MAX_RECORDS:], indent=1), encoding="utf-8")
+            os.replace(tmp_path, self.path)
+
+    def samples(self, cells: int) -> dict[int, float]:
+        # median run time per thread count, this host first, other hosts if it has no runs yet
+        records = [r for r in self.load() if r["mesh"] == mesh_class(cells)]
+        own = [r for r in records if r["host"] == platform.node()]
+        by_threads: dict[int, list[float]] = {}
+        for r in own or records:
+            by_threads.setdefault(r["threads"], []).append(r["run_s"])
+        return {threads: statistics.median(values) for threads, values in by_threads.items()}
+
+
+class Tuner():
+    def __init__(self, history: Optional[RunHistory] = None, cores: Optional[int] = None, licences: int = 4):
+        self.history = history if history is not None else RunHistory()
+        self.cores = cores or os.cpu_count() or 8
+        # every Fluent process holds one solver licence
+        self.licences = licences
+
+    def candidates(self, cells: int, samples: dict[int, float], max_threads: int) -> list[int]:
+        # thread counts that leave every thread enough cells, plus every count that was measured
+        useful = max(cells // MIN_CELLS_PER_THREAD, 1)
+        choices = {t for t in THREAD_CHOICES if t <= max(useful, 1)} | set(samples)
+        return sorted(t for t in choices if t <= max_threads) or [1]
+
+    def predict(self, cells: int, threads: int, samples: Optional[dict[int, float]] = None) -> float:
+        # seconds for a full sweep, relative (1 = one thread, all parallel) without history
+        samples = self.history.samples(cells) if samples is None else samples
+        if not samples:
+            return DEFAULT_SERIAL + (1 - DEFAULT_SERIAL) / threads
+        a, b = fit_runtime(samples)
+        return a + b / threads
+
+    def plan(self, cells: int, n_cases: int = 1, max_threads: Optional[int] = None) -> tuple[int, int]:
+        '''
+            (threads per Fluent process, cases at the same time) with the
+            shortest total time for n_cases cases of this mesh size.
+        '''
+        max_threads = min(max_threads or self.cores, self.cores)
+        samples = self.history.samples(cells)
+        plans = []
+        for threads in self.candidates(cells, samples, max_threads):
+            concurrent = max(min(n_cases, self.cores // threads, self.licences), 1)
+            makespan = math.ceil(n_cases / concurrent) * self.predict(cells, threads, samples)
+            plans.append((makespan, threads * concurrent, threads, concurrent))
+        fastest = min(plan[0] for plan in plans)
+        # nearly as fast with fewer cores leaves them to other users of the machine
+        _, threads, concurrent = min(plan[1:] for plan in plans if plan[0] <= fastest * (1 + TOLERANCE))
+        return threads, concurrent
@@ -0,0 +1,41 @@
+import os
+import sys
+import tempfile
+from pathlib import Path
+
+import pytest
+
+ROOT = Path(__file__).resolve().parent.parent
+sys.path.insert(0, str(ROOT))
+# the runs keep their history and timings in ~/.post_processing, not in the real one
+HOME = tempfile.mkdtemp(prefix="post_processing_home_")
+os.environ["HOME"] = HOME
+os.environ["USERPROFILE"] = HOME
+
+FAKE_FLUENT = ROOT / "scripts" / "fake_fluent.py"
+
+
+@pytest.fixture
+def case_path(tmp_path: Path) -> Path:
+    # fake Fluent never reads the case, any file will do
+    case_dir = tmp_path / "case"
+    case_dir.mkdir()
+    path = case_dir / "car.cas.h5"
+    path.write_bytes(b"case")
+    return path
+
+
+@pytest.fixture(autouse=True)
+def fake_fluent_env(monkeypatch):
+    for name in list(os.environ):
+        if name.startswith("FAKE_FLUENT_"):
+            monkeypatch.delenv(name)
+
+
+def make_processor(case_path: Path, **kwargs):
+    from scripts.fluent_processing import FluentPostProcesser
+
+    options = {"results_db": None, "write_sheet": False, "case_catalog": None, "optimize_images": False,
+               "threads_per_shard": 1}
+    options.update(kwargs)
+    return FluentPostProcesser(FAKE_FLUENT, case_path, **options)
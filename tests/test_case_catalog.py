@@ -0,0 +1,34 @@
+from pathlib import Path
+
+import pytest
+
+from scripts.case_catalog import CaseCatalog
+
+
+def make_case(path: Path) -> Path:
+    path.parent.mkdir(parents=True, exist_ok=True)
+    path.write_bytes(b"case")
+    return path
+
+
+def test_find_case_order(tmp_path):
+    catalog = CaseCatalog(tmp_path / "catalog.sqlite")
+    folder = tmp_path / "run_12"
+    folder.mkdir()
+    with pytest.raises(FileNotFoundError):
+        catalog.find_case(folder)
+
+    # only sub folders: by name of the case, not of the folder
+    make_case(folder / "a" / "yaw.cas.h5")
+    make_case(folder / "b" / "car.cas.h5")
+    assert catalog.find_case(folder) == (folder / "b" / "car.cas.h5").resolve()
+    # a case directly in the folder wins, the folder listing isn't taken from the catalog anymore
+    make_case(folder / "z_mesh.cas.h5")
+    assert catalog.find_case(folder) == (folder / "z_mesh.cas.h5").resolve()
+    make_case(folder / "m_mesh.cas.h5")
+    assert catalog.find_case(folder) == (folder / "m_mesh.cas.h5").resolve()
+    # a removed case is dropped from the catalog
+    (folder / "m_mesh.cas.h5").unlink()
+    assert catalog.find_case(folder) == (folder / "z_mesh.cas.h5").resolve()
+    assert [info.path.name for info in catalog.refresh(folder)] == ["yaw.cas.h5", "car.cas.h5", "z_mesh.cas.h5"]
+    catalog.close()
@@ -0,0 +1,59 @@
+import json
+import threading
+
+from conftest import FAKE_FLUENT
+from scripts import cli
+
+OPTIONS = ["--fluent", str(FAKE_FLUENT), "--no-db", "--no-sheet", "--no-catalog", "--keep-images",
+           "--threads", "1", "--jobs", "2"]
+
+
+def records(text: str) -> list[dict]:
+    return [json.loads(line) for line in text.splitlines()]
+
+
+def test_json_lines(case_path, capsys):
+    assert cli.main([str(case_path.parent), "--json", "--events"] + OPTIONS) == 0
+    captured = capsys.readouterr()
+    # stdout only has the records, the log went to stderr
+    lines = records(captured.out)
+    assert "artifacts missing or stale" in captured.err
+    progress = [line for line in lines if line["event"] == "progress"]
+    assert progress and progress[-1]["done"] == progress[-1]["total"]
+    result = next(line for line in lines if line["event"] == "result")
+    assert result["status"] == "done" and result["case"] == str(case_path.resolve())
+    assert len(result["forces"]) > 0
+    assert lines[-1] == {"event": "summary", "cases": 1, "failed": 0}
+
+
+def test_failed_case(case_path, tmp_path, monkeypatch, capsys):
+    other = tmp_path / "other" / "car.cas.h5"
+    other.parent.mkdir()
+    other.write_bytes(b"case")
+    monkeypatch.setenv("FAKE_FLUENT_FAIL_AT", "3")
+    assert cli.main([str(case_path), str(other), "--json"] + OPTIONS) == 1
+    lines = records(capsys.readouterr().out)
+    assert [line["status"] for line in lines if line["event"] == "result"] == ["failed", "failed"]
+    assert lines[-1] == {"event": "summary", "cases": 2, "failed": 2}
+
+
+def test_no_cases(tmp_path, capsys):
+    assert cli.main([str(tmp_path), "--json"] + OPTIONS) == 1
+    assert "No cases found" in capsys.readouterr().err
+
+
+def test_interrupted(case_path, monkeypatch):
+    cancelled = threading.Event()
+
+    class Processor():
+        def cancel(self):
+            cancelled.set()
+
+    def process_case(case, args, output, processors):
+        # Ctrl+C while a case is running
+        processors[case] = Processor()
+        raise KeyboardInterrupt
+
+    monkeypatch.setattr(cli, "process_case", process_case)
+    assert cli.main([str(case_path)] + OPTIONS) == 130
+    assert cancelled.is_set()
@@ -0,0 +1,47 @@
+import shlex
+import sys
+
+from conftest import make_processor
+from scripts.executors import BatchExecutor, FakeScheduler, JobSpec
+from scripts.manifest import is_complete
+
+
+def test_batch_run_on_fake_scheduler(case_path):
+    scheduler = FakeScheduler(slots=1, queue_s=0.2)
+    executor = BatchExecutor(scheduler, poll_s=0.05, state_poll_s=0.1, settle_s=5.0)
+    states = []
+    processor = make_processor(case_path, executor=executor, on_event=lambda event: states.append(event.stage))
+    processor.run()
+    assert all(is_complete(processor.out_dir / key) for key in processor.expected_artifacts())
+    # the job script was written and went through the queue
+    assert list(processor.out_dir.glob("*.job.sh"))
+    assert "queue" in states
+
+
+def test_failing_line_callback(tmp_path, capsys):
+    # a broken progress handler must not stop following the job
+    def on_line(line):
+        raise ValueError("broken handler")
+
+    executor = BatchExecutor(FakeScheduler(slots=1, queue_s=0.0), poll_s=0.05, state_poll_s=0.1, settle_s=5.0)
+    cmd = [sys.executable, "-c", "print('a'); print('b'); print('c')"]
+    job = executor.start(cmd, tmp_path, tmp_path / "job.log", on_line=on_line)
+    assert job.run() == 0
+    assert job.n_lines == 3
+    assert job.callback_errors == 3
+    assert capsys.readouterr().out.count("Error in the transcript callback") == 1
+
+
+def test_job_script_quoting(tmp_path):
+    # the script runs in bash on the nodes, spaces and $ must stay part of the paths
+    cwd = tmp_path / "case $HOME dir"
+    cwd.mkdir()
+    executor = BatchExecutor(FakeScheduler(), path_map={str(tmp_path): "/cluster/my cases"})
+    spec = JobSpec("job", ["fluent", "3d", "-i", str(cwd / "run 1.jou")], cwd, cwd / "job.log", 4, None)
+    lines = executor.write_script(spec, None).read_text(encoding="utf-8").splitlines()
+    assert shlex.split(lines[-2]) == ["cd", "/cluster/my cases/case $HOME dir"]
+    assert shlex.split(lines[-1]) == ["fluent", "3d", "-i", "/cluster/my cases/case $HOME dir/run 1.jou"]
+
+    executor.fluent_cmd = "fluent 3d -t{threads} -g -i {journal}"
+    lines = executor.write_script(spec, cwd / "run 1.jou").read_text(encoding="utf-8").splitlines()
+    assert shlex.split(lines[-1]) == ["fluent", "3d", "-t4", "-g", "-i", "/cluster/my cases/case $HOME dir/run 1.jou"]
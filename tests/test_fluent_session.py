@@ -0,0 +1,37 @@
+import threading
+
+import pytest
+
+from conftest import make_processor
+from scripts.fluent_session import FluentSession, FluentSessionServer, request
+
+
+def test_session_request(case_path):
+    processor = make_processor(case_path)
+    session = FluentSession(processor, n_threads=1)
+    session.start(timeout_s=60)
+    server = FluentSessionServer(session, port=0)
+    thread = threading.Thread(target=server.serve_forever, daemon=True)
+    thread.start()
+    port = server.server_address[1]
+    try:
+        answer = request(port, {"op": "commands", "commands": ["/display/set/contours n-contours 20"]}, timeout_s=60)
+        assert any("n-contours" in line for line in answer["transcript"])
+
+        answer = request(port, {"op": "sweep", "timeout_s": 60, "overrides": {
+            "side": {"positions": [0.1, 0.2], "renders": [["velocity-magnitude 0 20", "side_slow", "side_slow"]]}}},
+            timeout_s=60)
+        pictures = sorted(answer["pictures"])
+        session_dir = processor.out_dir / "session" / "images"
+        assert pictures == [(session_dir / "side_slow" / f"side_slow_{i:02d}.png").as_posix() for i in range(2)]
+        assert all((session_dir / "side_slow" / f"side_slow_{i:02d}.png").exists() for i in range(2))
+        # only the requested view is rendered and the results of the sweep stay as they are
+        assert not list(processor.images_dir.rglob("*.png"))
+
+        with pytest.raises(RuntimeError, match="Unknown request"):
+            request(port, {"op": "nothing"}, timeout_s=60)
+    finally:
+        request(port, {"op": "close"}, timeout_s=60)
+        thread.join(10)
+        server.server_close()
+    assert session.proc is None
@@ -0,0 +1,62 @@
+import pytest
+
+from scripts.fake_fluent import FORCE_ZONES, MOMENT_ZONES, write_force_report
+from scripts.force_reports import ForceComponents, parse_force_report, parse_force_reports
+
+
+def test_parse_fake_fluent_reports(tmp_path):
+    write_force_report(tmp_path / "df.csv", FORCE_ZONES, 19, "Forces - Direction Vector")
+    write_force_report(tmp_path / "moment.csv", MOMENT_ZONES, 16, "Moments - Moment Center")
+    forces = parse_force_report(tmp_path / "df.csv")
+    moments = parse_force_report(tmp_path / "moment.csv")
+
+    assert forces.title == "Forces - Direction Vector"
+    assert list(forces.zones) == FORCE_ZONES
+    assert list(moments.zones) == MOMENT_ZONES
+    assert forces["rear-wing"] == ForceComponents(60.0, 3.0, 63.0)
+    assert "floor" in forces and "floor" not in moments
+    assert forces.net_total() == pytest.approx(sum(c.total for c in forces.zones.values()))
+
+
+def test_zones_found_by_name(tmp_path):
+    # more header lines and another zone order give the same values per zone
+    write_force_report(tmp_path / "a.csv", FORCE_ZONES, 19, "Forces")
+    write_force_report(tmp_path / "b.csv", FORCE_ZONES, 25, "Forces")
+    a = parse_force_report(tmp_path / "a.csv")
+    b = parse_force_report(tmp_path / "b.csv")
+    assert a.zones == b.zones and a.net == b.net
+
+    lines = (tmp_path / "a.csv").read_text(encoding="utf-8").splitlines()
+    header = lines.index("Zone Pressure Viscous Total")
+    rows = lines[header + 2:-1]
+    text = "\n".join(lines[:header + 2] + rows[::-1] + lines[-1:]) + "\n"
+    (tmp_path / "c.csv").write_text(text, encoding="utf-8")
+    assert parse_force_report(tmp_path / "c.csv").zones == a.zones
+
+
+def test_missing_zone(tmp_path):
+    write_force_report(tmp_path / "df.csv", [zone for zone in FORCE_ZONES if zone != "sidepod"], 19, "Forces")
+    report = parse_force_report(tmp_path / "df.csv")
+    with pytest.raises(KeyError, match="sidepod"):
+        report.total("sidepod")
+    # without a Net row the zones are summed
+    report.net = None
+    assert report.net_total() == pytest.approx(sum(c.total for c in report.zones.values()))
+
+
+def test_no_table(tmp_path):
+    (tmp_path / "df.csv").write_text("Forces\nno table here\n", encoding="utf-8")
+    with pytest.raises(ValueError, match="No zone table"):
+        parse_force_report(tmp_path / "df.csv")
+
+
+@pytest.mark.parametrize("n_files", [3, 20])
+def test_parse_many_reports(tmp_path, n_files):
+    # 16 files and more are parsed on a process pool
+    paths = []
+    for i in range(n_files):
+        paths.append(tmp_path / f"df_{i}.csv")
+        write_force_report(paths[-1], FORCE_ZONES[:i % len(FORCE_ZONES) + 1], 19, f"Forces {i}")
+    reports = parse_force_reports(paths, max_workers=2)
+    assert [report.title for report in reports] == [f"Forces {i}" for i in range(n_files)]
+    assert [report.zones for report in reports] == [parse_force_report(path).zones for path in paths]
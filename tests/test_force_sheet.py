@@ -0,0 +1,56 @@
+import pytest
+
+from conftest import FAKE_FLUENT
+from scripts.force_sheet import TEMPLATE_VERSION, export_batch, load_sheet_index, sheet_title
+from scripts.job_queue import JobQueue
+
+
+def forces(offset: float) -> list[float]:
+    return [offset + i for i in range(len(load_sheet_index()))]
+
+
+def test_sheets_export(tmp_path):
+    from openpyxl import load_workbook
+
+    name = "a very long case name that is longer than excel allows"
+    destination = export_batch([(name, forces(0)), (name, forces(100)), ("rw[2]", forces(200))],
+                               tmp_path / "forces.xlsx")
+    book = load_workbook(destination)
+    # the template sheet itself is removed, one sheet per case with unique titles
+    assert len(book.sheetnames) == 3
+    assert len(set(book.sheetnames)) == 3
+    assert all(len(title) <= 31 for title in book.sheetnames)
+    assert book.sheetnames[2] == "rw_2_"
+    for sheet, offset in zip(book.worksheets, (0, 100, 200)):
+        assert sheet["A1"].value == TEMPLATE_VERSION
+        assert [sheet.cell(row=cell.row, column=cell.col).value for cell in load_sheet_index()] == forces(offset)
+
+
+def test_table_export(tmp_path):
+    from openpyxl import load_workbook
+
+    destination = export_batch([("car_a", forces(0)), ("car_b", forces(1))], tmp_path / "forces.xlsx", "table")
+    rows = list(load_workbook(destination)["forces"].values)
+    assert rows[0] == ("case", *(cell.area for cell in load_sheet_index()))
+    assert rows[1] == ("car_a", *forces(0))
+    assert rows[2] == ("car_b", *forces(1))
+
+
+@pytest.mark.parametrize("mode", ["sheets", "table"])
+def test_export_without_cases(tmp_path, mode):
+    with pytest.raises(ValueError, match="No cases"):
+        export_batch([], tmp_path / "forces.xlsx", mode)
+    assert not (tmp_path / "forces.xlsx").exists()
+
+
+def test_queue_export_without_finished_jobs(tmp_path):
+    queue = JobQueue(FAKE_FLUENT, state_path=tmp_path / "queue.json")
+    with pytest.raises(ValueError, match="No finished jobs"):
+        queue.export_forces(tmp_path / "forces.xlsx")
+
+
+def test_sheet_title():
+    used = set()
+    assert sheet_title("car", used) == "car"
+    assert sheet_title("car", used) == "car_2"
+    assert sheet_title("", used) == "case"
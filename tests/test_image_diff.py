@@ -0,0 +1,58 @@
+import json
+from pathlib import Path
+
+from PIL import Image
+
+from scripts.image_diff import CACHE_NAME, compare_trees
+
+
+def make_tree(processed: Path, color: tuple[int, int, int]) -> dict:
+    # two frames of one series and the manifest that recorded them
+    artifacts = {}
+    for i in range(2):
+        path = processed / "images" / "side_vel" / f"side_vel_0{i}.png"
+        path.parent.mkdir(parents=True, exist_ok=True)
+        Image.new("RGB", (40, 20), color).save(path)
+        st = path.stat()
+        artifacts[f"images/side_vel/{path.name}"] = {"size": st.st_size, "mtime_ns": st.st_mtime_ns,
+                                                      "sha256": f"{processed.parent.name}-{i}"}
+    manifest = {"artifacts": artifacts}
+    write_manifest(processed, manifest)
+    return manifest
+
+
+def write_manifest(processed: Path, manifest: dict):
+    (processed / "manifest.json").write_text(json.dumps(manifest), encoding="utf-8")
+
+
+def computed(capsys) -> int:
+    line = next(line for line in capsys.readouterr().out.splitlines() if "difference images to compute" in line)
+    return int(line.split()[0])
+
+
+def test_cache_key_uses_both_manifests(tmp_path, capsys):
+    tree_a, tree_b = tmp_path / "a" / "processed", tmp_path / "b" / "processed"
+    manifest_a = make_tree(tree_a, (0, 0, 255))
+    manifest_b = make_tree(tree_b, (255, 0, 0))
+    out_dir = tmp_path / "compare"
+
+    compare_trees(tree_a, tree_b, out_dir, max_workers=1)
+    assert computed(capsys) == 2
+    frames = json.loads((out_dir / CACHE_NAME).read_text(encoding="utf-8"))["frames"]
+    assert sorted(frames) == ["side_vel/side_vel_00.png", "side_vel/side_vel_01.png"]
+    compare_trees(tree_a, tree_b, out_dir, max_workers=1)
+    assert computed(capsys) == 0
+
+    # the recorded hashes are used as they are, a new hash in either manifest is a new input
+    manifest_b["artifacts"]["images/side_vel/side_vel_01.png"]["sha256"] = "rendered again"
+    write_manifest(tree_b, manifest_b)
+    compare_trees(tree_a, tree_b, out_dir, max_workers=1)
+    assert computed(capsys) == 1
+    manifest_a["artifacts"]["images/side_vel/side_vel_00.png"]["sha256"] = "rendered again"
+    write_manifest(tree_a, manifest_a)
+    compare_trees(tree_a, tree_b, out_dir, max_workers=1)
+    assert computed(capsys) == 1
+
+    # a different gain is a different image
+    compare_trees(tree_a, tree_b, out_dir, gain=2.0, max_workers=1)
+    assert computed(capsys) == 2
@@ -0,0 +1,52 @@
+import json
+from pathlib import Path
+
+from PIL import Image
+
+from scripts.image_pyramid import LEVELS_DIR, PADDING, level_path, optimize_folders
+
+FULL_SIZE = (200, 100)
+
+
+def render(path: Path, box: tuple[int, int, int, int]):
+    # window sized picture, white margins around the content
+    image = Image.new("RGB", FULL_SIZE, (255, 255, 255))
+    image.paste((0, 0, 255), box)
+    image.save(path)
+
+
+def stored_box(folder: Path) -> tuple:
+    return tuple(json.loads((folder / LEVELS_DIR / "crop.json").read_text(encoding="utf-8"))["box"])
+
+
+def test_crop_box_follows_recipe(tmp_path):
+    folder = tmp_path / "side_vel"
+    folder.mkdir()
+    render(folder / "side_vel_00.png", (50, 30, 80, 60))
+    render(folder / "side_vel_01.png", (60, 40, 90, 70))
+    optimize_folders([folder], levels=(16,), max_workers=1, recipes={folder: "camera a"})
+    # union of both frames plus the padding
+    box = (50 - PADDING, 30 - PADDING, 90 + PADDING, 70 + PADDING)
+    assert stored_box(folder) == box
+    size = (box[2] - box[0], box[3] - box[1])
+    assert all(Image.open(path).size == size for path in folder.glob("*.png"))
+    assert level_path(folder / "side_vel_00.png", 16).exists()
+
+    # same recipe, new frame inside the box: the stored box crops it
+    render(folder / "side_vel_00.png", (55, 35, 70, 50))
+    assert optimize_folders([folder], levels=(16,), max_workers=1, recipes={folder: "camera a"}) == [
+        folder / "side_vel_00.png"]
+    assert stored_box(folder) == box
+    assert Image.open(folder / "side_vel_00.png").size == size
+
+    # same recipe, content outside the box: computed again from the new frames
+    render(folder / "side_vel_01.png", (10, 10, 30, 30))
+    optimize_folders([folder], levels=(16,), max_workers=1, recipes={folder: "camera a"})
+    assert stored_box(folder) == (10 - PADDING, 10 - PADDING, 30 + PADDING, 30 + PADDING)
+
+    # changed recipe: the content fits the old box, but the box isn't used anymore
+    render(folder / "side_vel_00.png", (12, 12, 28, 28))
+    render(folder / "side_vel_01.png", (15, 15, 20, 20))
+    optimize_folders([folder], levels=(16,), max_workers=1, recipes={folder: "camera b"})
+    assert stored_box(folder) == (12 - PADDING, 12 - PADDING, 28 + PADDING, 28 + PADDING)
+    assert Image.open(folder / "side_vel_01.png").size == (32, 32)
@@ -0,0 +1,83 @@
+import pytest
+
+from conftest import make_processor
+from scripts.manifest import Manifest, is_complete
+from scripts.sweep_definition import DEFAULT_SWEEP_PATH
+
+
+def test_resume_adopts_pending(case_path, monkeypatch, capsys):
+    # a crashed run never gets to update the manifest, its pictures are only in "pending"
+    update = Manifest.update
+    monkeypatch.setenv("FAKE_FLUENT_FAIL_AT", "5")
+    monkeypatch.setattr(Manifest, "update", lambda *args: None)
+    processor = make_processor(case_path)
+    with pytest.raises(RuntimeError):
+        processor.run()
+    expected = processor.expected_artifacts()
+    written = [key for key in expected if is_complete(processor.out_dir / key)]
+    assert len(written) == 4
+    mtimes = {key: (processor.out_dir / key).stat().st_mtime_ns for key in written}
+
+    manifest_path = processor.out_dir / "manifest.json"
+    crashed = manifest_path.read_text(encoding="utf-8")
+    manifest = Manifest(manifest_path)
+    assert set(manifest.data["pending"]["recipes"]) == set(expected)
+    # pictures of a changed recipe aren't adopted
+    changed = dict(expected, **{written[0]: "another recipe"})
+    case_hash = manifest.case_hash(processor.case_files())
+    assert manifest.adopt_pending(processor.out_dir, case_hash, changed) == 3
+    assert manifest.adopt_pending(processor.out_dir, case_hash, expected) == 0
+
+    # back to the crashed state, the next run resumes it
+    manifest_path.write_text(crashed, encoding="utf-8")
+    monkeypatch.delenv("FAKE_FLUENT_FAIL_AT")
+    monkeypatch.setattr(Manifest, "update", update)
+    capsys.readouterr()
+    processor = make_processor(case_path)
+    processor.run()
+    assert "Resuming interrupted run: 4 artifacts already written" in capsys.readouterr().out
+    assert all(is_complete(processor.out_dir / key) for key in expected)
+    # the pictures of the crashed run weren't rendered again
+    assert {key: (processor.out_dir / key).stat().st_mtime_ns for key in written} == mtimes
+
+
+def test_second_run_skips_fluent(case_path, capsys):
+    processor = make_processor(case_path)
+    processor.run()
+    expected = processor.expected_artifacts()
+    mtimes = {key: (processor.out_dir / key).stat().st_mtime_ns for key in expected}
+
+    capsys.readouterr()
+    processor = make_processor(case_path)
+    processor.run()
+    assert f"All {len(expected)} artifacts up to date, skipping Fluent" in capsys.readouterr().out
+    assert {key: (processor.out_dir / key).stat().st_mtime_ns for key in expected} == mtimes
+
+    # only the missing picture is rendered again
+    missing = "images/side_vel/side_vel_03.png"
+    (processor.out_dir / missing).unlink()
+    processor = make_processor(case_path)
+    processor.run()
+    assert f"1 of {len(expected)} artifacts missing or stale" in capsys.readouterr().out
+    assert is_complete(processor.out_dir / missing)
+    del mtimes[missing]
+    assert {key: (processor.out_dir / key).stat().st_mtime_ns for key in mtimes} == mtimes
+
+
+def test_changed_recipe_renders_only_its_series(case_path, capsys):
+    processor = make_processor(case_path)
+    processor.run()
+    expected = processor.expected_artifacts()
+    mtimes = {key: (processor.out_dir / key).stat().st_mtime_ns for key in expected}
+
+    # another contour range for the side pressure, a sweep.toml next to the case replaces the default
+    sweep = DEFAULT_SWEEP_PATH.read_text(encoding="utf-8").replace("range = [-300, 350]", "range = [-300, 400]")
+    (case_path.parent / "sweep.toml").write_text(sweep, encoding="utf-8")
+    capsys.readouterr()
+    processor = make_processor(case_path)
+    processor.run()
+    changed = {key for key in expected if key.startswith("images/side_pressure/")}
+    assert len(changed) == 30
+    assert f"30 of {len(expected)} artifacts missing or stale" in capsys.readouterr().out
+    now = {key: (processor.out_dir / key).stat().st_mtime_ns for key in expected}
+    assert {key for key in expected if now[key] != mtimes[key]} == changed
@@ -0,0 +1,55 @@
+import csv
+
+import numpy as np
+import pytest
+
+from scripts import plane_data
+from scripts.fake_fluent import write_ascii_export
+from scripts.plane_data import FIELD_VARIABLES, convert_export, plane_metrics, point_areas, write_metrics
+
+
+def test_chunked_conversion_and_metrics(tmp_path, monkeypatch):
+    txt_path = tmp_path / "side_data_00.txt"
+    write_ascii_export(txt_path, FIELD_VARIABLES, 3000, seed=1)
+    expected = np.loadtxt(txt_path, delimiter=",", skiprows=1)
+    # a few hundred rows per chunk, the last chunk is shorter
+    monkeypatch.setattr(plane_data, "CHUNK_BYTES", 64 * 1024)
+    assert convert_export(txt_path) == 3000
+    assert not txt_path.exists()
+    data = np.load(tmp_path / "side_data_00.npy", mmap_mode="r")
+    assert data.dtype.names == ("x-coordinate", "y-coordinate", "z-coordinate", *FIELD_VARIABLES)
+    for k, name in enumerate(data.dtype.names):
+        np.testing.assert_allclose(data[name], expected[:, k + 1].astype(np.float32), rtol=1e-6, atol=1e-30)
+
+    # the same metrics straight from the text columns
+    x, y, velocity = expected[:, 1], expected[:, 2], expected[:, 5:8].T
+    total_pressure, helicity, density = expected[:, 4], expected[:, 8], expected[:, 9]
+    area = point_areas(x, y)
+    mass_flux = density * velocity[2] * area
+    weights = np.abs(mass_flux)
+    metrics = plane_metrics(data, "z", 500.0)
+    assert metrics["n_points"] == 3000
+    assert metrics["area"] == pytest.approx(area.sum(), rel=1e-5)
+    assert metrics["mass_flow"] == pytest.approx(mass_flux.sum(), rel=1e-4)
+    assert metrics["velocity_mfw"] == pytest.approx(
+        (np.linalg.norm(velocity, axis=0) * weights).sum() / weights.sum(), rel=1e-4)
+    assert metrics["total_pressure_mfw"] == pytest.approx((total_pressure * weights).sum() / weights.sum(), rel=1e-4)
+    assert metrics["total_pressure_loss"] == pytest.approx((np.maximum(500.0 - total_pressure, 0) * area).sum(), rel=1e-4)
+    assert metrics["helicity_abs"] == pytest.approx((np.abs(helicity) * area).sum(), rel=1e-4)
+    assert metrics["vortex_area"] == pytest.approx(area[np.abs(helicity) > plane_data.VORTEX_HELICITY].sum(), rel=1e-4)
+
+
+def test_metrics_follow_the_plan(tmp_path):
+    planes_dir = tmp_path / "planes"
+    # the third plane is left over from an older, longer sweep
+    for index in range(3):
+        txt_path = planes_dir / f"side_data_{index:02d}.txt"
+        write_ascii_export(txt_path, FIELD_VARIABLES, 200, seed=index)
+        convert_export(txt_path)
+    plan = {"side": {"axis": "z", "positions": [0.1, 0.2], "export": "side_data", "renders": []}}
+    written = write_metrics(planes_dir, tmp_path / "metrics", plan, p0_ref=500.0)
+    assert written == [tmp_path / "metrics" / "side_planes.csv"]
+    with open(written[0], newline="", encoding="utf-8") as f:
+        rows = list(csv.DictReader(f))
+    assert [(row["index"], row["position"]) for row in rows] == [("0", "0.1"), ("1", "0.2")]
+    assert all(row["n_points"] == "200" and float(row["p0_ref"]) == 500.0 for row in rows)
@@ -0,0 +1,26 @@
+import pytest
+
+from conftest import make_processor
+from scripts.manifest import Manifest, is_complete
+
+
+def test_sharded_run(case_path):
+    processor = make_processor(case_path, n_shards=2)
+    processor.run()
+    expected = processor.expected_artifacts()
+    missing = [key for key in expected if not is_complete(processor.out_dir / key)]
+    assert not missing
+    # the shards wrote their own journals
+    assert (processor.out_dir / "v0.1_sequence_shard0.jou").exists()
+    assert (processor.out_dir / "v0.1_sequence_shard1.jou").exists()
+    assert Manifest(processor.out_dir / "manifest.json").data["pending"] is None
+
+
+def test_failing_shard(case_path, monkeypatch):
+    monkeypatch.setenv("FAKE_FLUENT_FAIL_AT", "3")
+    processor = make_processor(case_path, n_shards=2)
+    with pytest.raises(RuntimeError, match="shard"):
+        processor.run()
+    assert len(processor.supervisors) == 2
+    # no Fluent process is left running
+    assert all(run.supervisor.proc.poll() is not None for run in processor.supervisors)
@@ -0,0 +1,60 @@
+from pathlib import Path
+
+import pytest
+
+from conftest import make_processor
+from scripts.progress import ProgressTracker, StepTimings, format_eta, picture_step
+
+
+@pytest.mark.parametrize("seconds, text", [(0, "0m00s"), (59.6, "1m00s"), (754, "12m34s"),
+                                           (3600, "1h00m"), (3725, "1h02m")])
+def test_format_eta(seconds, text):
+    assert format_eta(seconds) == text
+
+
+def test_step_timings_persist(tmp_path):
+    path = tmp_path / "timings" / "step_timings.json"
+    StepTimings(path).record("1mb/t8", {"side/vel": [2.0, 4.0], "case/read": [10.0]})
+    # a new instance (the next run) reads them from the file
+    assert StepTimings(path).estimates("1mb/t8") == {"side/vel": 3.0, "case/read": 10.0}
+    assert StepTimings(path).estimates("other") == {}
+
+    # moving average of the old mean and the new run
+    StepTimings(path).record("1mb/t8", {"side/vel": [13.0]})
+    data = StepTimings(path).load()
+    assert data["1mb/t8"]["side/vel"] == [pytest.approx(0.7 * 3.0 + 0.3 * 13.0), 3]
+
+    path.write_text("{broken", encoding="utf-8")
+    assert StepTimings(path).estimates("1mb/t8") == {}
+
+
+def test_picture_step():
+    step = picture_step(Path("images/side_vel/side_vel_03.png"))
+    assert (step.stage, step.index, step.quantity) == ("side", 3, "vel")
+    step = picture_step(Path("images/bottom_iso.png"))
+    assert (step.stage, step.index, step.quantity) == ("bottom", -1, "iso")
+
+
+def test_tracker_on_transcript(tmp_path):
+    jou_path = tmp_path / "run.jou"
+    jou_path.write_text('/file/read-case-data "car.cas.h5"\n'
+                        '/report/forces/wall-forces yes 0 0 1 yes df.csv\n'
+                        '/display/save-picture "images/side_vel/side_vel_00.png"\n'
+                        '/display/save-picture "images/side_vel/side_vel_01.png"\n', encoding="utf-8")
+    events = []
+    tracker = ProgressTracker(jou_path, {"side/vel": 1.0, "case/read": 1.0, "forces/df": 1.0}, events.append)
+    tracker.feed_line('> /display/save-picture "images/side_vel/side_vel_00.png"\n')
+    # Fluent works through the journal in order, a step that starts means the earlier ones are done
+    assert [event.done for event in events] == [1, 2]
+    assert tracker.fraction == pytest.approx(0.5)
+    tracker.finish()
+    assert events[-1].done == 4 and events[-1].fraction == pytest.approx(1.0)
+
+
+def test_events_of_a_run(case_path):
+    events = []
+    processor = make_processor(case_path, on_event=events.append)
+    processor.run()
+    assert [event.done for event in events] == list(range(1, events[-1].total + 1))
+    assert events[-1].fraction == pytest.approx(1.0)
+    assert all(a.fraction <= b.fraction for a, b in zip(events, events[1:]))
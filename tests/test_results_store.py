@@ -0,0 +1,53 @@
+import os
+
+from scripts.fake_fluent import FORCE_ZONES, MOMENT_ZONES, write_force_report
+from scripts.force_reports import parse_force_report
+from scripts.results_store import REPORTS, ResultsStore
+
+
+def write_forces(case_dir, mtime=None):
+    forces_dir = case_dir / "processed" / "forces"
+    forces_dir.mkdir(parents=True)
+    for name in REPORTS:
+        write_force_report(forces_dir / f"{name}.csv", MOMENT_ZONES if name == "moment" else FORCE_ZONES, 19, name)
+        if mtime is not None:
+            os.utime(forces_dir / f"{name}.csv", (mtime, mtime))
+    return forces_dir
+
+
+def test_insert_is_ignored_twice(tmp_path):
+    forces_dir = write_forces(tmp_path / "car")
+    reports = {name: parse_force_report(forces_dir / f"{name}.csv") for name in REPORTS}
+    store = ResultsStore(tmp_path / "results.sqlite")
+    run_id = store.insert_run(tmp_path / "car", reports, "abc", processed_at=100.0)
+    assert run_id is not None
+    # the same case at the same time is one run
+    assert store.insert_run(tmp_path / "car", reports, "abc", processed_at=100.0) is None
+    assert store.insert_run(tmp_path / "car", reports, "abc", processed_at=200.0) is not None
+    assert len(store.runs()) == 2
+    assert len(store.runs(since=150.0)) == 1
+
+    n_rows = store.query("SELECT COUNT(*) AS n FROM forces WHERE run_id = ?", (run_id,))[0]["n"]
+    # every zone and the net row of every report
+    assert n_rows == 2 * (len(FORCE_ZONES) + 1) + len(MOMENT_ZONES) + 1
+    history = store.component_history("rear-wing", "drag")
+    assert [row["total"] for row in history] == [63.0, 63.0]
+    store.close()
+
+
+def test_backfill(tmp_path):
+    write_forces(tmp_path / "project" / "car_a", mtime=1000.0)
+    write_forces(tmp_path / "project" / "car_b", mtime=2000.0)
+    # a broken folder is skipped, not fatal
+    broken = tmp_path / "project" / "car_c" / "processed" / "forces"
+    broken.mkdir(parents=True)
+    (broken / "df.csv").write_text("no table\n", encoding="utf-8")
+
+    store = ResultsStore(tmp_path / "results.sqlite")
+    assert store.backfill([tmp_path / "project"], max_workers=2) == 2
+    runs = store.runs()
+    assert [run["processed_at"] for run in runs] == [1000.0, 2000.0]
+    assert [run["case_path"] for run in runs] == [str(tmp_path / "project" / name) for name in ("car_a", "car_b")]
+    # a second backfill finds the same runs
+    assert store.backfill([tmp_path / "project"], max_workers=2) == 0
+    store.close()
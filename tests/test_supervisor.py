@@ -0,0 +1,93 @@
+import os
+import sys
+import threading
+import time
+
+import pytest
+
+from conftest import FAKE_FLUENT
+from scripts.supervisor import ProcessCancelled, ProcessSupervisor
+
+
+def fake_fluent(tmp_path, n_commands: int = 5) -> list[str]:
+    jou_path = tmp_path / "run.jou"
+    lines = ['/file/read-case-data "car.cas.h5"'] + [f"/display/set/contours n-contours {i}" for i in range(n_commands)]
+    jou_path.write_text("\n".join(lines + ["/exit yes"]) + "\n", encoding="utf-8")
+    return [sys.executable, str(FAKE_FLUENT), "3d", "-t1", "-g", "-i", str(jou_path)]
+
+
+def alive(pid: int) -> bool:
+    # a zombie nobody reaps counts as stopped
+    try:
+        os.kill(pid, 0)
+    except ProcessLookupError:
+        return False
+    try:
+        with open(f"/proc/{pid}/stat", encoding="utf-8") as f:
+            return f.read().split(")")[-1].split()[0] != "Z"
+    except OSError:
+        return True
+
+
+def test_run(tmp_path):
+    supervisor = ProcessSupervisor(fake_fluent(tmp_path), tmp_path, log_path=tmp_path / "run.log")
+    assert supervisor.run() == 0
+    assert "Fake Fluent done" in supervisor.tail(1)
+
+
+def test_idle_timeout(tmp_path, monkeypatch):
+    # reading the case prints nothing for 30 s
+    monkeypatch.setenv("FAKE_FLUENT_READ_S", "30")
+    supervisor = ProcessSupervisor(fake_fluent(tmp_path), tmp_path, idle_timeout_s=0.5, poll_s=0.05)
+    start = time.monotonic()
+    with pytest.raises(TimeoutError, match="printed nothing"):
+        supervisor.run()
+    assert time.monotonic() - start < 10
+    assert supervisor.proc.poll() is not None
+
+
+def test_total_timeout(tmp_path, monkeypatch):
+    # prints all the time, only the wall clock stops it
+    monkeypatch.setenv("FAKE_FLUENT_DELAY", "0.05")
+    monkeypatch.setenv("FAKE_FLUENT_CHATTER", "2")
+    supervisor = ProcessSupervisor(fake_fluent(tmp_path, 200), tmp_path, timeout_s=0.5, idle_timeout_s=5.0,
+                                   poll_s=0.05)
+    with pytest.raises(TimeoutError, match="longer than"):
+        supervisor.run()
+    assert supervisor.proc.poll() is not None
+
+
+@pytest.mark.skipif(os.name == "nt", reason="reads /proc")
+def test_cancel_stops_the_process_group(tmp_path):
+    # the process starts a child like Fluent starts its solver processes
+    script = ("import subprocess, sys, time\n"
+              "child = subprocess.Popen([sys.executable, '-c', 'import time; time.sleep(60)'])\n"
+              "print(child.pid, flush=True)\n"
+              "time.sleep(60)\n")
+    pids = []
+    cancel_event = threading.Event()
+
+    def on_line(line):
+        pids.append(int(line))
+        cancel_event.set()
+
+    supervisor = ProcessSupervisor([sys.executable, "-c", script], tmp_path, on_line=on_line,
+                                   cancel_event=cancel_event, poll_s=0.05)
+    with pytest.raises(ProcessCancelled):
+        supervisor.run()
+    assert supervisor.proc.poll() is not None
+    deadline = time.monotonic() + 5
+    while alive(pids[0]) and time.monotonic() < deadline:
+        time.sleep(0.05)
+    assert not alive(pids[0])
+
+
+def test_ring_buffer(tmp_path):
+    # the transcript keeps the last lines, the log file gets all of them
+    cmd = [sys.executable, "-c", "for i in range(100): print(f'line {i}')"]
+    supervisor = ProcessSupervisor(cmd, tmp_path, log_path=tmp_path / "run.log", buffer_lines=10)
+    assert supervisor.run() == 0
+    assert supervisor.n_lines == 100
+    assert len(supervisor.transcript) == 10
+    assert supervisor.tail(2) == "line 98\nline 99\n"
+    assert (tmp_path / "run.log").read_text(encoding="utf-8").splitlines() == [f"line {i}" for i in range(100)]
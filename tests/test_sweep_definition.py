@@ -0,0 +1,48 @@
+from pathlib import Path
+
+import pytest
+
+from scripts.sweep_definition import (DEFAULT_SWEEP_PATH, compile_plan, count_renders, load_definition,
+                                      optimize_journal, validate)
+
+
+def test_default_sweep():
+    plan = compile_plan(load_definition(DEFAULT_SWEEP_PATH), Path("images"))
+    assert plan["side"]["positions"][0] == 0.0 and plan["side"]["positions"][-1] == 0.76
+    assert plan["front"]["setup"][:1] == ["views/apply-mirror-planes symmetry ()"]
+    assert plan["side"]["renders"][0] == ("velocity-magnitude 0 35", Path("images") / "side_vel", "side_vel")
+    assert plan["bottom"]["path"] == Path("images") / "bottom_iso.png"
+    counts = count_renders(plan)
+    assert counts == {"forces": 3, "bottom": 1, "side": 30 * 3, "front": 45 * 3}
+    assert sum(counts.values()) == 229
+    assert count_renders(plan, with_forces=False) == {"side": 90, "front": 135}
+
+
+def test_optimize_journal():
+    lines = [
+        "/views/camera/target 0.4 0 1",
+        "/views/camera/position 0.4 1 1",
+        "/display/set/contours surfaces plane_z ()",
+        "/display/save-picture a.png",
+        # same values again: dropped
+        "/views/camera/target 0.4 0 1",
+        "/display/set/contours surfaces plane_z ()",
+        "/display/save-picture b.png",
+        # a new surface forgets the contour surfaces, auto-scale forgets the camera
+        "/surface/plane-surface plane_z zx-plane 0.1",
+        "/display/set/contours surfaces plane_z ()",
+        "/views/auto-scale",
+        "/views/camera/target 0.4 0 1",
+        "views/apply-mirror-planes symmetry ()",
+        "views/apply-mirror-planes symmetry ()",
+    ]
+    assert optimize_journal(lines) == lines[:4] + lines[6:]
+
+
+def test_validate():
+    definition = load_definition(DEFAULT_SWEEP_PATH)
+    definition["renders"].append(dict(definition["renders"][0]))
+    with pytest.raises(ValueError, match="defined twice"):
+        validate(definition, DEFAULT_SWEEP_PATH)
+    with pytest.raises(ValueError, match=r"\[forces\]"):
+        validate({}, DEFAULT_SWEEP_PATH)
@@ -0,0 +1,25 @@
+import pytest
+
+from scripts.tuning import RunHistory, Tuner
+
+
+def test_plan_from_history(tmp_path):
+    history = RunHistory(tmp_path / "run_history.json")
+    # 1M cells scales well: T = 100 s + 900 s / threads
+    for threads in (1, 4, 16):
+        history.record(1_000_000, threads, 100 + 900 / threads)
+    # 5M cells is nearly all serial: T = 1000 s + 10 s / threads
+    for threads in (1, 8):
+        history.record(5_000_000, threads, 1000 + 10 / threads)
+    tuner = Tuner(history, cores=16, licences=4)
+
+    assert tuner.predict(1_000_000, 2) == pytest.approx(550.0)
+    # one case gets the whole machine
+    assert tuner.plan(1_000_000, 1) == (16, 1)
+    # four cases: 4 x 4 threads (325 s) beats one after the other on 16 threads (625 s)
+    assert tuner.plan(1_000_000, 4) == (4, 4)
+    # only 4 licences, the fifth case waits either way
+    assert tuner.plan(1_000_000, 8) == (4, 4)
+    # more threads are less than 5 % faster, the fewest cores win
+    assert tuner.plan(5_000_000, 1) == (1, 1)
+    assert tuner.plan(1_000_000, 1, max_threads=8) == (8, 1)